@@ -0,0 +1,56 @@
+
+from starlette.responses import JSONResponse
+
+from .config import (
+    API_V1_STR,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_PRIORITY,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RETRY_AFTER
+)
+from inference.admission import AdmissionController, AdmissionRejectedError
+from inference.metrics import QUEUE_DEPTH, record_error, set_gauge_function
+
+_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    # Only used from the event loop thread, so no lock is needed to create it
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            ADMISSION_MAX_IN_FLIGHT,
+            max_queue=ADMISSION_MAX_QUEUE,
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+            retry_after=ADMISSION_RETRY_AFTER
+        )
+    return _controller
+
+set_gauge_function(QUEUE_DEPTH, lambda: get_admission_controller().waiting, "admission")
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting prediction requests (every API request without ADMISSION_PRIORITY) through the admission controller.
+
+    Requests are admitted before their upload is read, and hold their slot
+    until the response, streamed ones included, has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.prefix = f"{API_V1_STR}/predict" if ADMISSION_PRIORITY else f"{API_V1_STR}/"
+        # Health checks must answer even when the queue is full
+        self.exempt = f"{API_V1_STR}/health"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix) or scope["path"] == self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with get_admission_controller().admit_async():
+                await self.app(scope, receive, send)
+        except AdmissionRejectedError as e:
+            record_error(e)
+            response = JSONResponse({"detail": str(e)}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
@@ -0,0 +1,141 @@
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentinel placed on the queue to stop the worker threads
+_STOP = object()
+
+class PredictionBatcher:
+    """
+    Gather concurrent prediction requests into a single model call.
+
+    Callers submit one instance at a time and get back a Future. Worker threads
+    pull instances off a shared queue until either `max_batch_size` instances
+    have been collected or `max_wait_ms` has passed since the first one arrived,
+    send the whole batch in one request and fan the per-row predictions back out
+    to the waiting futures.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        num_workers: int = 1,
+    ):
+        """
+        Args:
+            predict_batch: Function taking a list of instances and returning one
+                prediction per instance, in the same order
+            max_batch_size: Maximum number of instances sent in one call
+            max_wait_ms: Maximum time to hold the first instance of a batch
+                while waiting for more to arrive
+            num_workers: Number of batches that may be in flight at once
+        """
+        self._predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.num_workers = max(1, num_workers)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, instance: Any) -> Future:
+        """Queue a single instance for prediction and return a Future for its result."""
+        future: Future = Future()
+        # Under the lock so that nothing is queued behind the stop sentinels, where no worker would serve it
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Batcher has been shut down")
+            self._start_workers()
+            self._queue.put((instance, future))
+        return future
+
+    def predict(self, instance: Any, timeout: Optional[float] = None) -> Any:
+        """Submit an instance and block until its prediction is available."""
+        return self.submit(instance).result(timeout=timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads after the already queued instances are served."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for _ in self._workers:
+                self._queue.put(_STOP)
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _start_workers(self) -> None:
+        # Start worker threads on first use so that importing the module has no side effects; called with the lock held
+        if self._workers:
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._run,
+                name=f"prediction-batcher-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _collect_batch(self) -> Tuple[List[Tuple[Any, Future]], bool]:
+        """Block for the first item, then keep collecting until the batch is full or the deadline passes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect_batch()
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Any, Future]]) -> None:
+        # Skip callers that gave up (e.g. cancelled) before the batch was sent
+        batch = [(instance, future) for instance, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        instances = [instance for instance, _ in batch]
+        try:
+            predictions = self._predict_batch(instances)
+            if len(predictions) != len(instances):
+                raise ValueError(
+                    f"Expected {len(instances)} predictions from the model, got {len(predictions)}"
+                )
+        except Exception as e:
+            logger.error(f"Batch prediction of {len(instances)} instances failed: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        logger.debug(f"Served batch of {len(instances)} instances")
+        for (_, future), prediction in zip(batch, predictions):
+            future.set_result(prediction)
@@ -0,0 +1,245 @@
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    TF_SERVING_MODEL_NAME,
+    INFERENCE_PRECISION,
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_CACHE_SHARED_BACKEND,
+    PREDICTION_CACHE_REDIS_URL,
+    PREDICTION_CACHE_REDIS_TIMEOUT,
+    PREDICTION_CACHE_REDIS_CONNECT_TIMEOUT,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_CONTROL,
+)
+from inference.http_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+def model_cache_tag(model_version: str) -> str:
+    # Quantized models answer slightly differently, so they get their own entries
+    return model_version if INFERENCE_PRECISION == "float32" else f"{model_version}-{INFERENCE_PRECISION}"
+
+def make_cache_key(image_bytes: bytes, model_version: str) -> str:
+    """Key a prediction by the uploaded bytes and the model version that produced it, so a new version never serves stale entries."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"prediction:{TF_SERVING_MODEL_NAME}:{model_cache_tag(model_version)}:{digest}"
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class CacheBackend:
+    """Interface of the optional shared cache tier. Values are JSON-serializable dicts; calls are awaited on the event loop."""
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class LocalCacheBackend(CacheBackend):
+    """In-process stand-in for a shared cache, for development and tests."""
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES * 4):
+        self._cache = LRUCache(max_entries, ttl=float("inf"))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at < time.time():
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        # Store serialized, like a real shared backend would
+        self._cache.set(key, (time.time() + ttl, json.dumps(value)))
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared cache tier stored in Redis, so all workers and replicas see the same entries.
+
+    Uses the asyncio client, with short socket and connect timeouts so that a slow
+    or unreachable Redis costs a prediction a bounded wait rather than a stall.
+    """
+
+    def __init__(
+        self,
+        url: str = PREDICTION_CACHE_REDIS_URL,
+        timeout: float = PREDICTION_CACHE_REDIS_TIMEOUT,
+        connect_timeout: float = PREDICTION_CACHE_REDIS_CONNECT_TIMEOUT,
+    ):
+        import redis.asyncio  # Optional dependency, only needed for this backend
+
+        self._client = redis.asyncio.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=connect_timeout)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        await self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+SHARED_BACKENDS = {
+    "local": LocalCacheBackend,
+    "redis": RedisCacheBackend,
+}
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results.
+
+    Lookups go to the in-process LRU first, then to the optional shared backend;
+    shared hits are copied into the LRU. Errors and timeouts from the shared backend
+    are logged and treated as misses so that a cache outage never fails a prediction.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl: float = PREDICTION_CACHE_TTL,
+        shared: Optional[CacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = shared
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    async def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared prediction cache lookup failed: {str(e)}")
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+                self._count("shared_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    async def get_many(self, keys: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """Look up several keys concurrently; None keys are misses that are not counted."""
+        return list(await asyncio.gather(*(self.get(key) for key in keys)))
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared prediction cache update failed: {str(e)}")
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the current size of the in-process tier."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        stats["shared_backend"] = type(self.shared).__name__ if self.shared is not None else None
+        return stats
+
+# Process-wide prediction cache
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+def get_prediction_cache() -> PredictionCache:
+    """Return the shared prediction cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = None
+                if PREDICTION_CACHE_SHARED_BACKEND:
+                    try:
+                        shared = SHARED_BACKENDS[PREDICTION_CACHE_SHARED_BACKEND]()
+                    except KeyError:
+                        raise ValueError(
+                            f"Unknown prediction cache backend '{PREDICTION_CACHE_SHARED_BACKEND}'. "
+                            f"Choose one of: {', '.join(SHARED_BACKENDS)}"
+                        )
+                _cache = PredictionCache(shared=shared)
+    return _cache
+
+async def close_prediction_cache():
+    """Close the shared tier's connections; the next get_prediction_cache() starts afresh."""
+    global _cache
+    cache, _cache = _cache, None
+    if cache is not None:
+        await cache.close()
+
+# Process-wide cache of serialized read responses
+_response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_CONTROL, enabled=RESPONSE_CACHE_ENABLED)
+
+def get_response_cache() -> ResponseCache:
+    """Return the shared cache of /history/{id} responses; /treatment and /plant-info serve prebuilt bodies."""
+    return _response_cache
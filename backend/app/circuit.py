@@ -0,0 +1,78 @@
+
+import threading
+from typing import Any, Dict, Optional
+
+from .config import (
+    TF_SERVING_URL,
+    INFERENCE_BACKEND,
+    CIRCUIT_BREAKER_ENABLED,
+    CIRCUIT_BREAKER_WINDOW,
+    CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+    CIRCUIT_BREAKER_SLOW_CALL_RATE,
+    CIRCUIT_BREAKER_OPEN_SECONDS,
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+    TF_SERVING_HEALTH_INTERVAL,
+    TF_SERVING_HEALTH_TIMEOUT
+)
+from .inference_client import get_inference_client
+from inference.backends import TFServingRestBackend
+from inference.circuit import STATE_VALUES, CircuitBreaker, HealthProbe, tf_serving_probe
+from inference.metrics import CIRCUIT_STATE, set_gauge_function
+from inference.registry import tf_serving_status_url
+
+_breaker: Optional[CircuitBreaker] = None
+_probe: Optional[HealthProbe] = None
+_breaker_lock = threading.Lock()
+
+def _probe_get(url: str):
+    # Over the pooled session used for predictions, with the probe's own timeout
+    return get_inference_client().session.get(url, timeout=TF_SERVING_HEALTH_TIMEOUT)
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """The breaker in front of TensorFlow Serving, with its health probe started; None when disabled or serving in process."""
+    global _breaker, _probe
+    if not CIRCUIT_BREAKER_ENABLED or INFERENCE_BACKEND != TFServingRestBackend.name:
+        return None
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                breaker = CircuitBreaker(
+                    "TensorFlow Serving",
+                    window=CIRCUIT_BREAKER_WINDOW,
+                    min_calls=CIRCUIT_BREAKER_MIN_CALLS,
+                    failure_rate_threshold=CIRCUIT_BREAKER_FAILURE_RATE,
+                    slow_call_seconds=CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                    slow_call_rate_threshold=CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                    open_seconds=CIRCUIT_BREAKER_OPEN_SECONDS,
+                    half_open_calls=CIRCUIT_BREAKER_HALF_OPEN_CALLS
+                )
+                set_gauge_function(CIRCUIT_STATE, lambda: STATE_VALUES[breaker.state], "tf_serving")
+                _probe = HealthProbe(
+                    breaker,
+                    tf_serving_probe(tf_serving_status_url(TF_SERVING_URL), _probe_get),
+                    interval=TF_SERVING_HEALTH_INTERVAL
+                )
+                _probe.start()
+                _breaker = breaker
+    return _breaker
+
+def check_tf_serving() -> None:
+    """Raise CircuitOpenError while the breaker is open, before any work is spent on a request."""
+    breaker = get_circuit_breaker()
+    if breaker is not None:
+        breaker.check()
+
+def circuit_status() -> Optional[Dict[str, Any]]:
+    breaker = get_circuit_breaker()
+    return breaker.snapshot() if breaker is not None else None
+
+def close_circuit_breaker():
+    """Stop the health probe; the next get_circuit_breaker() starts afresh."""
+    global _breaker, _probe
+    with _breaker_lock:
+        if _probe is not None:
+            _probe.stop()
+        _breaker = None
+        _probe = None
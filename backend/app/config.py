@@ -16,17 +16,120 @@ CORS_ORIGINS = ["*"]  # For production, specify your frontend domain
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "Link"]  # Pagination headers readable by the frontend
+
+# History Pagination Settings
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", "200"))
 
 # Media Settings
 MEDIA_DIR = os.path.join(BASE_DIR, "media")
 UPLOAD_DIR = os.path.join(MEDIA_DIR, "uploads")
 TEMP_DIR = os.path.join(MEDIA_DIR, "temp")
+PLANT_IMAGES_DIR = os.path.join(MEDIA_DIR, "plant_images")
+# Keep a copy of each uploaded image for the scan history. Written in the background after the response.
+PERSIST_UPLOADS = os.environ.get("PERSIST_UPLOADS", "true").lower() == "true"
 
 # TensorFlow Serving Configuration
 TF_SERVING_HOST = os.environ.get("TF_SERVING_HOST", "localhost")
 TF_SERVING_PORT = os.environ.get("TF_SERVING_PORT", "8501")
 TF_SERVING_MODEL_NAME = os.environ.get("TF_SERVING_MODEL_NAME", "leaf_disease_model")
 TF_SERVING_URL = f"http://{TF_SERVING_HOST}:{TF_SERVING_PORT}/v1/models/{TF_SERVING_MODEL_NAME}:predict"
+# "latest" follows the newest version TF Serving has available; a number pins every request to that version
+TF_SERVING_MODEL_VERSION = os.environ.get("TF_SERVING_MODEL_VERSION", "latest")
+TF_SERVING_GRPC_PORT = os.environ.get("TF_SERVING_GRPC_PORT", "8500")
+TF_SERVING_SIGNATURE_NAME = os.environ.get("TF_SERVING_SIGNATURE_NAME", "serving_default")
+TF_SERVING_INPUT_NAME = os.environ.get("TF_SERVING_INPUT_NAME", "inputs")
+
+# Image Preprocessing Settings
+PREPROCESS_RESAMPLE = os.environ.get("PREPROCESS_RESAMPLE", "bicubic").lower()  # Pillow filter for the final resize
+PREPROCESS_JPEG_DRAFT = os.environ.get("PREPROCESS_JPEG_DRAFT", "true").lower() == "true"  # Reduced-size JPEG decoding
+# Where decoding/resizing runs: "inline", "thread" (Pillow releases the GIL) or "process" (results via shared memory)
+PREPROCESS_POOL_MODE = os.environ.get("PREPROCESS_POOL_MODE", "thread").lower()
+PREPROCESS_POOL_WORKERS = int(os.environ.get("PREPROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+PREPROCESS_POOL_MAX_PENDING = int(os.environ.get("PREPROCESS_POOL_MAX_PENDING", "64"))  # Beyond this, answer 503
+PREPROCESS_RETRY_AFTER = int(os.environ.get("PREPROCESS_RETRY_AFTER", "1"))  # Seconds, sent in Retry-After
+
+# Tensor transport used to send images to TensorFlow Serving:
+#   "json"  - normalized float pixels as nested JSON lists (default, works with any signature)
+#   "uint8" - raw 0-255 pixels as JSON ints; the serving signature must do the /255 scaling
+#   "b64"   - the resized image as base64 PNG bytes; the serving signature must decode and scale
+#   "grpc"  - float32 TensorProto over the gRPC PredictionService (needs tensorflow-serving-api)
+TF_SERVING_TRANSPORT = os.environ.get("TF_SERVING_TRANSPORT", "json").lower()
+
+# Inference Backend Settings
+#   "tf_serving" - send images to TensorFlow Serving with the transport above (default)
+#   "keras"      - run the Keras model in process, calling it directly instead of model.predict()
+#   "onnx"       - run an exported ONNX model in process with ONNX Runtime (needs onnxruntime)
+#   "tflite"     - run an exported TensorFlow Lite model in process (tflite-runtime or tensorflow)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "tf_serving").lower()
+INFERENCE_MODEL_DIR = os.environ.get("INFERENCE_MODEL_DIR", os.path.join(BASE_DIR, "ml_models"))
+INFERENCE_MODEL_PATH = os.environ.get("INFERENCE_MODEL_PATH", "")  # Defaults to leaf_disease_model.<ext> in INFERENCE_MODEL_DIR
+# "float32", or a quantized variant made by `manage.py quantize_model`: "float16" or "int8" (onnx and tflite only)
+INFERENCE_PRECISION = os.environ.get("INFERENCE_PRECISION", "float32").lower()
+INFERENCE_NUM_THREADS = int(os.environ.get("INFERENCE_NUM_THREADS", str(os.cpu_count() or 1)))  # Threads inside each operator
+INFERENCE_INTER_OP_THREADS = int(os.environ.get("INFERENCE_INTER_OP_THREADS", "1"))  # Operators run at the same time
+
+# Model Versions (see inference/registry.py). In-process models are versioned by sub-directory of
+# INFERENCE_MODEL_DIR (ml_models/<version>/leaf_disease_model.<ext>); with TF Serving, by its model versions.
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", "10"))  # Seconds between checks for a new version; 0 disables
+MODEL_MAX_LOADED_VERSIONS = int(os.environ.get("MODEL_MAX_LOADED_VERSIONS", "2"))  # Versions kept in memory, the served one included
+
+# Inference HTTP Client Settings (connection pool, timeouts and retries)
+TF_SERVING_POOL_SIZE = int(os.environ.get("TF_SERVING_POOL_SIZE", "32"))
+TF_SERVING_CONNECT_TIMEOUT = float(os.environ.get("TF_SERVING_CONNECT_TIMEOUT", "2.0"))
+TF_SERVING_READ_TIMEOUT = float(os.environ.get("TF_SERVING_READ_TIMEOUT", "30.0"))
+TF_SERVING_MAX_RETRIES = int(os.environ.get("TF_SERVING_MAX_RETRIES", "2"))
+TF_SERVING_RETRY_BACKOFF = float(os.environ.get("TF_SERVING_RETRY_BACKOFF", "0.2"))
+
+# Circuit breaker in front of TensorFlow Serving (see inference/circuit.py): opens when CIRCUIT_BREAKER_FAILURE_RATE
+# of the calls in the last CIRCUIT_BREAKER_WINDOW seconds failed, or CIRCUIT_BREAKER_SLOW_CALL_RATE took longer than
+# CIRCUIT_BREAKER_SLOW_CALL_SECONDS; predictions then get 503 at once for CIRCUIT_BREAKER_OPEN_SECONDS.
+CIRCUIT_BREAKER_ENABLED = os.environ.get("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_BREAKER_WINDOW = float(os.environ.get("CIRCUIT_BREAKER_WINDOW", "30"))  # Seconds
+CIRCUIT_BREAKER_MIN_CALLS = int(os.environ.get("CIRCUIT_BREAKER_MIN_CALLS", "10"))  # Calls in the window before it can open
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.environ.get("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "5"))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_RATE", "0.8"))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.environ.get("CIRCUIT_BREAKER_OPEN_SECONDS", "15"))
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.environ.get("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "3"))  # Trial calls that must succeed to close it
+# Background probe of the model status endpoint; a healthy answer ends the open period early, failing ones open it
+TF_SERVING_HEALTH_INTERVAL = float(os.environ.get("TF_SERVING_HEALTH_INTERVAL", "5"))  # Seconds, 0 disables the probe
+TF_SERVING_HEALTH_TIMEOUT = float(os.environ.get("TF_SERVING_HEALTH_TIMEOUT", "2"))  # Seconds
+
+# Prediction Cache Settings (keyed by a hash of the uploaded image bytes and the model version)
+PREDICTION_CACHE_ENABLED = os.environ.get("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "1024"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))  # Seconds
+# Optional shared tier: "" (none), "local" (in-process stand-in) or "redis"
+PREDICTION_CACHE_SHARED_BACKEND = os.environ.get("PREDICTION_CACHE_SHARED_BACKEND", "").lower()
+PREDICTION_CACHE_REDIS_URL = os.environ.get("PREDICTION_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# A slow Redis must not hold up predictions: lookups past these many seconds count as misses
+PREDICTION_CACHE_REDIS_TIMEOUT = float(os.environ.get("PREDICTION_CACHE_REDIS_TIMEOUT", "0.1"))
+PREDICTION_CACHE_REDIS_CONNECT_TIMEOUT = float(os.environ.get("PREDICTION_CACHE_REDIS_CONNECT_TIMEOUT", "0.5"))
+
+# Dynamic Batching Settings
+BATCHING_ENABLED = os.environ.get("BATCHING_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+BATCH_NUM_WORKERS = int(os.environ.get("BATCH_NUM_WORKERS", "2"))
+
+# Admission control in front of the prediction endpoints (see inference/admission.py): at most
+# ADMISSION_MAX_IN_FLIGHT predictions run at once and ADMISSION_MAX_QUEUE wait for a slot; others get 429,
+# and those that cannot start within ADMISSION_QUEUE_TIMEOUT get 503, both with Retry-After.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", str(BATCH_MAX_SIZE * BATCH_NUM_WORKERS)))  # Enough to fill the batches
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "5"))  # Seconds
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "1"))  # Seconds, sent in Retry-After
+# Cheap reads (treatment, plant info, history) skip admission; false puts every API request through it
+ADMISSION_PRIORITY = os.environ.get("ADMISSION_PRIORITY", "true").lower() == "true"
+
+# Batch Prediction Endpoint Settings (/predict/batch)
+BATCH_PREDICT_MAX_IMAGES = int(os.environ.get("BATCH_PREDICT_MAX_IMAGES", "500"))
+BATCH_PREDICT_CHUNK_SIZE = int(os.environ.get("BATCH_PREDICT_CHUNK_SIZE", str(BATCH_MAX_SIZE)))  # Images per model call
+BATCH_PREDICT_MAX_IMAGE_BYTES = int(os.environ.get("BATCH_PREDICT_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+STREAM_PREDICT_MAX_IMAGES = int(os.environ.get("STREAM_PREDICT_MAX_IMAGES", "10000"))  # For /predict/stream
 
 # Database Settings
 DB_HOST = os.environ.get("DB_HOST", "localhost")
@@ -36,22 +139,43 @@ DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASSWORD = os.environ.get("DB_PASSWORD", "postgres")
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Model Classes and Metadata
-DISEASE_CLASSES = [
-    "Apple___Apple_scab",
-    "Apple___Black_rot",
-    "Apple___Cedar_apple_rust",
-    "Apple___healthy",
-    "Tomato___Early_blight",
-    "Tomato___Late_blight",
-    "Tomato___Leaf_Mold",
-    "Tomato___Septoria_leaf_spot",
-    "Tomato___Spider_mites",
-    "Tomato___Target_Spot",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus",
-    "Tomato___Tomato_mosaic_virus",
-    "Tomato___healthy"
-]
+# Database Connection Pool Settings
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "5"))  # Connections kept open while idle
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get("DB_POOL_HEALTHCHECK_INTERVAL", "30"))  # Idle seconds after which a pooled connection is closed
+
+# Write-behind scan persistence: predictions are answered before their scan row is saved, and rows are
+# inserted in batches from a background thread. Scans queued when the process is killed are lost.
+SCAN_WRITE_BEHIND = os.environ.get("SCAN_WRITE_BEHIND", "false").lower() == "true"
+SCAN_WRITE_BATCH_SIZE = int(os.environ.get("SCAN_WRITE_BATCH_SIZE", "500"))  # Rows per INSERT
+SCAN_WRITE_FLUSH_INTERVAL = float(os.environ.get("SCAN_WRITE_FLUSH_INTERVAL", "0.2"))  # Seconds a row may wait for its batch
+SCAN_WRITE_MAX_PENDING = int(os.environ.get("SCAN_WRITE_MAX_PENDING", "10000"))  # Beyond this, rows are inserted inline
+
+# Response cache for /history/{id}: serialized bodies with strong ETags, answered with 304 on If-None-Match
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "4096"))
+# Cache-Control sent by each read route (treatment and plant info bodies are prebuilt). Scans never change after they are saved, so their detail is immutable.
+RESPONSE_CACHE_CONTROL = {
+    "treatment": os.environ.get("TREATMENT_CACHE_CONTROL", "public, max-age=3600"),
+    "plant-info": os.environ.get("PLANT_INFO_CACHE_CONTROL", "public, max-age=3600"),
+    "history-detail": os.environ.get("HISTORY_DETAIL_CACHE_CONTROL", "private, max-age=31536000, immutable"),
+}
+
+# Prometheus metrics on /metrics: per-stage latency histograms, prediction and error counters, in-flight gauges.
+# Each worker process keeps its own metrics.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+# Sampling profiler (see inference/profiling.py): folded stacks and a stage breakdown of selected requests,
+# written to PROFILING_DIR. Requests are picked at PROFILING_SAMPLE_RATE when enabled, and always when
+# they carry an X-Profile-Token signed with PROFILING_SECRET. With neither set, no middleware is installed.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0.01"))  # Share of requests profiled
+PROFILING_SLOW_THRESHOLD_MS = float(os.environ.get("PROFILING_SLOW_THRESHOLD_MS", "0"))  # Keep only slower sampled requests
+PROFILING_INTERVAL_MS = float(os.environ.get("PROFILING_INTERVAL_MS", "5"))  # Between two stack samples
+PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILING_MAX_PROFILES = int(os.environ.get("PROFILING_MAX_PROFILES", "100"))  # Older profiles are deleted
+PROFILING_SECRET = os.environ.get("PROFILING_SECRET", "")
 
 # Ensure directories exist
 os.makedirs(MEDIA_DIR, exist_ok=True)
@@ -1,2 +0,0 @@
-
-# Empty __init__.py file to make the directory a Python package
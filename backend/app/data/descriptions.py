@@ -1,34 +0,0 @@
-
-# Disease descriptions and treatments
-
-DISEASE_DESCRIPTIONS = {
-    "Apple___Apple_scab": "Apple scab is a fungal disease caused by Venturia inaequalis that affects apple trees.",
-    "Apple___Black_rot": "Black rot is a fungal disease caused by Botryosphaeria obtusa affecting apples.",
-    "Apple___Cedar_apple_rust": "Cedar apple rust is a fungal disease caused by Gymnosporangium juniperi-virginianae.",
-    "Apple___healthy": "This is a healthy apple leaf with no signs of disease.",
-    "Tomato___Early_blight": "Early blight is a fungal disease caused by Alternaria solani affecting tomatoes.",
-    "Tomato___Late_blight": "Late blight is a devastating disease caused by Phytophthora infestans.",
-    "Tomato___Leaf_Mold": "Leaf mold is caused by the fungus Passalora fulva, prevalent in humid conditions.",
-    "Tomato___Septoria_leaf_spot": "Septoria leaf spot is a fungal disease that causes small, circular spots.",
-    "Tomato___Spider_mites": "Spider mites are tiny pests that cause stippling and yellowing of tomato leaves.",
-    "Tomato___Target_Spot": "Target spot is caused by the fungus Corynespora cassiicola.",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "TYLCV is a viral disease transmitted by whiteflies.",
-    "Tomato___Tomato_mosaic_virus": "ToMV is a viral disease causing mottled leaves and stunted growth.",
-    "Tomato___healthy": "This is a healthy tomato leaf with no signs of disease."
-}
-
-DISEASE_TREATMENTS = {
-    "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible. Improve air circulation by proper pruning.",
-    "Apple___Black_rot": "Remove and destroy infected plant parts. Apply fungicides during the growing season. Prune to improve air circulation. Control insects that create wounds for infection.",
-    "Apple___Cedar_apple_rust": "Remove nearby cedar or juniper trees if possible. Apply fungicides in spring. Use resistant apple varieties. Keep the orchard clean of debris.",
-    "Apple___healthy": "Continue good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues.",
-    "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops. Use resistant varieties if available.",
-    "Tomato___Late_blight": "Apply fungicides preventatively. Remove infected plants immediately. Avoid overhead irrigation. Ensure good air circulation. Plant resistant varieties.",
-    "Tomato___Leaf_Mold": "Improve air circulation. Reduce humidity. Apply fungicides. Remove infected leaves. Avoid overhead watering. Use resistant varieties.",
-    "Tomato___Septoria_leaf_spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Use mulch to prevent soil splash. Rotate crops. Clean up debris in fall.",
-    "Tomato___Spider_mites": "Spray plants with water to dislodge mites. Apply insecticidal soap or neem oil. Introduce predatory mites. Maintain proper humidity levels.",
-    "Tomato___Target_Spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Ensure proper plant spacing for air circulation. Rotate crops.",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Control whitefly populations. Remove and destroy infected plants. Use reflective mulches. Plant resistant varieties. Use physical barriers like row covers.",
-    "Tomato___Tomato_mosaic_virus": "Remove and destroy infected plants. Control aphids. Wash hands and tools after handling infected plants. Plant resistant varieties. Avoid working in wet gardens.",
-    "Tomato___healthy": "Maintain good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues."
-}
@@ -1,73 +1,241 @@
 
+import asyncio
 import datetime
-from typing import List, Dict, Any, Optional
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from .config import DATABASE_URL
-
-# Connect to the PostgreSQL database
-def get_db_connection():
-    """Create a connection to the PostgreSQL database."""
-    conn = psycopg2.connect(DATABASE_URL)
-    conn.autocommit = True
-    return conn
-
-def initialize_database():
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import asyncpg
+from .config import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_HEALTHCHECK_INTERVAL,
+    SCAN_WRITE_BEHIND,
+    SCAN_WRITE_BATCH_SIZE,
+    SCAN_WRITE_FLUSH_INTERVAL,
+    SCAN_WRITE_MAX_PENDING,
+)
+from inference.metrics import STAGE_DB_WRITE, stage
+from inference.writebehind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# Shared asyncpg pool, created once by init_db_pool() on the application's event loop
+_pool: Optional[asyncpg.Pool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool_lock = asyncio.Lock()
+
+SCAN_COLUMNS = "id, image_url as image, disease, confidence, model_version, timestamp"
+
+async def init_db_pool():
+    """Create the PostgreSQL connection pool if it doesn't exist yet."""
+    global _pool, _pool_loop
+    async with _pool_lock:
+        if _pool is not None:
+            return
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            # Close connections idle for longer than this instead of finding out they went stale on checkout
+            max_inactive_connection_lifetime=DB_POOL_HEALTHCHECK_INTERVAL
+        )
+        _pool_loop = asyncio.get_running_loop()
+        logger.info(f"Database pool ready (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+
+async def close_db_pool():
+    """Close every connection in the pool."""
+    global _pool, _pool_loop
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+            _pool_loop = None
+
+async def _get_pool() -> asyncpg.Pool:
+    if _pool is None:
+        await init_db_pool()
+    return _pool
+
+async def initialize_database():
     """Initialize the database by creating required tables if they don't exist."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Create plant_scans table if it doesn't exist
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS plant_scans (
-        id VARCHAR(36) PRIMARY KEY,
-        image_url VARCHAR(255) NOT NULL,
-        disease VARCHAR(255) NOT NULL,
-        confidence FLOAT NOT NULL,
-        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+    pool = await _get_pool()
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        # Create plant_scans table if it doesn't exist
+        await conn.execute("""
+        CREATE TABLE IF NOT EXISTS plant_scans (
+            id VARCHAR(36) PRIMARY KEY,
+            image_url VARCHAR(255) NOT NULL,
+            disease VARCHAR(255) NOT NULL,
+            confidence FLOAT NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
 
-def add_scan(scan_id: str, image_url: str, disease: str, confidence: float) -> None:
+        # Version of the model that produced each scan; empty for scans saved before versions were recorded
+        await conn.execute("ALTER TABLE plant_scans ADD COLUMN IF NOT EXISTS model_version VARCHAR(64) NOT NULL DEFAULT ''")
+
+        # Composite indexes backing keyset pagination of the history, optionally filtered by disease
+        await conn.execute("""
+        CREATE INDEX IF NOT EXISTS plant_scans_timestamp_id_idx
+            ON plant_scans (timestamp DESC, id DESC)
+        """)
+        await conn.execute("""
+        CREATE INDEX IF NOT EXISTS plant_scans_disease_timestamp_id_idx
+            ON plant_scans (disease, timestamp DESC, id DESC)
+        """)
+
+async def add_scan(scan_id: str, image_url: str, disease: str, confidence: float, model_version: Optional[str] = None) -> None:
     """Add a new scan to the database."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute(
-        "INSERT INTO plant_scans (id, image_url, disease, confidence, timestamp) VALUES (%s, %s, %s, %s, %s)",
-        (scan_id, image_url, disease, confidence, datetime.datetime.now())
+    pool = await _get_pool()
+    await pool.execute(
+        "INSERT INTO plant_scans (id, image_url, disease, confidence, model_version, timestamp) VALUES ($1, $2, $3, $4, $5, $6)",
+        scan_id, image_url, disease, confidence, model_version or "", datetime.datetime.now(),
+        timeout=DB_POOL_TIMEOUT
     )
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def get_all_scans() -> List[Dict[str, Any]]:
-    """Get all scans from the database."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    cur.execute("SELECT id, image_url as image, disease, confidence, timestamp FROM plant_scans ORDER BY timestamp DESC")
-    scans = cur.fetchall()
-    
-    cur.close()
-    conn.close()
-    
-    return scans
-
-def get_scan_by_id(scan_id: str) -> Optional[Dict[str, Any]]:
+
+async def add_scans(scans: List[Tuple[str, str, str, float, Optional[str]]]) -> None:
+    """Add many scans in a single COPY. Each scan is (scan_id, image_url, disease, confidence, model_version)."""
+    now = datetime.datetime.now()
+    await _insert_scan_rows([(*scan, now) for scan in scans])
+
+async def _insert_scan_rows(rows: List[Tuple[str, str, str, float, Optional[str], datetime.datetime]]) -> None:
+    # Rows are (scan_id, image_url, disease, confidence, model_version, timestamp)
+    if not rows:
+        return
+    pool = await _get_pool()
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        await conn.copy_records_to_table(
+            "plant_scans",
+            records=[
+                (scan_id, image_url, disease, confidence, model_version or "", timestamp)
+                for scan_id, image_url, disease, confidence, model_version, timestamp in rows
+            ],
+            columns=["id", "image_url", "disease", "confidence", "model_version", "timestamp"]
+        )
+
+async def get_all_scans() -> List[Dict[str, Any]]:
+    """Get all scans from the database. Unbounded; use get_scans_page for API responses."""
+    pool = await _get_pool()
+    rows = await pool.fetch(f"SELECT {SCAN_COLUMNS} FROM plant_scans ORDER BY timestamp DESC", timeout=DB_POOL_TIMEOUT)
+    return [dict(row) for row in rows]
+
+def _naive_local(value: datetime.datetime) -> datetime.datetime:
+    # Scans are stamped with naive local time in a TIMESTAMP column, and asyncpg cannot bind aware datetimes to it
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+async def get_scans_page(
+    limit: int,
+    after: Optional[Tuple[datetime.datetime, str]] = None,
+    disease: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime.datetime, str]]]:
+    """
+    Get one page of scans, newest first, using keyset pagination on (timestamp, id).
+
+    Args:
+        limit: Maximum number of scans to return
+        after: (timestamp, id) of the last scan of the previous page, if any
+        disease: Only return scans with this disease
+        since: Only return scans taken at or after this time; aware times are converted to local time
+        until: Only return scans taken before this time
+
+    Returns:
+        tuple: (scans, key of the last scan to pass as `after` for the next page, or None)
+    """
+    conditions = []
+    params: List[Any] = []
+
+    def param(value: Any) -> str:
+        params.append(value)
+        return f"${len(params)}"
+
+    if after is not None:
+        conditions.append(f"(timestamp, id) < ({param(_naive_local(after[0]))}, {param(after[1])})")
+    if disease is not None:
+        conditions.append(f"disease = {param(disease)}")
+    if since is not None:
+        conditions.append(f"timestamp >= {param(_naive_local(since))}")
+    if until is not None:
+        conditions.append(f"timestamp < {param(_naive_local(until))}")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # Fetch one extra row to know whether there is a next page
+    query = f"""
+        SELECT {SCAN_COLUMNS} FROM plant_scans
+        {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT {param(limit + 1)}
+    """
+
+    pool = await _get_pool()
+    scans = [dict(row) for row in await pool.fetch(query, *params, timeout=DB_POOL_TIMEOUT)]
+
+    if len(scans) <= limit:
+        return scans, None
+
+    scans = scans[:limit]
+    last = scans[-1]
+    return scans, (last["timestamp"], last["id"])
+
+async def get_scan_by_id(scan_id: str) -> Optional[Dict[str, Any]]:
     """Get a specific scan by its ID."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    cur.execute("SELECT id, image_url as image, disease, confidence, timestamp FROM plant_scans WHERE id = %s", (scan_id,))
-    scan = cur.fetchone()
-    
-    cur.close()
-    conn.close()
-    
-    return scan
+    pool = await _get_pool()
+    row = await pool.fetchrow(f"SELECT {SCAN_COLUMNS} FROM plant_scans WHERE id = $1", scan_id, timeout=DB_POOL_TIMEOUT)
+    return dict(row) if row is not None else None
+
+def _write_scan_rows(rows: List[Tuple[str, str, str, float, Optional[str], datetime.datetime]]) -> None:
+    # Called on the writer thread: run the COPY on the pool's event loop and wait for it
+    asyncio.run_coroutine_threadsafe(_insert_scan_rows(rows), _pool_loop).result()
+
+# Background writer used when SCAN_WRITE_BEHIND is on
+_scan_writer: Optional[WriteBehindQueue] = None
+_scan_writer_lock = threading.Lock()
+
+def get_scan_writer() -> WriteBehindQueue:
+    """Return the write-behind queue of scan rows, creating it on first use."""
+    global _scan_writer
+    if _scan_writer is None:
+        with _scan_writer_lock:
+            if _scan_writer is None:
+                _scan_writer = WriteBehindQueue(
+                    _write_scan_rows,
+                    max_batch=SCAN_WRITE_BATCH_SIZE,
+                    flush_interval=SCAN_WRITE_FLUSH_INTERVAL,
+                    max_pending=SCAN_WRITE_MAX_PENDING,
+                    name="scan-writer"
+                )
+    return _scan_writer
+
+def close_scan_writer() -> None:
+    """
+    Write every queued scan and stop the background writer. Call before close_db_pool().
+
+    The writes run on the event loop, so from a coroutine call this through
+    asyncio.to_thread() rather than blocking the loop on it.
+    """
+    global _scan_writer
+    with _scan_writer_lock:
+        if _scan_writer is not None:
+            _scan_writer.close()
+            _scan_writer = None
+
+async def save_scans(scans: List[Tuple[str, str, str, float, Optional[str]]]) -> None:
+    """
+    Persist scans, queued for a batched background COPY with SCAN_WRITE_BEHIND or inserted right away otherwise.
+
+    Each scan is (scan_id, image_url, disease, confidence, model_version).
+    """
+    # Stamped now so that the history keeps prediction time and order, however late the batch is written
+    now = datetime.datetime.now()
+    rows = [(*scan, now) for scan in scans]
+    with stage(STAGE_DB_WRITE):
+        if SCAN_WRITE_BEHIND and get_scan_writer().offer(rows):
+            return
+        # Write-behind is off or its queue is full: insert as part of this request
+        await _insert_scan_rows(rows)
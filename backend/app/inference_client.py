@@ -0,0 +1,38 @@
+
+import threading
+from typing import Optional
+
+from .config import (
+    TF_SERVING_POOL_SIZE,
+    TF_SERVING_CONNECT_TIMEOUT,
+    TF_SERVING_READ_TIMEOUT,
+    TF_SERVING_MAX_RETRIES,
+    TF_SERVING_RETRY_BACKOFF,
+)
+from inference.client import InferenceClient
+
+# Process-wide client shared by all transports and health checks
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+def get_inference_client() -> InferenceClient:
+    """Return the shared inference client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    pool_size=TF_SERVING_POOL_SIZE,
+                    connect_timeout=TF_SERVING_CONNECT_TIMEOUT,
+                    read_timeout=TF_SERVING_READ_TIMEOUT,
+                    max_retries=TF_SERVING_MAX_RETRIES,
+                    retry_backoff=TF_SERVING_RETRY_BACKOFF
+                )
+    return _client
+
+async def close_inference_client() -> None:
+    """Close pooled connections of the shared client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,47 @@
+
+from fastapi import APIRouter, Response
+
+from .config import SCAN_WRITE_BEHIND
+from .database import get_scan_writer
+from inference.metrics import CONTENT_TYPE, QUEUE_DEPTH, record_error, render, set_gauge_function, track_request
+from ml_model import get_preprocess_pool
+
+# Queue depths are read when /metrics is scraped (and every second in each worker in multiprocess mode)
+set_gauge_function(QUEUE_DEPTH, lambda: get_preprocess_pool().pending, "preprocess")
+set_gauge_function(QUEUE_DEPTH, lambda: get_scan_writer().depth if SCAN_WRITE_BEHIND else 0, "scan_writer")
+
+class MetricsMiddleware:
+    """ASGI middleware recording the duration, status and in-flight count of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_request(scope["method"]) as result:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    result["status"] = str(message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            except Exception as e:
+                record_error(e)
+                raise
+            finally:
+                # Set by the router; the path template (e.g. /api/history/{scan_id}) keeps the label bounded
+                route = scope.get("route")
+                if route is not None:
+                    result["endpoint"] = route.path
+
+# Mounted at the root, next to the API routes
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus text exposition format
+    return Response(content=render(), media_type=CONTENT_TYPE)
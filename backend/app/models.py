@@ -26,6 +26,7 @@ class PredictionResponse(BaseModel):
     description: str
     treatment: str
     sources: Optional[List[Dict[str, str]]] = None
+    modelVersion: Optional[str] = None
 
 class ScanResponse(BaseModel):
     id: str
@@ -33,3 +34,12 @@ class ScanResponse(BaseModel):
     confidence: float
     timestamp: str
     imageUrl: str
+    modelVersion: Optional[str] = None
+
+class BatchPredictionItem(BaseModel):
+    filename: str
+    result: Optional[PredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchPredictionItem]
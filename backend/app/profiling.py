@@ -0,0 +1,78 @@
+
+import threading
+
+from .config import (
+    PROFILING_DIR,
+    PROFILING_ENABLED,
+    PROFILING_INTERVAL_MS,
+    PROFILING_MAX_PROFILES,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_SECRET,
+    PROFILING_SLOW_THRESHOLD_MS
+)
+from inference.metrics import collect_stages
+from inference.profiling import PROFILE_HEADER, RequestProfiler
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+def get_profiler() -> RequestProfiler:
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = RequestProfiler(
+                    PROFILING_DIR,
+                    sample_rate=PROFILING_SAMPLE_RATE if PROFILING_ENABLED else 0.0,
+                    slow_threshold_ms=PROFILING_SLOW_THRESHOLD_MS,
+                    interval_ms=PROFILING_INTERVAL_MS,
+                    max_profiles=PROFILING_MAX_PROFILES,
+                    secret=PROFILING_SECRET,
+                )
+    return _profiler
+
+def close_profiler():
+    """Write the profiles still queued."""
+    if _profiler is not None:
+        _profiler.close()
+
+_HEADER_KEY = PROFILE_HEADER.lower().encode("latin-1")
+
+class ProfilingMiddleware:
+    """ASGI middleware sampling the stacks of selected requests and writing their profiles after the response."""
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = get_profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for key, value in scope["headers"]:
+            if key == _HEADER_KEY:
+                token = value.decode("latin-1")
+                break
+        # Requests interleave on the event loop thread, so there is no thread of their own to single out
+        session = self.profiler.start(token)
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        info = {"method": scope["method"], "path": scope["path"], "endpoint": None, "status": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                info["status"] = message["status"]
+            await send(message)
+
+        with collect_stages() as stages:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    info["endpoint"] = route.path
+                self.profiler.finish(session, stages, info)
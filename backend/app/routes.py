@@ -1,46 +1,111 @@
-import os
+import asyncio
+import datetime
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from collections import deque
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from typing import AsyncIterator, List, Optional, Tuple
 
-from .config import API_V1_STR, UPLOAD_DIR, TEMP_DIR
-from .models import TreatmentResponse, PlantInfoResponse, PredictionResponse, ScanResponse
-from .database import add_scan, get_all_scans, get_scan_by_id
-from .utils import save_uploaded_image, get_demo_sources, get_demo_treatments, get_demo_plants_info
-from ml_model import predict_leaf_disease
+from .config import (
+    API_V1_STR,
+    PERSIST_UPLOADS,
+    HISTORY_PAGE_SIZE,
+    HISTORY_MAX_PAGE_SIZE,
+    PREDICTION_CACHE_ENABLED,
+    BATCH_PREDICT_MAX_IMAGES,
+    BATCH_PREDICT_MAX_IMAGE_BYTES,
+    BATCH_PREDICT_CHUNK_SIZE,
+    STREAM_PREDICT_MAX_IMAGES,
+    SCAN_WRITE_BEHIND,
+    INFERENCE_BACKEND,
+)
+from .circuit import check_tf_serving, circuit_status
+from .cache import get_prediction_cache, get_response_cache, make_cache_key
+from .models import (
+    TreatmentResponse,
+    PlantInfoResponse,
+    PredictionResponse,
+    BatchPredictionResponse,
+    ScanResponse,
+)
+from .database import save_scans, get_scan_writer, get_scans_page, get_scan_by_id
+from .utils import (
+    validate_uploaded_image,
+    build_image_path,
+    write_image_file,
+    encode_cursor,
+    decode_cursor,
+)
+from inference.archives import extract_images_from_zip, iter_images_from_zip
+from inference.circuit import OPEN, CircuitOpenError
+from inference.http_cache import JsonFragment, etag_matches, json_fragment
+from inference.metadata import DEMO_SOURCES, plant_info_response, treatment_response
+from inference.metrics import STAGE_UPLOAD_READ, stage
+from inference.registry import ModelNotFoundError
+from inference.streaming import STREAM_HEADERS, encode_stream_event, stream_media_type, wants_event_stream
+from inference.workers import PoolSaturatedError
+from ml_model import (
+    check_model_version_async,
+    current_model_version,
+    predict_leaf_disease_async,
+    predict_leaf_disease_many_async,
+    iter_leaf_disease_predictions_async,
+)
 
 # Initialize router
 router = APIRouter(prefix=API_V1_STR)
 
 @router.post("/predict", response_model=PredictionResponse)
-async def predict_plant_disease(image: UploadFile = File(...)):
-    temp_file_path, permanent_file_path = save_uploaded_image(image)
+async def predict_plant_disease(
+    background_tasks: BackgroundTasks,
+    image: UploadFile = File(...),
+    version: Optional[str] = Query(None, description="Model version to use; the newest loaded version by default")
+):
+    validate_uploaded_image(image)
     
     try:
-        contents = await image.read()
-        with open(temp_file_path, "wb") as f:
-            f.write(contents)
+        with stage(STAGE_UPLOAD_READ):
+            contents = await image.read()
+        model_version = current_model_version(version)
         
-        # Make prediction using TensorFlow Serving
-        prediction_result = predict_leaf_disease(temp_file_path)
+        # Re-uploads of the same photo are answered from the prediction cache, which
+        # skips preprocessing, inference and writing another copy of the image
+        cache_key = make_cache_key(contents, model_version) if PREDICTION_CACHE_ENABLED and model_version else None
+        prediction_result = await get_prediction_cache().get(cache_key)
         
-        # Check if there was an error
-        if 'error' in prediction_result:
-            raise HTTPException(status_code=500, detail=prediction_result['error'])
-        
-        # Save to permanent location
-        os.rename(temp_file_path, permanent_file_path)
+        if prediction_result is not None:
+            image_url = prediction_result['image_url']
+        else:
+            # Decode straight from the uploaded bytes; nothing is written to disk on the latency path
+            prediction_result = await predict_leaf_disease_async(contents, model_version)
+            
+            # Check if there was an error
+            if 'error' in prediction_result:
+                raise HTTPException(status_code=500, detail=prediction_result['error'])
+            
+            # Keep the original image for the history, written after the response is sent
+            image_url = ""
+            if PERSIST_UPLOADS:
+                file_path, image_url = build_image_path(image.filename)
+                background_tasks.add_task(write_image_file, file_path, contents)
+            
+            if cache_key:
+                await get_prediction_cache().set(cache_key, {
+                    "disease": prediction_result['disease'],
+                    "confidence": prediction_result['confidence'],
+                    "description": prediction_result['description'],
+                    "treatment": prediction_result['treatment'],
+                    "image_url": image_url,
+                    "model_version": prediction_result['model_version']
+                })
         
-        # Get the relative path for the URL
-        relative_path = permanent_file_path.replace("media/", "")
-        image_url = f"/media/{relative_path}"
-        
-        # Save scan to database
+        # Save scan to database, with the model version that produced it
         scan_id = str(uuid.uuid4())
-        add_scan(scan_id, image_url, prediction_result['disease'], prediction_result['confidence'])
+        await save_scans([(scan_id, image_url, prediction_result['disease'], prediction_result['confidence'], prediction_result['model_version'])])
         
         # Add sources (demo data)
-        sources = get_demo_sources()
+        sources = DEMO_SOURCES
         
         # Prepare response data
         response_data = {
@@ -48,94 +113,387 @@ async def predict_plant_disease(image: UploadFile = File(...)):
             "confidence": prediction_result['confidence'],
             "description": prediction_result['description'],
             "treatment": prediction_result['treatment'],
-            "sources": sources
+            "sources": sources,
+            "modelVersion": prediction_result['model_version']
         }
         
         return response_data
     
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    except (PoolSaturatedError, CircuitOpenError) as e:
+        # Too many images already waiting to be decoded, or TensorFlow Serving is down; ask the client to back off
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_plant_disease_batch(
+    background_tasks: BackgroundTasks,
+    images: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    version: Optional[str] = Query(None, description="Model version to use; the newest loaded version by default")
+):
+    # Many images in one request, either as repeated `images` parts or as one zip `archive`
+    try:
+        uploads = []
+        for image in images or []:
+            validate_uploaded_image(image)
+            with stage(STAGE_UPLOAD_READ):
+                contents = await image.read()
+            if len(contents) > BATCH_PREDICT_MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=400, detail=f"{image.filename} is larger than {BATCH_PREDICT_MAX_IMAGE_BYTES} bytes")
+            uploads.append((image.filename or "", contents))
+        
+        if archive is not None:
+            try:
+                # Decompressing the whole archive is blocking work; keep it off the event loop
+                uploads.extend(await asyncio.to_thread(
+                    extract_images_from_zip,
+                    archive.file,
+                    max_images=max(0, BATCH_PREDICT_MAX_IMAGES - len(uploads)),
+                    max_image_bytes=BATCH_PREDICT_MAX_IMAGE_BYTES
+                ))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No images uploaded")
+        if len(uploads) > BATCH_PREDICT_MAX_IMAGES:
+            raise HTTPException(status_code=400, detail=f"At most {BATCH_PREDICT_MAX_IMAGES} images can be predicted per request")
+        
+        # Answer what we can from the prediction cache and send only the misses to the model
+        model_version = current_model_version(version)
+        cache = get_prediction_cache()
+        cache_keys = [
+            make_cache_key(contents, model_version) if PREDICTION_CACHE_ENABLED and model_version else None
+            for _, contents in uploads
+        ]
+        cached = await cache.get_many(cache_keys)
+        misses = [i for i, entry in enumerate(cached) if entry is None]
+        predicted = await predict_leaf_disease_many_async([uploads[i][1] for i in misses], model_version=model_version) if misses else []
+        
+        prediction_results = list(cached)
+        for i, prediction_result in zip(misses, predicted):
+            prediction_results[i] = prediction_result
+            if 'error' in prediction_result:
+                continue
+            
+            filename, contents = uploads[i]
+            image_url = ""
+            if PERSIST_UPLOADS:
+                file_path, image_url = build_image_path(filename)
+                background_tasks.add_task(write_image_file, file_path, contents)
+            prediction_result['image_url'] = image_url
+            
+            if cache_keys[i]:
+                await cache.set(cache_keys[i], {
+                    "disease": prediction_result['disease'],
+                    "confidence": prediction_result['confidence'],
+                    "description": prediction_result['description'],
+                    "treatment": prediction_result['treatment'],
+                    "image_url": image_url,
+                    "model_version": prediction_result['model_version']
+                })
+        
+        # One multi-row INSERT for the whole batch
+        sources = DEMO_SOURCES
+        scans = []
+        results = []
+        for (filename, _), prediction_result in zip(uploads, prediction_results):
+            if 'error' in prediction_result:
+                results.append({"filename": filename, "error": prediction_result['error']})
+                continue
+            
+            scans.append((
+                str(uuid.uuid4()),
+                prediction_result['image_url'],
+                prediction_result['disease'],
+                prediction_result['confidence'],
+                prediction_result['model_version']
+            ))
+            results.append({
+                "filename": filename,
+                "result": {
+                    "disease": prediction_result['disease'],
+                    "confidence": prediction_result['confidence'],
+                    "description": prediction_result['description'],
+                    "treatment": prediction_result['treatment'],
+                    "sources": sources,
+                    "modelVersion": prediction_result['model_version']
+                }
+            })
+        await save_scans(scans)
+        
+        return {"results": results}
+    
+    except HTTPException:
+        raise
+    
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    except (PoolSaturatedError, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
     except Exception as e:
-        # Clean up temporary file if it exists
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
         raise HTTPException(status_code=500, detail=str(e))
+
+async def stream_predictions(uploads: AsyncIterator[Tuple[str, bytes]], sse: bool, model_version: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Predict uploads one chunk at a time and yield each image's result as soon as it is known.
+    
+    Uploads are read lazily, cache hits are emitted straight away and scans are
+    saved one chunk at a time, so neither the images nor the results of the whole
+    request are ever held in memory together.
+    """
+    cache = get_prediction_cache()
+    loop = asyncio.get_running_loop()
+    sources = DEMO_SOURCES
+    hits = deque()    # (index, filename, cached result) waiting to be emitted
+    misses = deque()  # (index, filename, contents, cache key) sent to the model, in order
+    writes = []       # uploads being saved to disk, awaited before the stream ends
+    scans = []
+    count = 0
+    
+    async def uncached_images():
+        index = 0
+        async for filename, contents in uploads:
+            cache_key = make_cache_key(contents, model_version) if PREDICTION_CACHE_ENABLED and model_version else None
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                hits.append((index, filename, cached))
+            else:
+                misses.append((index, filename, contents, cache_key))
+                yield contents
+            index += 1
+    
+    def emit(index, filename, prediction_result):
+        if 'error' in prediction_result:
+            return encode_stream_event({"index": index, "filename": filename, "error": prediction_result['error']}, sse)
+        scans.append((
+            str(uuid.uuid4()),
+            prediction_result['image_url'],
+            prediction_result['disease'],
+            prediction_result['confidence'],
+            prediction_result['model_version']
+        ))
+        return encode_stream_event({
+            "index": index,
+            "filename": filename,
+            "result": {
+                "disease": prediction_result['disease'],
+                "confidence": prediction_result['confidence'],
+                "description": prediction_result['description'],
+                "treatment": prediction_result['treatment'],
+                "sources": sources,
+                "modelVersion": prediction_result['model_version']
+            }
+        }, sse)
+    
+    try:
+        async for prediction_result in iter_leaf_disease_predictions_async(uncached_images(), model_version=model_version):
+            while hits:
+                yield emit(*hits.popleft())
+                count += 1
+            
+            index, filename, contents, cache_key = misses.popleft()
+            if 'error' not in prediction_result:
+                image_url = ""
+                if PERSIST_UPLOADS:
+                    file_path, image_url = build_image_path(filename)
+                    writes.append(loop.run_in_executor(None, write_image_file, file_path, contents))
+                prediction_result['image_url'] = image_url
+                
+                if cache_key:
+                    await cache.set(cache_key, {
+                        "disease": prediction_result['disease'],
+                        "confidence": prediction_result['confidence'],
+                        "description": prediction_result['description'],
+                        "treatment": prediction_result['treatment'],
+                        "image_url": image_url,
+                        "model_version": prediction_result['model_version']
+                    })
+            
+            yield emit(index, filename, prediction_result)
+            count += 1
+            
+            if len(scans) >= BATCH_PREDICT_CHUNK_SIZE:
+                await save_scans(scans)
+                scans = []
+        
+        while hits:
+            yield emit(*hits.popleft())
+            count += 1
+        
+        if sse:
+            yield encode_stream_event({"count": count}, sse, event="done")
+    
+    except ModelNotFoundError as e:
+        yield encode_stream_event({"error": str(e), "completed": count}, sse, event="error")
+    
+    except (PoolSaturatedError, CircuitOpenError) as e:
+        # The status line is already sent; tell the client in-band when to retry the rest
+        yield encode_stream_event({"error": str(e), "retry_after": e.retry_after, "completed": count}, sse, event="error")
+    
+    except Exception as e:
+        yield encode_stream_event({"error": str(e), "completed": count}, sse, event="error")
     
     finally:
-        # Clean up temporary file if it exists
-        if os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
+        if scans:
+            await save_scans(scans)
+        # Finish the image writes before the request ends, rather than leaving them unowned in the executor
+        if writes:
+            await asyncio.gather(*writes, return_exceptions=True)
 
-@router.get("/treatment/{disease}", response_model=TreatmentResponse)
-async def get_treatment(disease: str):
-    # Demo treatment data
-    treatments = get_demo_treatments()
+@router.post("/predict/stream")
+async def predict_plant_disease_stream(
+    request: Request,
+    images: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    version: Optional[str] = Query(None, description="Model version to use; the newest loaded version by default")
+):
+    # Like /predict/batch, but results are streamed as NDJSON, or as server-sent events
+    # when the client sends `Accept: text/event-stream`
+    images = images or []
+    for image in images:
+        validate_uploaded_image(image)
+        if image.size is not None and image.size > BATCH_PREDICT_MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=400, detail=f"{image.filename} is larger than {BATCH_PREDICT_MAX_IMAGE_BYTES} bytes")
     
-    treatment = treatments.get(disease, "No specific treatment found for this disease.")
+    archive_images = iter(())
+    if archive is not None:
+        try:
+            archive_images = iter_images_from_zip(
+                archive.file,
+                max_images=max(0, STREAM_PREDICT_MAX_IMAGES - len(images)),
+                max_image_bytes=BATCH_PREDICT_MAX_IMAGE_BYTES
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif not images:
+        raise HTTPException(status_code=400, detail="No images uploaded")
+    if len(images) > STREAM_PREDICT_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {STREAM_PREDICT_MAX_IMAGES} images can be predicted per request")
     
+    async def uploads():
+        # Read each spooled upload only when the model is about to need it, in a thread
+        # like the archive members, which are decompressed one at a time
+        for image in images:
+            with stage(STAGE_UPLOAD_READ):
+                contents = await asyncio.to_thread(image.file.read)
+            yield image.filename or "", contents
+        async for member in iterate_in_threadpool(archive_images):
+            yield member
+    
+    try:
+        check_tf_serving()
+        await check_model_version_async(version)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    sse = wants_event_stream(request.headers.get("accept"))
+    # One version for the whole stream, even if a new one is swapped in meanwhile
+    model_version = current_model_version(version)
+    return StreamingResponse(stream_predictions(uploads(), sse, model_version), media_type=stream_media_type(sse), headers=STREAM_HEADERS)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    # Hit/miss counters of the prediction cache, and of the read response cache under "responses"
+    stats = get_prediction_cache().stats()
+    stats["responses"] = get_response_cache().stats()
+    return stats
+
+@router.get("/scan-writer/stats")
+async def get_scan_writer_stats():
+    # Queue depth and counters of the write-behind scan writer (SCAN_WRITE_BEHIND)
+    if not SCAN_WRITE_BEHIND:
+        return {"enabled": False}
+    return {"enabled": True, **get_scan_writer().stats()}
+
+@router.get("/health")
+async def get_health():
+    # Liveness plus the TensorFlow Serving circuit breaker; "degraded" while it is open and predictions fail fast
+    circuit = circuit_status()
     return {
-        "disease": disease,
-        "treatment": treatment,
-        "steps": [
-            "Remove all infected leaves and dispose of them properly.",
-            "Apply appropriate fungicide according to label instructions.",
-            "Improve air circulation around plants.",
-            "Water at the base of plants to avoid wetting foliage.",
-            "Rotate crops in future growing seasons."
-        ]
+        "status": "degraded" if circuit is not None and circuit["state"] == OPEN else "ok",
+        "backend": INFERENCE_BACKEND,
+        "circuit": circuit
     }
 
+def cached_response(request: Request, route: str, fragment: JsonFragment) -> Response:
+    """Serve a cached response body with its ETag and the route's Cache-Control, or 304 when the client already has it."""
+    headers = get_response_cache().headers(route, fragment)
+    if etag_matches(request.headers.get("if-none-match"), fragment.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=fragment.body, media_type="application/json", headers=headers)
+
+@router.get("/treatment/{disease}", response_model=TreatmentResponse)
+async def get_treatment(request: Request, disease: str):
+    # Demo treatment data, prebuilt with its ETag for the known diseases
+    fragment = treatment_response(disease)
+    return cached_response(request, "treatment", fragment)
+
 @router.get("/plant-info/{plant_name}", response_model=PlantInfoResponse)
-async def get_plant_info(plant_name: str):
-    # Demo plant info data
-    plants_info = get_demo_plants_info()
-    
-    plant_info = plants_info.get(plant_name.lower(), {
-        "name": plant_name.capitalize(),
-        "scientificName": "Not available",
-        "care": {
-            "water": "General care information not available",
-            "sunlight": "General care information not available",
-            "temperature": "General care information not available",
-            "airflow": "General care information not available"
-        },
-        "preventionTips": [
-            "Use disease-resistant varieties",
-            "Practice crop rotation",
-            "Maintain good air circulation",
-            "Water properly, avoiding wet foliage",
-            "Monitor regularly for early detection of issues"
-        ]
-    })
-    
-    return plant_info
+async def get_plant_info(request: Request, plant_name: str):
+    # Demo plant info data, prebuilt with its ETag for the known plants
+    fragment = plant_info_response(plant_name)
+    return cached_response(request, "plant-info", fragment)
 
 @router.get("/history", response_model=List[ScanResponse])
-async def get_scan_history():
-    # Convert our in-memory database to response format
+async def get_scan_history(
+    request: Request,
+    response: Response,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    disease: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+):
+    # One page of history, newest first. The cursor for the next page is returned in
+    # the X-Next-Cursor and Link headers so that the body stays a plain list.
+    after = decode_cursor(cursor) if cursor else None
+    page, next_key = await get_scans_page(limit, after=after, disease=disease, since=since, until=until)
+    
+    if next_key is not None:
+        next_cursor = encode_cursor(next_key)
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    
+    # Convert database rows to response format
     scans = []
-    for scan in get_all_scans():
+    for scan in page:
         scans.append({
             "id": scan["id"],
             "disease": scan["disease"],
             "confidence": scan["confidence"],
-            "timestamp": scan["timestamp"],
-            "imageUrl": scan["image"]
+            "timestamp": scan["timestamp"].isoformat(),
+            "imageUrl": scan["image"],
+            "modelVersion": scan["model_version"] or None
         })
     return scans
 
 @router.get("/history/{scan_id}", response_model=ScanResponse)
-async def get_scan_detail(scan_id: str):
-    # Find scan in our in-memory database
-    scan = get_scan_by_id(scan_id)
-    if scan:
-        return {
-            "id": scan["id"],
-            "disease": scan["disease"],
-            "confidence": scan["confidence"],
-            "timestamp": scan["timestamp"],
-            "imageUrl": scan["image"]
-        }
-    
-    raise HTTPException(status_code=404, detail="Scan not found")
+async def get_scan_detail(request: Request, scan_id: str):
+    # Scans never change once saved, so a scan is looked up and serialized once and then served from the cache
+    cache = get_response_cache()
+    fragment = cache.get("history-detail", scan_id)
+    if fragment is None:
+        scan = await get_scan_by_id(scan_id)
+        if scan is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        fragment = json_fragment(ScanResponse(
+            id=scan["id"],
+            disease=scan["disease"],
+            confidence=scan["confidence"],
+            timestamp=scan["timestamp"].isoformat(),
+            imageUrl=scan["image"],
+            modelVersion=scan["model_version"] or None
+        ).model_dump())
+        cache.put("history-detail", scan_id, fragment)
+    return cached_response(request, "history-detail", fragment)
@@ -0,0 +1,69 @@
+
+import logging
+from typing import Optional
+
+from .config import (
+    TF_SERVING_URL,
+    TF_SERVING_HOST,
+    TF_SERVING_GRPC_PORT,
+    TF_SERVING_MODEL_NAME,
+    TF_SERVING_SIGNATURE_NAME,
+    TF_SERVING_INPUT_NAME,
+    TF_SERVING_TRANSPORT,
+    TF_SERVING_READ_TIMEOUT,
+    INFERENCE_BACKEND,
+    INFERENCE_MODEL_DIR,
+    INFERENCE_MODEL_PATH,
+    INFERENCE_PRECISION,
+    INFERENCE_NUM_THREADS,
+    INFERENCE_INTER_OP_THREADS,
+)
+from .circuit import get_circuit_breaker
+from .inference_client import get_inference_client
+from inference.backends import TFServingRestBackend, create_backend, default_model_path
+from inference.registry import tf_serving_version_url
+from inference.transport import InProcessTransport, Transport, create_tf_serving_transport, transport_class
+
+logger = logging.getLogger(__name__)
+
+def transport_input_kind(name: str = TF_SERVING_TRANSPORT, backend: str = INFERENCE_BACKEND) -> str:
+    """The kind of instance the configured transport expects, known without creating it."""
+    if backend != TFServingRestBackend.name:
+        return InProcessTransport.input_kind
+    return transport_class(name).input_kind
+
+def create_transport(
+    name: str = TF_SERVING_TRANSPORT,
+    backend: str = INFERENCE_BACKEND,
+    model_path: Optional[str] = None,
+    version: Optional[str] = None,
+) -> Transport:
+    """
+    Create the transport configured by INFERENCE_BACKEND and TF_SERVING_TRANSPORT.
+
+    With the tf_serving backend this is the TF_SERVING_TRANSPORT transport, pinned
+    to `version` of the model if given; any other backend runs the model in
+    process, loading it here from `model_path` (by default the configured model file).
+    """
+    if backend != TFServingRestBackend.name:
+        model_path = model_path or INFERENCE_MODEL_PATH or default_model_path(backend, INFERENCE_MODEL_DIR, INFERENCE_PRECISION)
+        logger.info(f"Loading {INFERENCE_PRECISION} {backend} model from {model_path}")
+        return InProcessTransport(create_backend(
+            backend,
+            model_path=model_path,
+            num_threads=INFERENCE_NUM_THREADS,
+            inter_op_threads=INFERENCE_INTER_OP_THREADS
+        ))
+
+    return create_tf_serving_transport(
+        name,
+        TF_SERVING_URL if version is None else tf_serving_version_url(TF_SERVING_URL, version),
+        client=get_inference_client(),
+        grpc_target=f"{TF_SERVING_HOST}:{TF_SERVING_GRPC_PORT}",
+        model_name=TF_SERVING_MODEL_NAME,
+        signature_name=TF_SERVING_SIGNATURE_NAME,
+        input_name=TF_SERVING_INPUT_NAME,
+        version=version,
+        timeout=TF_SERVING_READ_TIMEOUT,
+        breaker=get_circuit_breaker()
+    )
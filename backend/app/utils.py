@@ -1,85 +1,57 @@
 
+import base64
+import datetime
+import json
+import logging
 import os
 import uuid
+from typing import Tuple
 from fastapi import UploadFile, HTTPException
 
-def save_uploaded_image(image: UploadFile) -> tuple[str, str]:
+from .config import PLANT_IMAGES_DIR
+
+logger = logging.getLogger(__name__)
+
+def validate_uploaded_image(image: UploadFile) -> None:
+    """Reject uploads that are not images."""
+    if not image.content_type or not image.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not an image")
+
+def build_image_path(filename: str) -> Tuple[str, str]:
     """
-    Save an uploaded image and return the file paths.
+    Pick a unique location for a persisted upload.
     
     Args:
-        image: The uploaded image file
+        filename: Original name of the uploaded file, used for its extension
         
     Returns:
-        tuple: (temp_file_path, permanent_file_path)
+        tuple: (file_path, image_url)
     """
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Uploaded file is not an image")
-    
-    # Create necessary directories
-    os.makedirs("media/plant_images", exist_ok=True)
-    os.makedirs("media/temp_uploads", exist_ok=True)
-    
-    # Save the uploaded image temporarily
-    temp_file_path = f"media/temp_uploads/{uuid.uuid4()}{os.path.splitext(image.filename)[1]}"
-    
-    return temp_file_path, f"media/plant_images/{uuid.uuid4()}{os.path.splitext(image.filename)[1]}"
+    name = f"{uuid.uuid4()}{os.path.splitext(filename or '')[1]}"
+    return os.path.join(PLANT_IMAGES_DIR, name), f"/media/plant_images/{name}"
 
-def get_demo_sources() -> list:
-    """Return demo data sources."""
-    return [
-        {
-            "title": "Plant Village Database",
-            "url": "https://plantvillage.psu.edu/"
-        },
-        {
-            "title": "Agricultural Extension Service",
-            "url": "https://extension.org/"
-        }
-    ]
+def write_image_file(file_path: str, contents: bytes) -> None:
+    """Write an uploaded image to disk atomically, so that a half-written file is never served."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.part"
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+        os.replace(temp_path, file_path)
+    except OSError as e:
+        logger.error(f"Error saving uploaded image to {file_path}: {str(e)}")
 
-def get_demo_treatments() -> dict:
-    """Return demo treatment data."""
-    return {
-        "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible.",
-        "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops."
-    }
+def encode_cursor(key: Tuple[datetime.datetime, str]) -> str:
+    """Encode a (timestamp, id) pagination key as an opaque URL-safe cursor."""
+    timestamp, scan_id = key
+    raw = json.dumps([timestamp.isoformat(), str(scan_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
-def get_demo_plants_info() -> dict:
-    """Return demo plant information data."""
-    return {
-        "tomato": {
-            "name": "Tomato",
-            "scientificName": "Solanum lycopersicum",
-            "care": {
-                "water": "Regular watering, 1-2 inches per week",
-                "sunlight": "Full sun, 6-8 hours daily",
-                "temperature": "65-85°F (18-29°C)",
-                "airflow": "Good ventilation to prevent fungal diseases"
-            },
-            "preventionTips": [
-                "Rotate crops every 3-4 years",
-                "Use disease-resistant varieties",
-                "Provide proper spacing for air circulation",
-                "Water at the base to keep foliage dry",
-                "Remove and destroy diseased plant material"
-            ]
-        },
-        "apple": {
-            "name": "Apple",
-            "scientificName": "Malus domestica",
-            "care": {
-                "water": "1 inch of water per week during growing season",
-                "sunlight": "Full sun, 6-8 hours daily",
-                "temperature": "60-80°F (15-27°C)",
-                "airflow": "Proper pruning for good air circulation"
-            },
-            "preventionTips": [
-                "Proper pruning to improve air circulation",
-                "Clean up fallen leaves and fruit",
-                "Apply dormant sprays before bud break",
-                "Use disease-resistant varieties",
-                "Manage insect pests promptly"
-            ]
-        }
-    }
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+    """Decode a cursor produced by encode_cursor, raising a 400 error if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, scan_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.datetime.fromisoformat(timestamp), str(scan_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,2 @@
+
+# Benchmark scripts; run them from the backend directory with `python -m benchmarks.<name>`
@@ -0,0 +1,83 @@
+"""
+Compare the in-process inference backends (and Keras model.predict) on the same batch.
+
+Backends whose model file or package is missing are skipped. Export the ONNX and
+TensorFlow Lite models first with `python manage.py export_model`.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_backends [--model-dir prediction/ml_models] [--batch-sizes 1 16] [--threads 4]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from benchmarks.common import make_sample_image, measure
+from inference.backends import MODEL_FILENAMES, create_backend, default_model_path
+from inference.preprocessing import ImagePreprocessor
+
+class KerasPredictBaseline:
+    """The original call path: model.predict() on every request."""
+
+    def __init__(self, model_path: str):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, verbose=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=os.path.join("prediction", "ml_models"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Intra-op threads per backend")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    backends = {}
+    keras_path = default_model_path("keras", args.model_dir)
+    for name in MODEL_FILENAMES:
+        model_path = default_model_path(name, args.model_dir)
+        if not os.path.exists(model_path):
+            print(f"Skipping {name}: {model_path} not found")
+            continue
+        try:
+            backends[name] = create_backend(name, model_path=model_path, num_threads=args.threads, inter_op_threads=1)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+    if "keras" in backends:
+        backends["keras-predict"] = KerasPredictBaseline(keras_path)
+
+    image = ImagePreprocessor().preprocess(make_sample_image(1920, 1080))
+    results = []
+    reference = {}
+    for batch_size in args.batch_sizes:
+        batch = np.repeat(image[np.newaxis], batch_size, axis=0)
+        for name, backend in backends.items():
+            result = measure(lambda: backend.predict(batch), args.iterations)
+            output = np.asarray(backend.predict(batch))
+            reference.setdefault(batch_size, output)
+            result.update({
+                "backend": name,
+                "batch_size": batch_size,
+                # How far the backend's probabilities drift from the first backend measured
+                "max_abs_diff": float(np.max(np.abs(output - reference[batch_size]))),
+            })
+            results.append(result)
+
+    print(f"{'backend':<14} {'batch':>5} {'median':>11} {'min':>11} {'per image':>11} {'max diff':>9}")
+    for r in results:
+        print(
+            f"{r['backend']:<14} {r['batch_size']:>5} {r['ms_median']:>8.2f} ms {r['ms_min']:>8.2f} ms "
+            f"{r['ms_median'] / r['batch_size']:>8.2f} ms {r['max_abs_diff']:>9.5f}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
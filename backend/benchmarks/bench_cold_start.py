@@ -0,0 +1,74 @@
+"""
+Measure Django cold start for each MODEL_LOADING mode.
+
+For every mode a fresh interpreter boots the WSGI application and then waits for
+the model to be ready; `manage.py check` stands in for any management command.
+`eager` is the original behaviour (model loaded inside AppConfig.ready()).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_cold_start [--modes eager background lazy] [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BOOT_SCRIPT = """
+import json, os, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plant_disease_api.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+booted = time.perf_counter()
+from prediction import ml_model
+ml_model.load_model_into_memory()
+print(json.dumps({'boot_s': booted - start, 'model_ready_s': time.perf_counter() - start, 'loaded': ml_model.model_status()['ready']}))
+"""
+
+def run(command, mode):
+    env = dict(os.environ, MODEL_LOADING=mode)
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["eager", "background", "lazy"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        boots, readies, checks = [], [], []
+        loaded = False
+        for _ in range(args.runs):
+            _, output = run([sys.executable, "-c", BOOT_SCRIPT], mode)
+            boot = json.loads(output.strip().splitlines()[-1])
+            boots.append(boot["boot_s"])
+            readies.append(boot["model_ready_s"])
+            loaded = boot["loaded"]
+            checks.append(run([sys.executable, "manage.py", "check"], mode)[0])
+        results.append({
+            "mode": mode,
+            "boot_s": statistics.median(boots),
+            "model_ready_s": statistics.median(readies),
+            "manage_check_s": statistics.median(checks),
+            "model_loaded": loaded,
+        })
+
+    print(f"{'mode':<11} {'boot':>9} {'model ready':>12} {'manage.py check':>16}")
+    for r in results:
+        print(f"{r['mode']:<11} {r['boot_s']:>7.2f} s {r['model_ready_s']:>10.2f} s {r['manage_check_s']:>14.2f} s")
+    if not all(r["model_loaded"] for r in results):
+        print("Note: no model was loaded (model file missing?), so the timings leave out model deserialization")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
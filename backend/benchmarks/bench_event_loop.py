@@ -0,0 +1,189 @@
+"""
+Measure event-loop responsiveness of the FastAPI app under mixed history and predict traffic.
+
+Runs the app in-process and sends concurrent GET /api/history and POST /api/predict
+requests while a heartbeat task measures how late the event loop wakes it up.
+The `asyncpg` driver is the app's own data layer; the `blocking` driver swaps in
+synchronous psycopg2 queries called from the async routes, as the app did before.
+Inference is replaced with a fixed delay so that only the database path differs.
+
+Needs a PostgreSQL database (DB_* or DATABASE_URL settings); scans are written to
+its plant_scans table.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_event_loop [--driver asyncpg blocking] [--duration 10]
+        [--concurrency 32] [--history-ratio 0.8] [--inference-ms 20] [--json results.json]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+from app import database, routes
+from app.config import DATABASE_URL
+from benchmarks.common import make_sample_image, percentile
+from main import app
+
+async def fake_predict(inference_ms: float, contents, model_version=None) -> dict:
+    # Inference runs off the loop in the app, so an awaited delay stands in for it
+    await asyncio.sleep(inference_ms / 1000)
+    return {
+        "disease": "Tomato___healthy",
+        "confidence": 0.99,
+        "description": "",
+        "treatment": "",
+        "model_version": None,
+    }
+
+def blocking_data_layer(max_connections: int):
+    """Async functions that run psycopg2 queries on the event loop thread, like the routes used to."""
+    import psycopg2.extras
+    from psycopg2.pool import ThreadedConnectionPool
+
+    pool = ThreadedConnectionPool(1, max_connections, DATABASE_URL)
+
+    async def get_scans_page(limit, after=None, disease=None, since=None, until=None):
+        conn = pool.getconn()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    f"SELECT {database.SCAN_COLUMNS} FROM plant_scans ORDER BY timestamp DESC, id DESC LIMIT %s",
+                    (limit + 1,)
+                )
+                scans = cursor.fetchall()
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+        return scans[:limit], None
+
+    async def save_scans(scans):
+        now = datetime.datetime.now()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_values(
+                    cursor,
+                    "INSERT INTO plant_scans (id, image_url, disease, confidence, model_version, timestamp) VALUES %s",
+                    [(scan_id, image_url, disease, confidence, model_version or "", now)
+                     for scan_id, image_url, disease, confidence, model_version in scans]
+                )
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+
+    return get_scans_page, save_scans, pool.closeall
+
+async def heartbeat(stop: asyncio.Event, interval: float, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+
+async def client_loop(client, stop: asyncio.Event, history_ratio: float, image_bytes: bytes, timings: dict, rng: random.Random):
+    while not stop.is_set():
+        kind = "history" if rng.random() < history_ratio else "predict"
+        start = time.perf_counter()
+        if kind == "history":
+            response = await client.get("/api/history", params={"limit": 50})
+        else:
+            response = await client.post("/api/predict", files={"image": ("leaf.jpg", image_bytes, "image/jpeg")})
+        response.raise_for_status()
+        timings[kind].append(time.perf_counter() - start)
+
+async def bench_driver(driver: str, args, image_bytes: bytes) -> dict:
+    originals = (routes.get_scans_page, routes.save_scans)
+    close_blocking = None
+    if driver == "blocking":
+        routes.get_scans_page, routes.save_scans, close_blocking = blocking_data_layer(args.concurrency)
+
+    await database.init_db_pool()
+    await database.initialize_database()
+
+    stop = asyncio.Event()
+    lags = []
+    timings = {"history": [], "predict": []}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Warm up the connections and the routes once
+            await client.get("/api/history", params={"limit": 1})
+
+            beat = asyncio.create_task(heartbeat(stop, args.heartbeat_ms / 1000, lags))
+            rng = random.Random(0)
+            clients = [
+                asyncio.create_task(client_loop(client, stop, args.history_ratio, image_bytes, timings, rng))
+                for _ in range(args.concurrency)
+            ]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(beat, *clients)
+    finally:
+        routes.get_scans_page, routes.save_scans = originals
+        if close_blocking is not None:
+            close_blocking()
+        await database.close_db_pool()
+
+    requests = len(timings["history"]) + len(timings["predict"])
+    return {
+        "driver": driver,
+        "requests_per_s": requests / args.duration,
+        "loop_lag_ms_p50": percentile(lags, 0.5) * 1000,
+        "loop_lag_ms_p99": percentile(lags, 0.99) * 1000,
+        "loop_lag_ms_max": max(lags, default=0.0) * 1000,
+        "history_ms_median": statistics.median(timings["history"]) * 1000 if timings["history"] else 0.0,
+        "predict_ms_median": statistics.median(timings["predict"]) * 1000 if timings["predict"] else 0.0,
+    }
+
+async def run(args) -> list:
+    image_bytes = make_sample_image(640, 480)
+    original_predict = routes.predict_leaf_disease_async
+    original_version = routes.current_model_version
+
+    async def predict(contents, model_version=None):
+        return await fake_predict(args.inference_ms, contents, model_version)
+
+    # No model to load and no prediction cache hits: every predict awaits the fake inference and saves a scan
+    routes.predict_leaf_disease_async = predict
+    routes.current_model_version = lambda version=None: None
+    try:
+        return [await bench_driver(driver, args, image_bytes) for driver in args.drivers]
+    finally:
+        routes.predict_leaf_disease_async = original_predict
+        routes.current_model_version = original_version
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver", dest="drivers", nargs="+", choices=["asyncpg", "blocking"], default=["asyncpg", "blocking"])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic per driver")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--history-ratio", type=float, default=0.8, help="Share of requests that read the history")
+    parser.add_argument("--inference-ms", type=float, default=20.0, help="Simulated inference time of a prediction")
+    parser.add_argument("--heartbeat-ms", type=float, default=5.0, help="Interval of the loop lag probe")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{'driver':<10} {'req/s':>8} {'lag p50':>10} {'lag p99':>10} {'lag max':>10} {'history':>10} {'predict':>10}")
+    for result in results:
+        print(
+            f"{result['driver']:<10} "
+            f"{result['requests_per_s']:>8.1f} "
+            f"{result['loop_lag_ms_p50']:>7.2f} ms "
+            f"{result['loop_lag_ms_p99']:>7.2f} ms "
+            f"{result['loop_lag_ms_max']:>7.2f} ms "
+            f"{result['history_ms_median']:>7.2f} ms "
+            f"{result['predict_ms_median']:>7.2f} ms"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
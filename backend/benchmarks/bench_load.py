@@ -0,0 +1,351 @@
+"""
+Load test the FastAPI and Django apps end to end, against local stand-ins for their dependencies.
+
+A fake TensorFlow Serving (benchmarks/fake_tf_serving.py) answers predictions
+with canned probabilities after --tf-latency-ms, so the apps run their real
+upload, preprocessing, serialization and database code without a model. Each
+app is started in its own server processes:
+  fastapi - uvicorn main:app; needs PostgreSQL (the DB_* settings), since its data layer is asyncpg
+  django  - gunicorn -c gunicorn.conf.py; on a fresh SQLite file, or PostgreSQL with --django-db postgres
+
+Every scenario is an endpoint mix such as `predict=0.3,history=0.7`, run for
+--warmup then --duration seconds, either closed loop (--concurrency clients
+sending back to back) or open loop (--rps requests per second whatever the
+response times; latency is then counted from when a request was due, so a
+server that falls behind is not flattered). Uploads cycle through a corpus of
+distinct generated photos, and the FastAPI prediction cache is off, so every
+predict reaches the fake TF Serving.
+
+Reported per scenario and endpoint: throughput, p50/p95/p99 latency and
+errors; per scenario: CPU time of the server processes (in cores, i.e. CPU
+seconds per second) and their peak total RSS. Run single-endpoint scenarios to
+attribute CPU and memory to one endpoint. Save runs with --json to compare them.
+
+Usage (from the backend directory; needs uvicorn, gunicorn, httpx and psutil):
+    python -m benchmarks.bench_load [--apps fastapi django] [--scenarios predict history predict=0.3,history=0.7]
+        [--duration 20] [--warmup 3] [--concurrency 16 | --rps 50] [--workers 2]
+        [--images 32] [--image-size 1280x960] [--tf-latency-ms 20] [--json results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import psutil
+
+from benchmarks.common import make_sample_image, percentile
+from benchmarks.fake_tf_serving import start_fake_tf_serving
+
+ENDPOINTS = ("predict", "history", "treatment")
+
+def parse_mix(text: str) -> dict:
+    """`predict=0.3,history=0.7` (or just `predict`) as endpoint -> weight."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+def parse_size(text: str) -> tuple:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+def make_corpus(count: int, size: tuple) -> list:
+    """Distinct JPEGs of the same size, so no two uploads hash alike."""
+    return [make_sample_image(size[0], size[1], seed=seed) for seed in range(count)]
+
+def app_command(app: str, port: int, workers: int) -> list:
+    if app == "fastapi":
+        return [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ]
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+
+def app_environment(app: str, args, port: int, tf_port: int, tmpdir: str) -> dict:
+    env = dict(
+        os.environ,
+        INFERENCE_BACKEND="tf_serving",
+        TF_SERVING_HOST="127.0.0.1",
+        TF_SERVING_PORT=str(tf_port),
+        TF_SERVING_URL=f"http://127.0.0.1:{tf_port}/v1/models/leaf_disease_model:predict",
+        PREDICTION_CACHE_ENABLED="false",
+        PERSIST_UPLOADS="true" if args.persist_uploads else "false",
+    )
+    if app == "django":
+        env.update(
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            GUNICORN_WORKERS=str(args.workers),
+        )
+        if args.django_db == "sqlite":
+            env.update(DB_ENGINE="django.db.backends.sqlite3", DB_NAME=os.path.join(tmpdir, "bench.sqlite3"))
+    return env
+
+def wait_until_ready(url: str, timeout: float, server: subprocess.Popen) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            return False
+        try:
+            if httpx.get(url, timeout=5).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+class ResourceSampler:
+    """CPU time and peak RSS of a server process and its children (workers), sampled from a thread."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_start = 0.0
+
+    def _processes(self) -> list:
+        try:
+            return [self.root] + self.root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def cpu_seconds(self) -> float:
+        total = 0.0
+        for process in self._processes():
+            try:
+                times = process.cpu_times()
+                total += times.user + times.system
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _rss(self) -> int:
+        total = 0
+        for process in self._processes():
+            try:
+                total += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def start(self):
+        self.peak_rss = self._rss()
+        self._cpu_start = self.cpu_seconds()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        cpu = self.cpu_seconds() - self._cpu_start
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self._rss())
+        return {"cpu_seconds": cpu, "peak_rss_mb": self.peak_rss / 1e6}
+
+async def send(client: httpx.AsyncClient, endpoint: str, corpus: list, counter) -> bool:
+    if endpoint == "predict":
+        image = corpus[next(counter) % len(corpus)]
+        response = await client.post("/api/predict", files={"image": ("leaf.jpg", image, "image/jpeg")})
+    elif endpoint == "history":
+        response = await client.get("/api/history", params={"limit": 50})
+    else:
+        response = await client.get("/api/treatment/Tomato___Late_blight")
+    return response.status_code < 400
+
+class Recorder:
+    """Latencies and errors per endpoint, once recording has started (after the warm-up)."""
+
+    def __init__(self, endpoints):
+        self.recording = False
+        self.latencies = {endpoint: [] for endpoint in endpoints}
+        self.errors = {endpoint: 0 for endpoint in endpoints}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        if not self.recording:
+            return
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+async def timed(client, endpoint, corpus, counter, recorder: Recorder, start: float):
+    try:
+        ok = await send(client, endpoint, corpus, counter)
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - start, ok)
+
+async def closed_loop(client, mix, corpus, counter, recorder, stop: asyncio.Event, concurrency: int, rng):
+    names, weights = list(mix), list(mix.values())
+
+    async def client_loop():
+        while not stop.is_set():
+            await timed(client, rng.choices(names, weights)[0], corpus, counter, recorder, time.perf_counter())
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+async def open_loop(client, mix, corpus, counter, recorder, stop: asyncio.Event, rps: float, rng):
+    names, weights = list(mix), list(mix.values())
+    tasks = set()
+    due = time.perf_counter()
+    while not stop.is_set():
+        task = asyncio.create_task(timed(client, rng.choices(names, weights)[0], corpus, counter, recorder, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        due += 1 / rps
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+    await asyncio.gather(*tasks)
+
+async def drive(base_url: str, mix: dict, corpus: list, sampler: ResourceSampler, args) -> dict:
+    recorder = Recorder(mix)
+    counter = iter(range(sys.maxsize))
+    rng = random.Random(0)
+    stop = asyncio.Event()
+    max_connections = args.concurrency if args.rps is None else args.max_connections
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as client:
+        if args.rps is None:
+            load = asyncio.create_task(closed_loop(client, mix, corpus, counter, recorder, stop, args.concurrency, rng))
+        else:
+            load = asyncio.create_task(open_loop(client, mix, corpus, counter, recorder, stop, args.rps, rng))
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        sampler.start()
+        start = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        resources = sampler.stop()
+        elapsed = time.perf_counter() - start
+        # Requests still running when the window closed are recorded as they finish
+        await load
+
+    endpoints = {}
+    for endpoint, latencies in recorder.latencies.items():
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "requests_per_s": len(latencies) / elapsed,
+            "errors": recorder.errors[endpoint],
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+    return dict(
+        resources,
+        duration_s=elapsed,
+        cpu_cores=resources["cpu_seconds"] / elapsed,
+        endpoints=endpoints,
+    )
+
+def migrate(env: dict):
+    subprocess.run(
+        [sys.executable, "manage.py", "migrate", "--noinput"],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+def bench_app(app: str, args, corpus: list, tf_port: int, port: int) -> list:
+    with tempfile.TemporaryDirectory(prefix=f"bench-{app}-") as tmpdir:
+        env = app_environment(app, args, port, tf_port, tmpdir)
+        if app == "django":
+            migrate(env)
+        server = subprocess.Popen(
+            app_command(app, port, args.workers),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        try:
+            ready_path = "/api/ready" if app == "django" else "/api/history?limit=1"
+            if not wait_until_ready(f"http://127.0.0.1:{port}{ready_path}", args.timeout, server):
+                print(f"{app}: not ready after {args.timeout:.0f} s, skipped (rerun with --verbose for its log)", file=sys.stderr)
+                return []
+            sampler = ResourceSampler(server.pid)
+            results = []
+            for mix in args.scenarios:
+                result = asyncio.run(drive(f"http://127.0.0.1:{port}", mix, corpus, sampler, args))
+                results.append(dict(result, app=app, scenario=",".join(f"{k}={v:g}" for k, v in mix.items())))
+            return results
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=["fastapi", "django"], default=["fastapi", "django"])
+    parser.add_argument("--scenarios", nargs="+", type=parse_mix, default=["predict", "history", "predict=0.3,history=0.7"],
+                        help="Endpoint mixes to run one after the other (predict, history, treatment)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds of load before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients of the closed loop")
+    parser.add_argument("--rps", type=float, help="Requests per second of an open loop, instead of --concurrency clients")
+    parser.add_argument("--max-connections", type=int, default=256, help="Connection limit of the open loop")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=2, help="Server worker processes of each app")
+    parser.add_argument("--images", type=int, default=32, help="Distinct images in the upload corpus")
+    parser.add_argument("--image-size", type=parse_size, default=(1280, 960), help="WIDTHxHEIGHT of the uploads")
+    parser.add_argument("--tf-latency-ms", type=float, default=20.0, help="Time the fake TF Serving takes per request")
+    parser.add_argument("--tf-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--django-db", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--persist-uploads", action="store_true", help="Let the apps write the uploads to media/")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for an app to start")
+    parser.add_argument("--verbose", action="store_true", help="Show the servers' logs")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    args.scenarios = [parse_mix(mix) if isinstance(mix, str) else mix for mix in args.scenarios]
+
+    corpus = make_corpus(args.images, args.image_size)
+    tf_serving = start_fake_tf_serving(latency_ms=args.tf_latency_ms, jitter_ms=args.tf_jitter_ms)
+    try:
+        results = []
+        for app in args.apps:
+            results.extend(bench_app(app, args, corpus, tf_serving.port, args.port))
+    finally:
+        tf_serving.shutdown()
+
+    load = f"{args.rps:g} req/s open loop" if args.rps else f"{args.concurrency} clients"
+    print(f"{load}, {args.workers} workers, {args.images} images of {args.image_size[0]}x{args.image_size[1]}, "
+          f"TF Serving {args.tf_latency_ms:g} ms")
+    print(f"{'app':<8} {'scenario':<26} {'endpoint':<10} {'req/s':>8} {'p50':>10} {'p95':>10} {'p99':>10} "
+          f"{'errors':>7} {'CPU':>7} {'peak RSS':>11}")
+    for r in results:
+        for endpoint, e in r["endpoints"].items():
+            print(
+                f"{r['app']:<8} {r['scenario']:<26} {endpoint:<10} {e['requests_per_s']:>8.1f} "
+                f"{e['p50_ms']:>7.1f} ms {e['p95_ms']:>7.1f} ms {e['p99_ms']:>7.1f} ms {e['errors']:>7} "
+                f"{r['cpu_cores']:>7.2f} {r['peak_rss_mb']:>8.1f} MB"
+            )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"config": {
+                "concurrency": None if args.rps else args.concurrency,
+                "rps": args.rps,
+                "duration_s": args.duration,
+                "workers": args.workers,
+                "images": args.images,
+                "image_size": list(args.image_size),
+                "tf_latency_ms": args.tf_latency_ms,
+                "django_db": args.django_db,
+            }, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+
+"""
+Compare the original preprocess_image with the ImagePreprocessor engine on phone-camera sized photos.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_preprocess [--iterations 10] [--batch-size 8] [--json results.json]
+"""
+import argparse
+import io
+import json
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import make_sample_image, measure
+from inference.preprocessing import ImagePreprocessor
+
+# Typical phone camera outputs: 12 MP (4:3), 1080p frame, and a small thumbnail
+SAMPLE_SIZES = {
+    "12mp": (4032, 3024),
+    "1080p": (1920, 1080),
+    "vga": (640, 480),
+}
+
+def legacy_preprocess_image(image_bytes: bytes) -> np.ndarray:
+    """The original implementation: full decode, full-resolution resize, float64 normalization."""
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    img = img.resize((224, 224))
+    return np.array(img) / 255.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    engines = {
+        "legacy": legacy_preprocess_image,
+        "engine": ImagePreprocessor().preprocess,
+        "engine-no-draft": ImagePreprocessor(jpeg_draft=False).preprocess,
+        "engine-bilinear": ImagePreprocessor(resample="bilinear").preprocess,
+    }
+    preprocessor = ImagePreprocessor()
+    batch_buffer = preprocessor.allocate_batch(args.batch_size)
+
+    results = []
+    for sample_name, (width, height) in SAMPLE_SIZES.items():
+        image_bytes = make_sample_image(width, height)
+        reference = legacy_preprocess_image(image_bytes)
+
+        for engine_name, engine in engines.items():
+            result = measure(lambda: engine(image_bytes), args.iterations)
+            result.update({
+                "sample": sample_name,
+                "engine": engine_name,
+                "images": 1,
+                # How far the engine's output drifts from the original pixels
+                "max_abs_diff": float(np.max(np.abs(engine(image_bytes) - reference))),
+            })
+            results.append(result)
+
+        images = [image_bytes] * args.batch_size
+        result = measure(lambda: preprocessor.preprocess_many(images, out=batch_buffer), args.iterations)
+        result.update({"sample": sample_name, "engine": "preprocess_many", "images": args.batch_size, "max_abs_diff": None})
+        results.append(result)
+
+    print(f"{'sample':<7} {'engine':<16} {'images':>6} {'median':>11} {'min':>11} {'per image':>11} {'max diff':>9}")
+    for r in results:
+        diff = f"{r['max_abs_diff']:.4f}" if r["max_abs_diff"] is not None else "-"
+        print(
+            f"{r['sample']:<7} {r['engine']:<16} {r['images']:>6} "
+            f"{r['ms_median']:>8.2f} ms {r['ms_min']:>8.2f} ms {r['ms_median'] / r['images']:>8.2f} ms {diff:>9}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+
+"""
+Compare serialize time and payload size of the TF Serving transports.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_transport [--iterations 20] [--batch-size 1] [--json results.json]
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.transport import create_transport
+from inference.transport import INPUT_PNG, INPUT_UINT8, TRANSPORTS
+from benchmarks.common import make_sample_image
+
+def make_instance(input_kind: str, image_bytes: bytes):
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize((224, 224))
+    pixels = np.asarray(img, dtype=np.uint8)
+    if input_kind == INPUT_PNG:
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="PNG")
+        return buffer.getvalue()
+    if input_kind == INPUT_UINT8:
+        return pixels
+    return pixels / 255.0
+
+def bench_transport(name: str, image_bytes: bytes, iterations: int, batch_size: int) -> dict:
+    transport = create_transport(name, backend="tf_serving")
+    instances = [make_instance(transport.input_kind, image_bytes)] * batch_size
+
+    # Warm up once, then time the serialize step only
+    payload = transport.serialize(instances)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        transport.serialize(instances)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "transport": name,
+        "batch_size": batch_size,
+        "payload_bytes": len(payload),
+        "serialize_ms_median": statistics.median(timings) * 1000,
+        "serialize_ms_min": min(timings) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    image_bytes = make_sample_image()
+    results = []
+    for name in TRANSPORTS:
+        try:
+            results.append(bench_transport(name, image_bytes, args.iterations, args.batch_size))
+        except ImportError as e:
+            print(f"Skipping '{name}' transport: {e}")
+
+    print(f"{'transport':<10} {'payload':>12} {'serialize (median)':>20} {'serialize (min)':>17}")
+    for result in results:
+        print(
+            f"{result['transport']:<10} "
+            f"{result['payload_bytes'] / 1024:>9.1f} KiB "
+            f"{result['serialize_ms_median']:>17.2f} ms "
+            f"{result['serialize_ms_min']:>14.2f} ms"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
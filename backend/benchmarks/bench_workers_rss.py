@@ -0,0 +1,106 @@
+"""
+Measure the memory of the Django API under Gunicorn for 1 vs N workers, with and without preloading.
+
+For every configuration Gunicorn is started with gunicorn.conf.py, the script
+waits until /api/ready has answered 200 from the workers, then sums the memory
+of the master and its workers. RSS counts shared pages once per process, so
+its total overstates what the node really pays; PSS splits each shared page
+between the processes that map it and adds up to the real footprint. USS is
+what each worker holds on its own.
+
+Usage (from the backend directory; needs gunicorn and psutil):
+    INFERENCE_BACKEND=onnx python -m benchmarks.bench_workers_rss [--workers 1 4] [--preload on off]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import psutil
+import requests
+
+def wait_until_ready(url, workers, timeout):
+    """Wait for 200 from /api/ready enough times in a row that every worker has most likely warmed up."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        try:
+            streak = streak + 1 if requests.get(url, timeout=5).status_code == 200 else 0
+        except requests.RequestException:
+            streak = 0
+        if streak >= 5 * workers:
+            return True
+        time.sleep(0.2)
+    return False
+
+def measure(master_pid):
+    master = psutil.Process(master_pid)
+    workers = master.children(recursive=True)
+    totals = {"rss": 0, "pss": 0, "uss": 0}
+    for process in [master] + workers:
+        info = process.memory_full_info()
+        for key in totals:
+            totals[key] += getattr(info, key)
+    worker_uss = [process.memory_full_info().uss for process in workers]
+    return {
+        "rss_mb": totals["rss"] / 1e6,
+        "pss_mb": totals["pss"] / 1e6,
+        "uss_mb": totals["uss"] / 1e6,
+        "worker_uss_mb": sum(worker_uss) / len(worker_uss) / 1e6 if worker_uss else 0.0,
+    }
+
+def run(workers, preload, port, timeout):
+    env = dict(
+        os.environ,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_PRELOAD="true" if preload else "false",
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+    )
+    if not preload:
+        env.setdefault("MODEL_LOADING", "background")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = wait_until_ready(f"http://127.0.0.1:{port}/api/ready", workers, timeout)
+        time.sleep(1)
+        return dict(measure(server.pid), workers=workers, preload=preload, ready=ready)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--preload", nargs="+", choices=["on", "off"], default=["off", "on"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the workers to load the model")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [
+        run(workers, preload == "on", args.port, args.timeout)
+        for workers in args.workers
+        for preload in args.preload
+    ]
+
+    print(f"backend: {os.environ.get('INFERENCE_BACKEND', 'keras')}")
+    print(f"{'workers':>7} {'preload':>8} {'total RSS':>11} {'total PSS':>11} {'total USS':>11} {'USS/worker':>11}")
+    for r in results:
+        print(
+            f"{r['workers']:>7} {'on' if r['preload'] else 'off':>8} {r['rss_mb']:>8.1f} MB {r['pss_mb']:>8.1f} MB "
+            f"{r['uss_mb']:>8.1f} MB {r['worker_uss_mb']:>8.1f} MB" + ("" if r["ready"] else "  (model not ready)")
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+
+"""Helpers shared by the benchmark scripts."""
+import io
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+def make_sample_image(width: int = 4032, height: int = 3024, seed: int = 0) -> bytes:
+    """Generate a phone-camera sized JPEG with some structure so it compresses realistically; `seed` varies the noise."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 32, size=(height, width), dtype=np.uint8)
+    r = (x + noise) % 256
+    g = (y + noise) % 256
+    b = ((x + y) / 2 + noise) % 256
+    pixels = np.stack([np.broadcast_to(c, (height, width)) for c in (r, g, b)], axis=-1).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def percentile(values, q: float) -> float:
+    """The value below which a share `q` (0-1) of `values` falls, nearest rank; 0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def measure(fn, iterations: int) -> dict:
+    """Call fn once to warm up, then `iterations` times, and return median/min wall time in milliseconds."""
+    fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "ms_median": statistics.median(timings) * 1000,
+        "ms_min": min(timings) * 1000,
+    }
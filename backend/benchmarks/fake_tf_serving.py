@@ -0,0 +1,131 @@
+"""
+Stand-in for the TensorFlow Serving REST API, so the apps can be load tested without a model.
+
+Answers the model status request (GET /v1/models/<name>) with one AVAILABLE
+version and predict requests (POST /v1/models/<name>[/versions/<n>]:predict)
+with canned class probabilities, one row per instance, after a fixed latency
+plus random jitter. The predicted class rotates between requests so the
+history fills with different diseases. Works with the json, uint8 and b64
+transports; gRPC is not served.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_tf_serving [--port 8501] [--latency-ms 20] [--jitter-ms 5]
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from inference.metadata import DISEASE_CLASSES
+
+NUM_CLASSES = len(DISEASE_CLASSES)
+
+def count_instances(body: bytes) -> int:
+    """
+    Number of images in a predict request body, without parsing the JSON.
+
+    b64 instances each carry one "b64" key; pixel instances are nested
+    [height][width][channels] lists, so `]]],[[[` only appears between two of them.
+    """
+    if b'"b64"' in body:
+        return body.count(b'"b64"')
+    if b"[[[" not in body:
+        return 0
+    return body.count(b"]]],[[[") + body.count(b"]]], [[[") + 1
+
+def canned_predictions(count: int, first_class: int) -> list:
+    rows = []
+    for i in range(count):
+        row = [0.1 / (NUM_CLASSES - 1)] * NUM_CLASSES
+        row[(first_class + i) % NUM_CLASSES] = 0.9
+        rows.append(row)
+    return rows
+
+class FakeTFServingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+
+    def do_GET(self):
+        if not self.path.startswith("/v1/models/"):
+            self._send(404, {"error": "Not found"})
+            return
+        self._send(200, {"model_version_status": [
+            {"version": version, "state": "AVAILABLE", "status": {"error_code": "OK", "error_message": ""}}
+            for version in self.server.versions
+        ]})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not (self.path.startswith("/v1/models/") and self.path.endswith(":predict")):
+            self._send(404, {"error": "Not found"})
+            return
+        count = count_instances(body)
+        if not count:
+            self._send(400, {"error": "No instances in the request"})
+            return
+        self.server.wait()
+        self._send(200, {"predictions": canned_predictions(count, self.server.next_class())})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeTFServing(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: float = 20.0, jitter_ms: float = 0.0, versions=("1",)):
+        super().__init__(address, FakeTFServingHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.versions = tuple(versions)
+        self.requests = 0
+        self._classes = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def wait(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def next_class(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return next(self._classes)
+
+def start_fake_tf_serving(port: int = 0, latency_ms: float = 20.0, jitter_ms: float = 0.0) -> FakeTFServing:
+    """Serve on 127.0.0.1 from a daemon thread; port 0 picks a free one (see .port). Stop with shutdown()."""
+    server = FakeTFServing(("127.0.0.1", port), latency_ms, jitter_ms)
+    threading.Thread(target=server.serve_forever, name="fake-tf-serving", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Time each predict request takes")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random +/- variation of that time")
+    args = parser.parse_args()
+
+    server = FakeTFServing(("127.0.0.1", args.port), args.latency_ms, args.jitter_ms)
+    print(f"Fake TF Serving on http://127.0.0.1:{server.port}/v1/models/leaf_disease_model:predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Gunicorn configuration for the Django API.
+
+    gunicorn -c gunicorn.conf.py
+
+With GUNICORN_PRELOAD (the default) the application is imported once in the
+master before it forks, and MODEL_LOADING becomes 'preload': the master loads
+the model weights (ONNX weights into shared memory, see inference/sharing.py)
+but starts no threads and no inference runtime, and every worker creates its
+own session and warms it up right after the fork. N workers then keep one copy
+of the ONNX weights instead of N. Keras models are still loaded per worker.
+"""
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+wsgi_app = "plant_disease_api.wsgi:application"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+if preload_app:
+    os.environ.setdefault("MODEL_LOADING", "preload")
+
+# Workers share the CPU cores; without this each one would start a thread per core
+os.environ.setdefault("INFERENCE_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+# Metrics of all workers in one scrape (see inference/metrics.py): prometheus_client reads
+# this before the app is imported. Each master gets its own directory unless one is given.
+_metrics_dir = None
+if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    _metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="plantopia-metrics-")
+elif os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def on_starting(server):
+    # Files left by an earlier run would be added to this run's counters
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.remove(os.path.join(directory, name))
+
+def post_fork(server, worker):
+    # Runs in the new worker: create this worker's session (from the preloaded weights) in the background
+    if not server.cfg.preload_app:
+        return  # Each worker imports the app itself and MODEL_LOADING applies as usual
+    from django.conf import settings
+
+    if settings.MODEL_LOADING == "preload":
+        from prediction import ml_model
+
+        ml_model.start_warmup()
+
+def worker_exit(server, worker):
+    # Write the scans still queued by SCAN_WRITE_BEHIND before the worker goes away
+    from django.conf import settings
+
+    if settings.SCAN_WRITE_BEHIND:
+        from prediction.scans import close_scan_writer
+
+        close_scan_writer()
+
+def child_exit(server, worker):
+    # Runs in the master once a worker has gone: drop its live gauges, keep its counters
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if _metrics_dir is not None:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
@@ -0,0 +1,2 @@
+
+# Inference code shared by the FastAPI app and the Django project
@@ -0,0 +1,180 @@
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+# Weight of the newest hold time in the moving average used to predict queue waits
+_HOLD_TIME_SMOOTHING = 0.2
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is not admitted; answer it with `status_code` and a Retry-After of `retry_after` seconds."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("granted", "event", "future", "loop")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+class AdmissionController:
+    """
+    Bounds how many requests run at once, with a bounded FIFO queue of requests waiting for a slot.
+
+    A request gets one of `max_in_flight` slots right away if one is free.
+    Otherwise it waits in the queue, up to `queue_timeout` seconds, and is
+    rejected with 503 when that deadline passes. It is rejected at once when
+    `max_queue` requests are already waiting (429), or when the queue ahead of
+    it, at the average time a slot is held, would not drain before its
+    deadline (503). Slots freed by finished requests go straight to the
+    oldest waiter.
+
+    Threads call acquire() and coroutines acquire_async(); a controller can be
+    shared by both.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int = 0, queue_timeout: float = 5.0, retry_after: int = 1):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._in_flight = 0
+        self._waiters = deque()
+        self._hold_time: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_deadline": 0, "timed_out": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _admit_or_enqueue(self, waiter: _Waiter) -> bool:
+        """Take a free slot (True) or queue `waiter` (False); raises AdmissionRejectedError if it cannot wait."""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                self._stats["admitted"] += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                self._stats["rejected_queue_full"] += 1
+                raise AdmissionRejectedError("Too many requests are waiting, please retry later", 429, self.retry_after)
+            if self._hold_time is not None:
+                expected_wait = (len(self._waiters) + 1) * self._hold_time / self.max_in_flight
+                if expected_wait > self.queue_timeout:
+                    self._stats["rejected_deadline"] += 1
+                    raise AdmissionRejectedError("The server is overloaded, please retry later", 503, self._retry_after(expected_wait))
+            self._waiters.append(waiter)
+            self._stats["queued"] += 1
+            return False
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """Take `waiter` out of the queue; False if it was handed a slot meanwhile, which it then holds."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            return True
+
+    def _timed_out(self) -> AdmissionRejectedError:
+        with self._lock:
+            self._stats["timed_out"] += 1
+        return AdmissionRejectedError("Timed out waiting for the server, please retry later", 503, self.retry_after)
+
+    def _retry_after(self, expected_wait: float) -> int:
+        return max(self.retry_after, int(expected_wait + 0.5))
+
+    def acquire(self) -> None:
+        """Wait for a slot on this thread; raises AdmissionRejectedError instead when it cannot be had in time."""
+        waiter = _Waiter()
+        if self._admit_or_enqueue(waiter):
+            return
+        if not waiter.event.wait(self.queue_timeout) and self._give_up(waiter):
+            raise self._timed_out()
+        with self._lock:
+            self._stats["admitted"] += 1
+
+    async def acquire_async(self) -> None:
+        """Async variant of acquire() that waits without blocking the event loop."""
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._admit_or_enqueue(waiter):
+            return
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._give_up(waiter):
+                raise self._timed_out()
+        except asyncio.CancelledError:
+            # The client went away while waiting; hand back the slot if it had just been granted
+            if not self._give_up(waiter):
+                self.release()
+            raise
+        with self._lock:
+            self._stats["admitted"] += 1
+
+    def release(self, held: Optional[float] = None) -> None:
+        """Free a slot, handing it to the oldest waiter if any; `held` is how long it was held, in seconds."""
+        with self._lock:
+            if held is not None:
+                self._hold_time = held if self._hold_time is None else (
+                    _HOLD_TIME_SMOOTHING * held + (1 - _HOLD_TIME_SMOOTHING) * self._hold_time
+                )
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the enclosed block."""
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def admit_async(self):
+        """Hold a slot for the enclosed block, waiting for it without blocking the event loop."""
+        await self.acquire_async()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["waiting"] = len(self._waiters)
+            stats["hold_time_ms"] = round(self._hold_time * 1000, 3) if self._hold_time is not None else None
+        stats["max_in_flight"] = self.max_in_flight
+        stats["max_queue"] = self.max_queue
+        return stats
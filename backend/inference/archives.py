@@ -0,0 +1,63 @@
+
+import os
+import zipfile
+from typing import BinaryIO, Iterator, List, Tuple
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+
+def iter_images_from_zip(archive: BinaryIO, max_images: int, max_image_bytes: int) -> Iterator[Tuple[str, bytes]]:
+    """
+    Lazily read the images out of a zip archive, in archive order.
+
+    Non-image members, directories and macOS resource forks are skipped. The
+    archive is validated against its directory when this is called, before
+    anything is decompressed; each image is then decompressed only when the
+    returned iterator reaches it, so at most one is held in memory at a time.
+
+    Args:
+        archive: Binary file-like object holding the zip archive
+        max_images: Maximum number of images the archive may contain
+        max_image_bytes: Maximum uncompressed size of a single image
+
+    Returns:
+        iterator: (member name, image bytes) pairs
+
+    Raises:
+        ValueError: If the archive is invalid or exceeds the limits
+    """
+    try:
+        zf = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise ValueError("Uploaded file is not a valid zip archive")
+
+    members = [
+        info for info in zf.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+        and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+    ]
+
+    try:
+        if len(members) > max_images:
+            raise ValueError(f"Archive contains {len(members)} images, the maximum is {max_images}")
+        for info in members:
+            if info.file_size > max_image_bytes:
+                raise ValueError(f"{info.filename} is larger than {max_image_bytes} bytes")
+    except ValueError:
+        zf.close()
+        raise
+
+    def read_members():
+        with zf:
+            for info in members:
+                try:
+                    yield info.filename, zf.read(info)
+                except zipfile.BadZipFile:
+                    raise ValueError(f"{info.filename} is corrupt")
+
+    return read_members()
+
+def extract_images_from_zip(archive: BinaryIO, max_images: int, max_image_bytes: int) -> List[Tuple[str, bytes]]:
+    """Read all the images out of a zip archive at once; see iter_images_from_zip."""
+    return list(iter_images_from_zip(archive, max_images, max_image_bytes))
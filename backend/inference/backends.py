@@ -0,0 +1,248 @@
+
+import asyncio
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+
+from .transport import Transport, create_tf_serving_transport, instances_from_batch
+
+if TYPE_CHECKING:
+    from .sharing import SharedOnnxModel
+
+logger = logging.getLogger(__name__)
+
+class InferenceBackend:
+    """
+    A way of running the leaf disease model on a batch of preprocessed images.
+
+    Every backend takes a float32 batch of shape (n, 224, 224, 3) scaled to [0, 1]
+    and returns an (n, num_classes) array of class probabilities. Backends are
+    safe to call from several threads at once.
+    """
+
+    name = ""
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    async def apredict(self, batch: np.ndarray) -> np.ndarray:
+        """Async variant of predict; runs the blocking call in a worker thread."""
+        return await asyncio.to_thread(self.predict, batch)
+
+    def close(self) -> None:
+        """Release the model and any threads or connections the backend holds."""
+
+class TFServingRestBackend(InferenceBackend):
+    """
+    Sends the batch to TensorFlow Serving through one of the shared transports (see inference/transport.py).
+
+    The transport is the same the FastAPI app uses: JSON floats, uint8 or base64
+    PNG over the REST API with a pooled, retrying InferenceClient, or a
+    TensorProto over gRPC. The float batch is converted to what the transport
+    sends. Keyword arguments (client, breaker, grpc_target, version, ...) go to
+    create_tf_serving_transport(); with a `breaker`, calls fail fast with
+    CircuitOpenError while it is open.
+    """
+
+    name = "tf_serving"
+
+    def __init__(self, url: str, transport: str = "json", **kwargs):
+        self.transport: Transport = create_tf_serving_transport(transport, url, **kwargs)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        instances = instances_from_batch(batch, self.transport.input_kind)
+        return np.asarray(self.transport.predict(instances), dtype=np.float32)
+
+    async def apredict(self, batch: np.ndarray) -> np.ndarray:
+        instances = await asyncio.to_thread(instances_from_batch, batch, self.transport.input_kind)
+        return np.asarray(await self.transport.apredict(instances), dtype=np.float32)
+
+    def close(self) -> None:
+        self.transport.close()
+
+class KerasBackend(InferenceBackend):
+    """
+    Runs a Keras model in process by calling it directly.
+
+    model.predict() builds a data pipeline and a fresh execution loop on every
+    call, which costs several milliseconds for a single image. Calling the model
+    through one tf.function traced for any batch size skips all of that.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+        import tensorflow as tf
+
+        try:
+            # Only possible before TensorFlow has started its thread pools
+            if num_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            if inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError:
+            logger.warning("TensorFlow is already initialized, keeping its thread settings")
+
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        input_shape = tuple(self.model.input_shape[1:])
+        self._infer = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + input_shape, tf.float32)]
+        )
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self._infer(np.asarray(batch, dtype=np.float32)).numpy()
+
+class OnnxBackend(InferenceBackend):
+    """
+    Runs an exported ONNX model with ONNX Runtime on the CPU.
+
+    With `shared` (a SharedOnnxModel loaded before a pre-fork server forked) the
+    session reads its weights in place from shared memory instead of its own copy.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        num_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        shared: Optional["SharedOnnxModel"] = None,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # A single CNN has no parallel branches to run; spend the threads inside each operator
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+
+        model = model_path
+        self._initializers = []
+        if shared is not None:
+            # Pre-packing would give every worker a private re-laid-out copy of the weights
+            options.add_session_config_entry("session.disable_prepacking", "1")
+            # Resolves the stripped initializers' external data location (see SharedOnnxModel.load)
+            options.add_session_config_entry(
+                "session.model_external_initializers_file_folder_path", os.path.dirname(os.path.abspath(shared.model_path))
+            )
+            for name, array in shared.arrays().items():
+                value = ort.OrtValue.ortvalue_from_numpy(array)
+                options.add_initializer(name, value)
+                self._initializers.append(value)  # Must outlive the session
+            model = shared.model_bytes
+
+        self.session = ort.InferenceSession(model, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Runs a TensorFlow Lite model in process.
+
+    Uses the small tflite-runtime package when it is installed, otherwise the
+    interpreter bundled with TensorFlow. Quantized inputs and outputs are
+    converted with the scale and zero point stored in the model. An interpreter
+    runs one batch at a time, so calls are serialized.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_details["shape"][0])
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _quantize(batch: np.ndarray, details: Dict[str, Any]) -> np.ndarray:
+        dtype = details["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = details["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    @staticmethod
+    def _dequantize(output: np.ndarray, details: Dict[str, Any]) -> np.ndarray:
+        if output.dtype == np.float32:
+            return output
+        scale, zero_point = details["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = self._quantize(np.asarray(batch), self.input_details)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_details["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self.input_details["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details["index"])
+        return self._dequantize(output, self.output_details)
+
+BACKENDS: Dict[str, type] = {
+    TFServingRestBackend.name: TFServingRestBackend,
+    KerasBackend.name: KerasBackend,
+    OnnxBackend.name: OnnxBackend,
+    TFLiteBackend.name: TFLiteBackend,
+}
+
+# File each in-process backend loads from a model directory by default
+MODEL_FILENAMES = {
+    KerasBackend.name: "leaf_disease_model.keras",
+    OnnxBackend.name: "leaf_disease_model.onnx",
+    TFLiteBackend.name: "leaf_disease_model.tflite",
+}
+
+# Quantized variants (see the quantize_model management command) sit next to the float model
+QUANTIZED_BACKENDS = (OnnxBackend.name, TFLiteBackend.name)
+QUANTIZED_PRECISIONS = ("float16", "int8")
+
+def default_model_path(name: str, model_dir: str, precision: str = "float32") -> str:
+    """
+    Where the model file for an in-process backend lives inside `model_dir`.
+
+    float16 and int8 variants of the ONNX and TFLite models are named
+    leaf_disease_model.<precision>.<ext>, e.g. leaf_disease_model.int8.tflite.
+    """
+    if name not in MODEL_FILENAMES:
+        raise ValueError(f"Unknown in-process inference backend '{name}'. Choose one of: {', '.join(MODEL_FILENAMES)}")
+    filename = MODEL_FILENAMES[name]
+    if precision != "float32":
+        if name not in QUANTIZED_BACKENDS or precision not in QUANTIZED_PRECISIONS:
+            raise ValueError(
+                f"No {precision} variant for the {name} backend; quantized models exist for "
+                f"{', '.join(QUANTIZED_BACKENDS)} in {', '.join(QUANTIZED_PRECISIONS)}"
+            )
+        stem, ext = os.path.splitext(filename)
+        filename = f"{stem}.{precision}{ext}"
+    return os.path.join(model_dir, filename)
+
+def create_backend(name: str, **kwargs) -> InferenceBackend:
+    """Create an inference backend by name; keyword arguments go to its constructor."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    logger.info(f"Creating {name} inference backend")
+    return backend_class(**kwargs)
@@ -0,0 +1,283 @@
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Value of each state in the plantopia_circuit_breaker_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# gRPC status codes that blame the request rather than the server
+_CLIENT_ERROR_CODES = {"INVALID_ARGUMENT", "NOT_FOUND", "FAILED_PRECONDITION", "OUT_OF_RANGE"}
+
+def is_backend_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the backend is unhealthy, and so counts against the breaker.
+
+    Errors with an HTTP `status_code` below 500, or a gRPC one blaming the
+    request, are the caller's fault (a bad image, an unknown model version);
+    timeouts, connection errors and 5xx statuses are not.
+    """
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code >= 500
+    return status_code not in _CLIENT_ERROR_CODES
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that the circuit breaker considers unavailable."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is unavailable, please retry later")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing or answering slowly, and lets it recover.
+
+    Calls are counted in a rolling window of `window` seconds (one-second
+    buckets). Once it holds at least `min_calls`, the breaker opens when the
+    share of failed calls reaches `failure_rate_threshold`, or the share of
+    calls slower than `slow_call_seconds` reaches `slow_call_rate_threshold`.
+    While open, calls fail immediately with CircuitOpenError. After
+    `open_seconds`, or as soon as a health probe succeeds, it goes half-open
+    and lets `half_open_calls` trial calls through: if they all succeed it
+    closes again, and one failure opens it again. Consecutive failed probes
+    (`probe_failures_to_open`) open a closed breaker before any call has to
+    time out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_calls: int = 3,
+        probe_failures_to_open: int = 2,
+        is_failure: Callable[[BaseException], bool] = is_backend_failure,
+    ):
+        self.name = name
+        self.window = max(1, int(window))
+        self.min_calls = max(1, min_calls)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.probe_failures_to_open = max(1, probe_failures_to_open)
+        self.is_failure = is_failure
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._reason: Optional[str] = None
+        # [second, calls, failures, slow calls], oldest first
+        self._buckets: deque = deque()
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._probe_failures = 0
+        self._last_probe: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._expire_open(time.monotonic())
+            return self._state
+
+    def _transition(self, state: str, reason: Optional[str] = None) -> None:
+        if state == self._state:
+            return
+        previous, self._state = self._state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._reason = reason
+            logger.warning(f"Circuit breaker for {self.name} opened: {reason}")
+        elif state == HALF_OPEN:
+            self._trials_started = 0
+            self._trials_succeeded = 0
+            logger.info(f"Circuit breaker for {self.name} half-open, sending trial calls")
+        else:
+            self._buckets.clear()
+            self._reason = None
+            logger.info(f"Circuit breaker for {self.name} closed after being {previous.replace('_', '-')}")
+
+    def _expire_open(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, math.ceil(self.open_seconds - (now - self._opened_at)))
+
+    def check(self) -> None:
+        """Fail fast while open, without taking a trial call; for callers about to do work before the call itself."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire_open(now)
+            if self._state == OPEN:
+                raise CircuitOpenError(self.name, self._retry_after(now))
+
+    def before_call(self) -> None:
+        """Admit one call, or raise CircuitOpenError while open or when all half-open trials are taken."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire_open(now)
+            if self._state == OPEN:
+                raise CircuitOpenError(self.name, self._retry_after(now))
+            if self._state == HALF_OPEN:
+                if self._trials_started >= self.half_open_calls:
+                    raise CircuitOpenError(self.name, 1)
+                self._trials_started += 1
+
+    def record(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        """Record the outcome of an admitted call."""
+        failed = error is not None and self.is_failure(error)
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._transition(OPEN, "trial call failed" if failed else f"trial call took {seconds:.1f} s")
+                else:
+                    self._trials_succeeded += 1
+                    if self._trials_succeeded >= self.half_open_calls:
+                        self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                return
+
+            second = int(time.monotonic())
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += failed
+            bucket[3] += slow
+            calls, failures, slow_calls = self._window_counts(second)
+            if calls < self.min_calls:
+                return
+            if failures / calls >= self.failure_rate_threshold:
+                self._transition(OPEN, f"{failures} of the last {calls} calls failed")
+            elif slow_calls / calls >= self.slow_call_rate_threshold:
+                self._transition(OPEN, f"{slow_calls} of the last {calls} calls took over {self.slow_call_seconds:g} s")
+
+    def _window_counts(self, second: int) -> Tuple[int, int, int]:
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        return (
+            sum(bucket[1] for bucket in self._buckets),
+            sum(bucket[2] for bucket in self._buckets),
+            sum(bucket[3] for bucket in self._buckets),
+        )
+
+    @contextmanager
+    def call(self):
+        """Guard the enclosed call: fail fast while open, and record its duration and outcome."""
+        self.before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record(time.monotonic() - start, e)
+            raise
+        except BaseException:
+            # Cancelled by the caller, which says nothing about the backend
+            self._abandon()
+            raise
+        self.record(time.monotonic() - start)
+
+    def _abandon(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials_started > 0:
+                self._trials_started -= 1
+
+    def record_probe(self, healthy: bool, detail: str = "") -> None:
+        """Record the result of a health probe: a healthy backend ends the open period early, failing ones open the breaker."""
+        with self._lock:
+            self._last_probe = {"healthy": healthy, "detail": detail, "at": time.time()}
+            if healthy:
+                self._probe_failures = 0
+                if self._state == OPEN:
+                    self._transition(HALF_OPEN)
+                return
+            self._probe_failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._probe_failures >= self.probe_failures_to_open):
+                self._transition(OPEN, f"health probe failed: {detail}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State, window counts and last probe, for the health endpoint."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire_open(now)
+            calls, failures, slow_calls = self._window_counts(int(now))
+            snapshot = {
+                "state": self._state,
+                "reason": self._reason,
+                "window_seconds": self.window,
+                "calls": calls,
+                "failures": failures,
+                "slow_calls": slow_calls,
+                "last_probe": dict(self._last_probe) if self._last_probe else None,
+            }
+            if self._state == OPEN:
+                snapshot["retry_after"] = self._retry_after(now)
+        return snapshot
+
+class HealthProbe:
+    """Calls `probe` every `interval` seconds from a daemon thread and reports the result to `breaker`."""
+
+    def __init__(self, breaker: CircuitBreaker, probe: Callable[[], Tuple[bool, str]], interval: float = 5.0):
+        self.breaker = breaker
+        self.probe = probe
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name=f"health-probe-{self.breaker.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                healthy, detail = self.probe()
+            except Exception as e:
+                healthy, detail = False, str(e)
+            self.breaker.record_probe(healthy, detail)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+def tf_serving_probe(status_url: str, get: Callable[[str], Any]) -> Callable[[], Tuple[bool, str]]:
+    """
+    Probe of a TensorFlow Serving model: healthy when its status lists an AVAILABLE version.
+
+    `get(url)` returns a requests-like response; pass one bound to a pooled
+    session so that the probe reuses a keep-alive connection.
+    """
+
+    def probe() -> Tuple[bool, str]:
+        response = get(status_url)
+        if response.status_code != 200:
+            return False, f"status code {response.status_code}"
+        versions = [
+            str(status.get("version"))
+            for status in response.json().get("model_version_status", [])
+            if status.get("state") == "AVAILABLE"
+        ]
+        if not versions:
+            return False, "no model version available"
+        return True, f"versions {', '.join(versions)} available"
+
+    return probe
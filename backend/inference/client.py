@@ -0,0 +1,121 @@
+
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Gateway errors worth retrying; TF Serving returns them while a model version is loading
+RETRY_STATUS_CODES = (502, 503, 504)
+
+class InferenceClient:
+    """
+    Shared HTTP client for TensorFlow Serving.
+
+    Keeps a pool of keep-alive connections instead of opening a new TCP connection
+    per prediction, applies connect/read timeouts and retries transient failures
+    with exponential backoff. The sync methods use a requests Session and are safe
+    to call from worker threads; the async methods use an httpx.AsyncClient so
+    that async callers can await predictions without blocking the event loop.
+    Used by the FastAPI app and by the tf_serving backend of the Django app.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 32,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.2,
+    ):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.retry_backoff,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # Created lazily inside the running event loop that will use it
+        if self._async_client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+            )
+        return self._async_client
+
+    def get(self, url: str) -> requests.Response:
+        return self.session.get(url, timeout=self.timeout)
+
+    def post(self, url: str, data: bytes, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        return self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+
+    async def aget(self, url: str) -> httpx.Response:
+        return await self._arequest("GET", url)
+
+    async def apost(self, url: str, data: bytes, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        return await self._arequest("POST", url, content=data, headers=headers)
+
+    async def _arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying connection errors and gateway statuses with exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                response = await self.async_client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"TensorFlow Serving returned {response.status_code}, retrying")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Error connecting to TensorFlow Serving: {str(e)}, retrying")
+
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+            attempt += 1
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
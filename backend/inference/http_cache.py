@@ -0,0 +1,111 @@
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+class JsonFragment(NamedTuple):
+    """A response body serialized once, with the strong ETag of its bytes."""
+    body: bytes
+    etag: str
+
+def fragment_from_body(body: bytes) -> JsonFragment:
+    return JsonFragment(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+def json_fragment(data: Any) -> JsonFragment:
+    # Same compact, non-ASCII-escaping encoding as FastAPI's and DRF's JSON renderers
+    return fragment_from_body(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag`, using the weak comparison RFC 9110 prescribes for it."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+class ResponseCache:
+    """
+    Thread-safe LRU of serialized read responses, keyed by route and parameters.
+
+    A hit hands back the body bytes and ETag built by the first request, so
+    repeat reads skip the lookup and serialization entirely. Responses that
+    `build` reports as missing (None) are not cached, so a resource created
+    later is still found. Entries never expire: only cache routes whose
+    responses do not change, or change only with a deploy.
+    """
+
+    def __init__(self, max_entries: int, cache_control: Dict[str, str], enabled: bool = True):
+        self.max_entries = max_entries
+        self.cache_control = dict(cache_control)
+        self.enabled = enabled and max_entries > 0
+        self._entries: "OrderedDict[Hashable, JsonFragment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, route: str, params: Hashable) -> Optional[JsonFragment]:
+        """The cached response of `route` for `params`, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = (route, params)
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return fragment
+            self._misses += 1
+        return None
+
+    def put(self, route: str, params: Hashable, fragment: JsonFragment) -> None:
+        """Cache the response of `route` for `params`, evicting the least recently used entries beyond max_entries."""
+        if not self.enabled:
+            return
+        key = (route, params)
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, route: str, params: Hashable, build: Callable[[], Optional[JsonFragment]]) -> Optional[JsonFragment]:
+        """The cached response of `route` for `params`, building and caching it on a miss."""
+        fragment = self.get(route, params)
+        if fragment is not None:
+            return fragment
+
+        # Built outside the lock; two concurrent misses just build the same bytes twice
+        fragment = build()
+        if fragment is not None:
+            self.put(route, params, fragment)
+        return fragment
+
+    def headers(self, route: str, fragment: JsonFragment) -> Dict[str, str]:
+        """Validator and Cache-Control policy sent with every response of `route`, 200 or 304."""
+        headers = {"ETag": fragment.etag}
+        if self.cache_control.get(route):
+            headers["Cache-Control"] = self.cache_control[route]
+        return headers
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
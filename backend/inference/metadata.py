@@ -0,0 +1,193 @@
+
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Tuple
+
+from .http_cache import JsonFragment, json_fragment
+
+# Output classes of the leaf disease model, in the order of its output units
+DISEASE_CLASSES: Tuple[str, ...] = (
+    "Apple___Apple_scab",
+    "Apple___Black_rot",
+    "Apple___Cedar_apple_rust",
+    "Apple___healthy",
+    "Tomato___Early_blight",
+    "Tomato___Late_blight",
+    "Tomato___Leaf_Mold",
+    "Tomato___Septoria_leaf_spot",
+    "Tomato___Spider_mites",
+    "Tomato___Target_Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus",
+    "Tomato___Tomato_mosaic_virus",
+    "Tomato___healthy",
+)
+
+DISEASE_DESCRIPTIONS: Mapping[str, str] = MappingProxyType({
+    "Apple___Apple_scab": "Apple scab is a fungal disease caused by Venturia inaequalis that affects apple trees.",
+    "Apple___Black_rot": "Black rot is a fungal disease caused by Botryosphaeria obtusa affecting apples.",
+    "Apple___Cedar_apple_rust": "Cedar apple rust is a fungal disease caused by Gymnosporangium juniperi-virginianae.",
+    "Apple___healthy": "This is a healthy apple leaf with no signs of disease.",
+    "Tomato___Early_blight": "Early blight is a fungal disease caused by Alternaria solani affecting tomatoes.",
+    "Tomato___Late_blight": "Late blight is a devastating disease caused by Phytophthora infestans.",
+    "Tomato___Leaf_Mold": "Leaf mold is caused by the fungus Passalora fulva, prevalent in humid conditions.",
+    "Tomato___Septoria_leaf_spot": "Septoria leaf spot is a fungal disease that causes small, circular spots.",
+    "Tomato___Spider_mites": "Spider mites are tiny pests that cause stippling and yellowing of tomato leaves.",
+    "Tomato___Target_Spot": "Target spot is caused by the fungus Corynespora cassiicola.",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "TYLCV is a viral disease transmitted by whiteflies.",
+    "Tomato___Tomato_mosaic_virus": "ToMV is a viral disease causing mottled leaves and stunted growth.",
+    "Tomato___healthy": "This is a healthy tomato leaf with no signs of disease.",
+})
+
+DISEASE_TREATMENTS: Mapping[str, str] = MappingProxyType({
+    "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible. Improve air circulation by proper pruning.",
+    "Apple___Black_rot": "Remove and destroy infected plant parts. Apply fungicides during the growing season. Prune to improve air circulation. Control insects that create wounds for infection.",
+    "Apple___Cedar_apple_rust": "Remove nearby cedar or juniper trees if possible. Apply fungicides in spring. Use resistant apple varieties. Keep the orchard clean of debris.",
+    "Apple___healthy": "Continue good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues.",
+    "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops. Use resistant varieties if available.",
+    "Tomato___Late_blight": "Apply fungicides preventatively. Remove infected plants immediately. Avoid overhead irrigation. Ensure good air circulation. Plant resistant varieties.",
+    "Tomato___Leaf_Mold": "Improve air circulation. Reduce humidity. Apply fungicides. Remove infected leaves. Avoid overhead watering. Use resistant varieties.",
+    "Tomato___Septoria_leaf_spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Use mulch to prevent soil splash. Rotate crops. Clean up debris in fall.",
+    "Tomato___Spider_mites": "Spray plants with water to dislodge mites. Apply insecticidal soap or neem oil. Introduce predatory mites. Maintain proper humidity levels.",
+    "Tomato___Target_Spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Ensure proper plant spacing for air circulation. Rotate crops.",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Control whitefly populations. Remove and destroy infected plants. Use reflective mulches. Plant resistant varieties. Use physical barriers like row covers.",
+    "Tomato___Tomato_mosaic_virus": "Remove and destroy infected plants. Control aphids. Wash hands and tools after handling infected plants. Plant resistant varieties. Avoid working in wet gardens.",
+    "Tomato___healthy": "Maintain good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues.",
+})
+
+class ClassInfo(NamedTuple):
+    """What a prediction reports for one model output class."""
+    disease: str
+    description: str
+    treatment: str
+
+# Index-aligned with DISEASE_CLASSES, so a prediction needs one tuple lookup instead of three
+CLASS_INFO: Tuple[ClassInfo, ...] = tuple(
+    ClassInfo(
+        disease,
+        DISEASE_DESCRIPTIONS.get(disease, "No description available"),
+        DISEASE_TREATMENTS.get(disease, "No treatment information available"),
+    )
+    for disease in DISEASE_CLASSES
+)
+
+def class_info(index: int) -> ClassInfo:
+    """Name, description and treatment of the class predicted at `index` of the model output."""
+    if 0 <= index < len(CLASS_INFO):
+        return CLASS_INFO[index]
+    return ClassInfo(
+        f"Unknown (Class {index})",
+        "No description available for this class",
+        "No treatment information available",
+    )
+
+# Sources attached to every prediction (demo data). Shared by every response; never mutate.
+DEMO_SOURCES: Tuple[Mapping[str, str], ...] = (
+    {
+        "title": "Plant Village Database",
+        "url": "https://plantvillage.psu.edu/"
+    },
+    {
+        "title": "Agricultural Extension Service",
+        "url": "https://extension.org/"
+    },
+)
+
+# Demo data for /api/treatment
+DEMO_TREATMENTS: Mapping[str, str] = MappingProxyType({
+    "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible.",
+    "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops."
+})
+
+TREATMENT_STEPS: Tuple[str, ...] = (
+    "Remove all infected leaves and dispose of them properly.",
+    "Apply appropriate fungicide according to label instructions.",
+    "Improve air circulation around plants.",
+    "Water at the base of plants to avoid wetting foliage.",
+    "Rotate crops in future growing seasons.",
+)
+
+# Demo data for /api/plant-info, keyed by lower-case plant name
+DEMO_PLANTS_INFO: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    "tomato": {
+        "name": "Tomato",
+        "scientificName": "Solanum lycopersicum",
+        "care": {
+            "water": "Regular watering, 1-2 inches per week",
+            "sunlight": "Full sun, 6-8 hours daily",
+            "temperature": "65-85°F (18-29°C)",
+            "airflow": "Good ventilation to prevent fungal diseases"
+        },
+        "preventionTips": [
+            "Rotate crops every 3-4 years",
+            "Use disease-resistant varieties",
+            "Provide proper spacing for air circulation",
+            "Water at the base to keep foliage dry",
+            "Remove and destroy diseased plant material"
+        ]
+    },
+    "apple": {
+        "name": "Apple",
+        "scientificName": "Malus domestica",
+        "care": {
+            "water": "1 inch of water per week during growing season",
+            "sunlight": "Full sun, 6-8 hours daily",
+            "temperature": "60-80°F (15-27°C)",
+            "airflow": "Proper pruning for good air circulation"
+        },
+        "preventionTips": [
+            "Proper pruning to improve air circulation",
+            "Clean up fallen leaves and fruit",
+            "Apply dormant sprays before bud break",
+            "Use disease-resistant varieties",
+            "Manage insect pests promptly"
+        ]
+    }
+})
+
+GENERIC_PREVENTION_TIPS: Tuple[str, ...] = (
+    "Use disease-resistant varieties",
+    "Practice crop rotation",
+    "Maintain good air circulation",
+    "Water properly, avoiding wet foliage",
+    "Monitor regularly for early detection of issues",
+)
+
+def _treatment_response(disease: str) -> JsonFragment:
+    return json_fragment({
+        "disease": disease,
+        "treatment": DEMO_TREATMENTS.get(disease, "No specific treatment found for this disease."),
+        "steps": TREATMENT_STEPS,
+    })
+
+def _plant_info_response(plant_name: str) -> JsonFragment:
+    plant_info = DEMO_PLANTS_INFO.get(plant_name.lower())
+    if plant_info is None:
+        plant_info = {
+            "name": plant_name.capitalize(),
+            "scientificName": "Not available",
+            "care": {
+                "water": "General care information not available",
+                "sunlight": "General care information not available",
+                "temperature": "General care information not available",
+                "airflow": "General care information not available"
+            },
+            "preventionTips": GENERIC_PREVENTION_TIPS
+        }
+    return json_fragment(plant_info)
+
+# Response bodies of every known disease and plant, serialized once at import
+TREATMENT_RESPONSES: Mapping[str, JsonFragment] = MappingProxyType({
+    disease: _treatment_response(disease) for disease in (*DISEASE_CLASSES, *DEMO_TREATMENTS)
+})
+PLANT_INFO_RESPONSES: Mapping[str, JsonFragment] = MappingProxyType({
+    plant_name: _plant_info_response(plant_name) for plant_name in DEMO_PLANTS_INFO
+})
+
+def treatment_response(disease: str) -> JsonFragment:
+    """The /api/treatment body for `disease`, precomputed for the diseases in the tables."""
+    fragment = TREATMENT_RESPONSES.get(disease)
+    return fragment if fragment is not None else _treatment_response(disease)
+
+def plant_info_response(plant_name: str) -> JsonFragment:
+    """The /api/plant-info body for `plant_name`, precomputed for the plants in the tables."""
+    fragment = PLANT_INFO_RESPONSES.get(plant_name.lower())
+    return fragment if fragment is not None else _plant_info_response(plant_name)
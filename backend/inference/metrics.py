@@ -0,0 +1,258 @@
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess,
+)
+
+# Content type of the Prometheus text exposition format rendered by render()
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# With several worker processes (Gunicorn), point PROMETHEUS_MULTIPROC_DIR at an empty
+# directory before the app starts: every process then writes its metrics to files there,
+# and a scrape of any worker returns the sum over all of them. Read by prometheus_client
+# when it is first imported, so it cannot be switched on later.
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Seconds between refreshes of the callback gauges in each worker under multiprocess mode
+GAUGE_REFRESH_SECONDS = 1.0
+
+# Stages of the predict path, the `stage` label of STAGE_SECONDS
+STAGE_UPLOAD_READ = "upload_read"  # reading the uploaded bytes
+STAGE_DECODE = "decode"            # opening and decoding the image
+STAGE_RESIZE = "resize"            # resizing and normalizing it into the model input
+STAGE_SERIALIZE = "serialize"      # encoding the request body sent to TensorFlow Serving
+STAGE_INFERENCE = "inference"      # model call, including the TF Serving round trip and batching wait
+STAGE_DB_WRITE = "db_write"        # saving (or queuing) the scans
+STAGE_RESPONSE = "response"        # from the last stage above to the response being handed to the server
+
+# Seconds; fine enough below 1 ms for decode/serialize, wide enough for a slow round trip
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Only the series below; no *_created timestamps next to every counter and histogram
+disable_created_metrics()
+
+# The metrics of this process. Label values are kept forever, so only use labels with
+# a small, bounded set of values (stages, routes, disease classes, error types).
+REGISTRY = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    "plantopia_stage_duration_seconds",
+    "Time spent in each stage of the predict path.",
+    ("stage",),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY
+)
+REQUEST_SECONDS = Histogram(
+    "plantopia_request_duration_seconds",
+    "Time from receiving a request to handing its response to the server.",
+    ("endpoint", "method", "status"),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY
+)
+# Gauges are summed over the live worker processes in multiprocess mode
+REQUESTS_IN_FLIGHT = Gauge(
+    "plantopia_requests_in_flight",
+    "Requests being handled.",
+    multiprocess_mode="livesum",
+    registry=REGISTRY
+)
+STAGES_IN_FLIGHT = Gauge(
+    "plantopia_stage_in_flight",
+    "Uploads being read, model calls and scan writes in progress.",
+    ("stage",),
+    multiprocess_mode="livesum",
+    registry=REGISTRY
+)
+PREDICTIONS_TOTAL = Counter(
+    "plantopia_predictions_total",
+    "Images run through the model, by predicted disease class; prediction cache hits are not counted.",
+    ("disease",),
+    registry=REGISTRY
+)
+ERRORS_TOTAL = Counter(
+    "plantopia_errors_total",
+    "Failed predictions and requests, by error type.",
+    ("type",),
+    registry=REGISTRY
+)
+QUEUE_DEPTH = Gauge(
+    "plantopia_queue_depth",
+    "Items waiting in the in-process queues (preprocessing pool, scan writer, admission).",
+    ("queue",),
+    multiprocess_mode="livesum",
+    registry=REGISTRY
+)
+# Every worker process has its own breaker; in multiprocess mode the worst state is reported
+CIRCUIT_STATE = Gauge(
+    "plantopia_circuit_breaker_state",
+    "State of the circuit breaker in front of each inference backend: 0 closed, 1 half-open, 2 open.",
+    ("breaker",),
+    multiprocess_mode="livemax",
+    registry=REGISTRY
+)
+
+# Gauge children whose value is read from a callback: child -> function
+_gauge_functions: Dict[object, Callable[[], float]] = {}
+_gauge_functions_lock = threading.Lock()
+# Process the callback gauges are being refreshed in, under multiprocess mode
+_refresher_pid: Optional[int] = None
+
+def set_gauge_function(gauge: Gauge, function: Callable[[], float], *labelvalues: str) -> None:
+    """
+    Read the value of one child of `gauge` from `function`, replacing any function set for it before.
+
+    The function is called when /metrics is rendered. In multiprocess mode it is
+    also called every GAUGE_REFRESH_SECONDS in each worker that has handled a
+    request, so that a scrape answered by any worker includes the others' values.
+    """
+    child = gauge.labels(*labelvalues) if labelvalues else gauge
+    with _gauge_functions_lock:
+        _gauge_functions[child] = function
+
+def refresh_gauges() -> None:
+    """Set every callback gauge of this process from its function; NaN when the function fails."""
+    with _gauge_functions_lock:
+        functions = list(_gauge_functions.items())
+    for child, function in functions:
+        try:
+            value = float(function())
+        except Exception:
+            value = float("nan")
+        child.set(value)
+
+def _refresh_gauges_forever() -> None:
+    while True:
+        time.sleep(GAUGE_REFRESH_SECONDS)
+        refresh_gauges()
+
+def _start_gauge_refresher() -> None:
+    # Started in the worker itself: threads do not survive a pre-fork server's fork
+    global _refresher_pid
+    pid = os.getpid()
+    if _refresher_pid == pid:
+        return
+    with _gauge_functions_lock:
+        if _refresher_pid == pid:
+            return
+        _refresher_pid = pid
+    threading.Thread(target=_refresh_gauges_forever, name="metrics-gauges", daemon=True).start()
+
+# End of the last stage of the request being handled, for the response stage; set by track_request()
+_last_stage_end: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("metrics_last_stage_end", default=None)
+# (stage, seconds) of the request being handled, for its profile; set by collect_stages()
+_request_stages: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("metrics_request_stages", default=None)
+
+def _record_stage(stage_name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage_name).observe(seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((stage_name, seconds))
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage of the request being handled that ended just now."""
+    _record_stage(stage, seconds)
+    mark = _last_stage_end.get()
+    if mark is not None:
+        mark[0] = time.perf_counter()
+
+def observe_stages(timings: Mapping[str, float]) -> None:
+    """Record stage durations measured elsewhere, e.g. in a preprocessing worker process."""
+    for stage_name, seconds in timings.items():
+        _record_stage(stage_name, seconds)
+
+class StageTimer:
+    """Duration of a stage() block, in seconds, once the block has exited."""
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+@contextmanager
+def stage(name: str) -> Iterator[StageTimer]:
+    """Time the enclosed block as one stage of the predict path on the monotonic clock, counting it in flight meanwhile."""
+    in_flight = STAGES_IN_FLIGHT.labels(name)
+    in_flight.inc()
+    timer = StageTimer()
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - start
+        in_flight.dec()
+        observe_stage(name, timer.seconds)
+
+@contextmanager
+def track_request(method: str) -> Iterator[Dict[str, str]]:
+    """
+    Count a request in flight and record its duration when the block exits.
+
+    Yields a dict in which the caller sets the "endpoint" (route template) and
+    "status" labels before the block exits. If a stage ran during the request,
+    the time from its end to the exit is recorded as the response stage
+    (serializing and handing over the response).
+    """
+    if MULTIPROCESS_DIR:
+        _start_gauge_refresher()
+    REQUESTS_IN_FLIGHT.inc()
+    mark = [0.0]
+    token = _last_stage_end.set(mark)
+    result = {"endpoint": "other", "status": "500"}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        end = time.perf_counter()
+        _last_stage_end.reset(token)
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_SECONDS.labels(result["endpoint"], method, result["status"]).observe(end - start)
+        if mark[0]:
+            _record_stage(STAGE_RESPONSE, end - mark[0])
+
+@contextmanager
+def collect_stages() -> Iterator[List[Tuple[str, float]]]:
+    """
+    Also append the stages recorded while the block runs to the yielded list, as (stage, seconds).
+
+    The list follows the request's context, into threads started with
+    asyncio.to_thread() or contextvars.copy_context() as well.
+    """
+    stages: List[Tuple[str, float]] = []
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+def record_prediction(disease: str) -> None:
+    PREDICTIONS_TOTAL.labels(disease).inc()
+
+def record_error(error) -> None:
+    """Count an error, given as an exception or as an error type name."""
+    ERRORS_TOTAL.labels(error if isinstance(error, str) else type(error).__name__).inc()
+
+def render() -> str:
+    """The metrics in the Prometheus text format: of this process, or of all worker processes in multiprocess mode."""
+    refresh_gauges()
+    if not MULTIPROCESS_DIR:
+        return generate_latest(REGISTRY).decode("utf-8")
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry).decode("utf-8")
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """In multiprocess mode, drop the live gauges of a worker process that exited (this one by default); its counters are kept."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid if pid is not None else os.getpid())
@@ -0,0 +1,141 @@
+
+import io
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Model input size (width, height)
+TARGET_SIZE = (224, 224)
+
+RESAMPLE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "box": Image.BOX,
+    "bilinear": Image.BILINEAR,
+    "hamming": Image.HAMMING,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+}
+
+def open_image(image: Any) -> Image.Image:
+    """Open an image given as a file path, raw bytes or a binary file-like object, without touching disk for the latter two."""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = io.BytesIO(image)
+    elif hasattr(image, "seek"):
+        image.seek(0)
+    return Image.open(image)
+
+class ImagePreprocessor:
+    """
+    Decode, resize and normalize images into model input tensors.
+
+    JPEGs are decoded in draft mode, which lets libjpeg scale the image down by
+    1/2, 1/4 or 1/8 while decoding (the smallest scale that is still at least the
+    target size), so a 12-MP phone photo is never fully decoded. The final resize
+    and the normalization write straight into a float32 (or uint8) buffer, which
+    callers can preallocate, instead of going through intermediate float64 arrays.
+    """
+
+    def __init__(
+        self,
+        size: Tuple[int, int] = TARGET_SIZE,
+        resample: str = "bicubic",
+        jpeg_draft: bool = True,
+        dtype: Any = np.float32,
+    ):
+        """
+        Args:
+            size: Output (width, height)
+            resample: Name of the Pillow filter used for the final resize
+            jpeg_draft: Use reduced-size JPEG decoding
+            dtype: Output dtype; floating types are scaled to [0, 1], uint8 is left as 0-255
+        """
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unknown resample filter '{resample}'. Choose one of: {', '.join(RESAMPLE_FILTERS)}")
+
+        self.size = tuple(size)
+        self.resample_name = resample
+        self.resample = RESAMPLE_FILTERS[resample]
+        self.jpeg_draft = jpeg_draft
+        self.dtype = np.dtype(dtype)
+        self.shape = (self.size[1], self.size[0], 3)
+
+    def decode(self, image: Any, timings: Optional[Dict[str, float]] = None) -> Image.Image:
+        """
+        Decode an image (path, bytes or file-like) into an RGB image of the output size.
+
+        If `timings` is given, the seconds spent decoding are stored in it under "decode".
+        """
+        start = time.perf_counter()
+        img = open_image(image)
+        if self.jpeg_draft and img.format == "JPEG":
+            # Must happen before the pixel data is loaded; never scales below the requested size
+            img.draft("RGB", self.size)
+        img.load()
+        if timings is not None:
+            timings["decode"] = time.perf_counter() - start
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != self.size:
+            img = img.resize(self.size, self.resample)
+        return img
+
+    def to_uint8(self, image: Any, timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Decode and resize an image into a (height, width, 3) uint8 array.
+
+        If `timings` is given, the seconds spent decoding and resizing are stored in it under "decode" and "resize".
+        """
+        start = time.perf_counter()
+        pixels = np.asarray(self.decode(image, timings), dtype=np.uint8)
+        if timings is not None:
+            timings["resize"] = time.perf_counter() - start - timings["decode"]
+        return pixels
+
+    def preprocess(self, image: Any, out: Optional[np.ndarray] = None, timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Decode, resize and normalize one image.
+
+        Args:
+            image: Image file path, raw bytes or a binary file-like object
+            out: Optional preallocated array of shape (height, width, 3) and this preprocessor's dtype
+            timings: Optional dict receiving the seconds spent decoding ("decode") and resizing and normalizing ("resize")
+
+        Returns:
+            np.ndarray: `out` (or a new array) holding the model input
+        """
+        start = time.perf_counter()
+        pixels = self.to_uint8(image, timings)
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+
+        if self.dtype.kind == "f":
+            # Single pass from uint8 into the output buffer, no float64 temporary
+            np.multiply(pixels, self.dtype.type(1.0 / 255.0), out=out)
+        else:
+            out[...] = pixels
+        if timings is not None:
+            timings["resize"] = time.perf_counter() - start - timings["decode"]
+        return out
+
+    def allocate_batch(self, batch_size: int) -> np.ndarray:
+        """Allocate an uninitialized (batch_size, height, width, 3) input buffer."""
+        return np.empty((batch_size,) + self.shape, dtype=self.dtype)
+
+    def preprocess_many(self, images: Sequence[Any], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Preprocess a list of images into one contiguous batch, each written in place into its row.
+
+        Args:
+            images: Image file paths, raw bytes or binary file-like objects
+            out: Optional preallocated batch buffer with at least len(images) rows
+
+        Returns:
+            np.ndarray: Array of shape (len(images), height, width, 3)
+        """
+        if out is None:
+            out = self.allocate_batch(len(images))
+        for i, image in enumerate(images):
+            self.preprocess(image, out=out[i])
+        return out[:len(images)]
@@ -0,0 +1,246 @@
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Header that forces the profiling of one request: "<expiry unix time>.<hex HMAC-SHA256 of the expiry>"
+PROFILE_HEADER = "X-Profile-Token"
+
+# Top Python frames of threads that are waiting for work rather than doing any: the event loop's
+# selector, idle executor workers, queue and condition waits. Skipped unless it is the request's own thread.
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+}
+
+def sign_profile_token(secret: str, ttl: float = 300.0) -> str:
+    """A PROFILE_HEADER value valid for `ttl` seconds."""
+    expires = str(int(time.time() + ttl))
+    signature = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+def verify_profile_token(secret: str, token: Optional[str]) -> bool:
+    if not secret or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+class ProfileSession:
+    """Stacks sampled while one request was being handled."""
+
+    __slots__ = ("thread_id", "forced", "stacks", "samples", "start", "wall_start")
+
+    def __init__(self, thread_id: Optional[int], forced: bool):
+        self.thread_id = thread_id
+        self.forced = forced
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.start = time.perf_counter()
+        self.wall_start = datetime.now()
+
+class StackSampler:
+    """
+    Samples the Python stacks of the process from one background thread, for the sessions active at the time.
+
+    Every `interval` seconds the stack of each thread is folded into a
+    `thread;outer frame;...;inner frame` string and counted in each active
+    session, which is the collapsed format of flamegraph.pl, speedscope and
+    inferno. The work of one request can be spread over several threads (the
+    event loop, executors, preprocessing pools), so every thread is sampled;
+    work of other requests running at the same time shows up as well. Idle
+    threads are skipped, except the request's own thread, whose waits are part
+    of its latency. The thread only runs while a session is active.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._sessions: List[ProfileSession] = []
+        self._labels: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def start(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def stop(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.remove(session)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._sessions:
+                    self._wakeup.wait()
+            stacks = self._sample(own_id)
+            # Counted under the lock, so a session is no longer written to once stop() has returned
+            with self._lock:
+                for session in self._sessions:
+                    session.samples += 1
+                    for thread_id, (stack, idle) in stacks.items():
+                        if not idle or thread_id == session.thread_id:
+                            session.stacks[stack] += 1
+            time.sleep(self.interval)
+
+    def _sample(self, own_id: int) -> Dict[int, Tuple[str, bool]]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = {}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            idle = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+            stacks[thread_id] = (self._fold(names.get(thread_id, str(thread_id)), frame), idle)
+        return stacks
+
+    def _fold(self, thread_name: str, frame) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":").replace(" ", "_"))
+        return ";".join(reversed(labels))
+
+def _short_path(filename: str) -> str:
+    # Relative to site-packages or the backend directory, to keep the frame labels readable
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep, "backend" + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return os.path.basename(filename)
+
+class RequestProfiler:
+    """
+    Decides which requests to profile, samples their stacks and writes one profile per kept request.
+
+    A request is profiled when it carries a valid signed PROFILE_HEADER, or
+    else with probability `sample_rate`. Sampled requests are kept when they
+    took at least `slow_threshold_ms` (0 keeps all of them); signed ones always
+    are. Each kept request gets a `<time>-<endpoint>-<ms>ms.collapsed` file of
+    folded stacks and a `.json` file with its status, duration and per-stage
+    breakdown, written from a background thread after the response. Only the
+    newest `max_profiles` are kept in `directory`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float = 0.0,
+        slow_threshold_ms: float = 0.0,
+        interval_ms: float = 5.0,
+        max_profiles: int = 100,
+        secret: str = "",
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_profiles = max_profiles
+        self.secret = secret
+        self._sampler = StackSampler(interval_ms / 1000)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+    def start(self, token: Optional[str] = None, thread_id: Optional[int] = None) -> Optional[ProfileSession]:
+        """Start sampling for a request if it is selected; returns None, at the cost of one random(), if it is not."""
+        forced = verify_profile_token(self.secret, token) if token else False
+        if not forced and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        session = ProfileSession(thread_id, forced)
+        self._sampler.start(session)
+        return session
+
+    def finish(self, session: ProfileSession, stages: List[Tuple[str, float]], info: Dict[str, Any]) -> None:
+        """
+        Stop sampling, and write the profile in the background if the request is kept.
+
+        `info` describes the request (method, path, endpoint, status); `stages`
+        are the (stage, seconds) recorded during it, see inference.metrics.collect_stages().
+        """
+        duration_ms = (time.perf_counter() - session.start) * 1000
+        self._sampler.stop(session)
+        if not session.forced and duration_ms < self.slow_threshold_ms:
+            return
+        self._writer.submit(self._write, session, list(stages), dict(info), duration_ms)
+
+    def _write(self, session: ProfileSession, stages: List[Tuple[str, float]], info: Dict[str, Any], duration_ms: float):
+        breakdown: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for stage_name, seconds in stages:
+            breakdown[stage_name] = breakdown.get(stage_name, 0.0) + seconds * 1000
+            counts[stage_name] = counts.get(stage_name, 0) + 1
+
+        endpoint = re.sub(r"[^A-Za-z0-9]+", "_", str(info.get("endpoint") or "other")).strip("_") or "root"
+        name = f"{session.wall_start.strftime('%Y%m%dT%H%M%S%f')}-{endpoint}-{int(duration_ms)}ms"
+        summary = dict(
+            info,
+            started_at=session.wall_start.isoformat(),
+            duration_ms=round(duration_ms, 3),
+            forced=session.forced,
+            samples=session.samples,
+            interval_ms=self._sampler.interval * 1000,
+            stages_ms={stage_name: round(ms, 3) for stage_name, ms in breakdown.items()},
+            stage_counts=counts,
+        )
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name + ".collapsed"), "w") as f:
+                for stack, count in session.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(os.path.join(self.directory, name + ".json"), "w") as f:
+                json.dump(summary, f, indent=2)
+            self._rotate()
+        except OSError as e:
+            logger.warning(f"Could not write the profile {name}: {str(e)}")
+
+    def _rotate(self):
+        # File names start with the time, so the oldest sort first
+        profiles = sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            for extension in (".json", ".collapsed"):
+                try:
+                    os.remove(os.path.join(self.directory, name + extension))
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Print a {PROFILE_HEADER} header value that makes the API profile a request.")
+    parser.add_argument("--secret", default=os.environ.get("PROFILING_SECRET", ""), help="Defaults to PROFILING_SECRET")
+    parser.add_argument("--ttl", type=float, default=300.0, help="Seconds the token stays valid")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("no secret: pass --secret or set PROFILING_SECRET")
+    print(sign_profile_token(args.secret, args.ttl))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .archives import IMAGE_EXTENSIONS
+from .backends import InferenceBackend
+from .preprocessing import ImagePreprocessor
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# (image path, class index or None when the image's folder is not a class name)
+Sample = Tuple[str, Optional[int]]
+
+def find_samples(directory: str, class_names: Sequence[str], limit: Optional[int] = None) -> List[Sample]:
+    """
+    List the images under `directory`, labelled by the name of the folder they are in.
+
+    Images in a folder named after one of `class_names` (e.g. calibration/Apple___healthy/1.jpg)
+    are labelled with that class, so the drift report can show accuracy; any other
+    image is unlabelled and only used for calibration and agreement. With a limit,
+    images are taken round-robin across folders so every class is represented.
+    """
+    class_index = {name: i for i, name in enumerate(class_names)}
+    by_folder: Dict[str, List[str]] = {}
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS and not filename.startswith("."):
+                by_folder.setdefault(root, []).append(os.path.join(root, filename))
+
+    samples: List[Sample] = []
+    folders = [(class_index.get(os.path.basename(root)), paths) for root, paths in sorted(by_folder.items())]
+    for i in range(max((len(paths) for _, paths in folders), default=0)):
+        for label, paths in folders:
+            if i < len(paths):
+                samples.append((paths[i], label))
+    return samples[:limit] if limit else samples
+
+def iter_batches(samples: Sequence[Sample], preprocessor: ImagePreprocessor, batch_size: int) -> Iterator[Tuple[np.ndarray, List[Optional[int]]]]:
+    """Preprocess samples into float32 batches, reusing one batch buffer."""
+    buffer = preprocessor.allocate_batch(batch_size)
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        yield preprocessor.preprocess_many([path for path, _ in chunk], out=buffer), [label for _, label in chunk]
+
+def export_tflite(model, output_path: str, precision: str, samples: Sequence[Sample] = (), preprocessor: Optional[ImagePreprocessor] = None) -> None:
+    """
+    Convert a Keras model to TensorFlow Lite with post-training quantization.
+
+    float16 stores the weights as float16 and computes in float32. int8 quantizes
+    weights and activations using ranges calibrated on `samples`; the model takes
+    uint8 pixels (scale 1/255), so the TFLite backend feeds it without rounding error.
+    """
+    import tensorflow as tf
+
+    input_signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input")]
+    concrete_function = tf.function(lambda x: model(x, training=False)).get_concrete_function(*input_signature)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_function], model)
+
+    if precision == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif precision == "int8":
+        if not samples:
+            raise ValueError("int8 quantization needs calibration images")
+        preprocessor = preprocessor or ImagePreprocessor()
+
+        def representative_dataset():
+            for batch, _ in iter_batches(samples, preprocessor, 1):
+                yield [batch.copy()]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+    elif precision != "float32":
+        raise ValueError(f"Unknown precision '{precision}'. Choose one of: {', '.join(PRECISIONS)}")
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+def export_onnx(float_model_path: str, output_path: str, precision: str, samples: Sequence[Sample] = (), preprocessor: Optional[ImagePreprocessor] = None) -> None:
+    """
+    Quantize an exported float32 ONNX model.
+
+    float16 converts weights and operators to float16 but keeps float32 inputs and
+    outputs. int8 is static QDQ quantization (per-channel int8 weights, uint8
+    activations) calibrated on `samples`.
+    """
+    if precision == "float16":
+        import onnx
+        from onnxconverter_common import float16
+
+        model = float16.convert_float_to_float16(onnx.load(float_model_path), keep_io_types=True)
+        onnx.save(model, output_path)
+    elif precision == "int8":
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+        import onnxruntime as ort
+
+        if not samples:
+            raise ValueError("int8 quantization needs calibration images")
+        preprocessor = preprocessor or ImagePreprocessor()
+        input_name = ort.InferenceSession(float_model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+        class Reader(CalibrationDataReader):
+            def __init__(self):
+                self._batches = iter_batches(samples, preprocessor, 1)
+
+            def get_next(self):
+                batch = next(self._batches, None)
+                return {input_name: batch[0].copy()} if batch is not None else None
+
+        quantize_static(
+            float_model_path,
+            output_path,
+            Reader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+    else:
+        raise ValueError(f"ONNX models can be quantized to float16 or int8, not '{precision}'")
+
+def _empty_group() -> dict:
+    return {"images": 0, "labelled": 0, "agree": 0, "reference_correct": 0, "candidate_correct": 0, "prob_diff": 0.0}
+
+def _time_predict(backend: InferenceBackend, batch: np.ndarray) -> Tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    output = np.asarray(backend.predict(batch), dtype=np.float32)
+    return output, time.perf_counter() - start
+
+def measure_drift(
+    reference: InferenceBackend,
+    candidate: InferenceBackend,
+    samples: Sequence[Sample],
+    class_names: Sequence[str],
+    preprocessor: Optional[ImagePreprocessor] = None,
+    batch_size: int = 32,
+) -> dict:
+    """
+    Compare a quantized model against the float model on the same images.
+
+    Per class the report has the number of images, how often both models agree
+    on the top-1 class, the mean absolute difference of the probabilities and,
+    for labelled images, each model's accuracy and the delta. Unlabelled images
+    are grouped under the class the float model predicts. Also reports the
+    milliseconds per image of each model on this machine.
+    """
+    preprocessor = preprocessor or ImagePreprocessor()
+    num_classes = len(class_names)
+    stats = {i: _empty_group() for i in range(num_classes)}
+    reference_seconds = candidate_seconds = 0.0
+
+    # Warm up both models so one-off initialization does not count as latency
+    if samples:
+        warmup = next(iter_batches(samples[:1], preprocessor, 1))[0]
+        reference.predict(warmup)
+        candidate.predict(warmup)
+
+    for batch, labels in iter_batches(samples, preprocessor, batch_size):
+        reference_output, seconds = _time_predict(reference, batch)
+        reference_seconds += seconds
+        candidate_output, seconds = _time_predict(candidate, batch)
+        candidate_seconds += seconds
+
+        reference_top = reference_output.argmax(axis=1)
+        candidate_top = candidate_output.argmax(axis=1)
+        prob_diff = np.abs(reference_output - candidate_output).mean(axis=1)
+        for i, label in enumerate(labels):
+            group = stats.setdefault(label if label is not None else int(reference_top[i]), _empty_group())
+            group["images"] += 1
+            group["agree"] += int(reference_top[i] == candidate_top[i])
+            group["prob_diff"] += float(prob_diff[i])
+            if label is not None:
+                group["labelled"] += 1
+                group["reference_correct"] += int(reference_top[i] == label)
+                group["candidate_correct"] += int(candidate_top[i] == label)
+
+    def summarize(group: dict) -> dict:
+        images, labelled = group["images"], group["labelled"]
+        reference_accuracy = group["reference_correct"] / labelled if labelled else None
+        candidate_accuracy = group["candidate_correct"] / labelled if labelled else None
+        return {
+            "images": images,
+            "agreement": group["agree"] / images if images else None,
+            "mean_abs_prob_diff": group["prob_diff"] / images if images else None,
+            "float_accuracy": reference_accuracy,
+            "quantized_accuracy": candidate_accuracy,
+            "accuracy_delta": candidate_accuracy - reference_accuracy if labelled else None,
+        }
+
+    total = {key: sum(group[key] for group in stats.values()) for key in _empty_group()}
+    return {
+        "overall": summarize(total),
+        "per_class": [
+            dict(summarize(group), **{"class": class_names[index] if index < num_classes else f"Unknown (Class {index})"})
+            for index, group in sorted(stats.items())
+        ],
+        "float_ms_per_image": reference_seconds * 1000 / len(samples) if samples else None,
+        "quantized_ms_per_image": candidate_seconds * 1000 / len(samples) if samples else None,
+    }
@@ -0,0 +1,275 @@
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ModelNotFoundError(LookupError):
+    """Raised when a prediction asks for a model version that does not exist."""
+
+    def __init__(self, version: str):
+        super().__init__(f"Model version '{version}' not found")
+        self.version = version
+
+def version_sort_key(version: str) -> Tuple[int, int, str]:
+    """Order versions like TensorFlow Serving: numeric names by value, other names (e.g. dates) after them, lexicographically."""
+    if version.isdigit():
+        return (0, int(version), "")
+    return (1, 0, version)
+
+def find_model_versions(model_dir: str, filename: str) -> Dict[str, str]:
+    """
+    Find the versions of a model file in `model_dir`.
+
+    Versions are sub-directories holding the model file, as in TensorFlow
+    Serving's layout (ml_models/1/leaf_disease_model.onnx, ml_models/2/...).
+    Hidden directories are skipped, so a new version can be copied into
+    `.tmp-3/` and renamed to `3/` once it is complete. Without any version
+    directory, a model file directly in `model_dir` is version "0".
+
+    Returns:
+        dict: Version name -> path of its model file
+    """
+    versions = {}
+    try:
+        entries = list(os.scandir(model_dir))
+    except FileNotFoundError:
+        return versions
+    for entry in entries:
+        if entry.name.startswith(".") or not entry.is_dir():
+            continue
+        path = os.path.join(entry.path, filename)
+        if os.path.exists(path):
+            versions[entry.name] = path
+    if not versions and os.path.exists(os.path.join(model_dir, filename)):
+        versions["0"] = os.path.join(model_dir, filename)
+    return versions
+
+def tf_serving_status_url(predict_url: str) -> str:
+    """Model status URL for a TensorFlow Serving REST predict URL (.../v1/models/<name>:predict)."""
+    return predict_url.rsplit(":", 1)[0]
+
+def tf_serving_version_url(predict_url: str, version: str) -> str:
+    """Predict URL pinned to one version: .../v1/models/<name>/versions/<version>:predict."""
+    base, method = predict_url.rsplit(":", 1)
+    return f"{base}/versions/{version}:{method}"
+
+def find_tf_serving_versions(predict_url: str, get: Callable[..., Any]) -> Dict[str, str]:
+    """
+    Ask TensorFlow Serving which versions of the model are available.
+
+    TensorFlow Serving watches its own version directories and loads new versions
+    by itself; this only learns their names so requests can be pinned to one.
+
+    Args:
+        predict_url: The model's REST predict URL
+        get: An HTTP GET function returning a response with status_code and json()
+
+    Returns:
+        dict: Version name -> its pinned predict URL
+    """
+    response = get(tf_serving_status_url(predict_url))
+    if response.status_code != 200:
+        raise RuntimeError(f"TensorFlow Serving returned status code {response.status_code} for the model status")
+    return {
+        str(status["version"]): tf_serving_version_url(predict_url, str(status["version"]))
+        for status in response.json().get("model_version_status", [])
+        if status.get("state") == "AVAILABLE"
+    }
+
+class LoadedModel:
+    """One loaded version of the model. Closed once it is retired and no prediction uses it any more."""
+
+    def __init__(self, version: str, location: str, model: Any):
+        self.version = version
+        self.location = location
+        self.model = model
+        self._users = 0
+        self._retired = False
+
+    def close(self) -> None:
+        close = getattr(self.model, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Error closing model version {self.version}: {str(e)}")
+
+class ModelRegistry:
+    """
+    The loaded versions of the model, serving the newest one by default.
+
+    `find_versions` lists the available versions (name -> location) and `load`
+    turns a location into a ready-to-use model (an inference backend or a
+    transport), warmed up. A watcher thread polls `find_versions`; when a newer
+    version shows up it is loaded and warmed up in the background and then
+    swapped in atomically. Predictions hold a reference on the version they
+    started with (`use`), so a swap never pulls a model out from under an
+    in-flight request: the old version is closed when its last user is done.
+    Older versions can still be asked for explicitly; they are loaded on demand
+    and at most `max_loaded` versions are kept in memory.
+    """
+
+    def __init__(
+        self,
+        find_versions: Callable[[], Dict[str, str]],
+        load: Callable[[str, str], Any],
+        poll_interval: float = 0.0,
+        max_loaded: int = 2,
+        name: str = "model",
+    ):
+        self._find_versions = find_versions
+        self._load = load
+        self.poll_interval = poll_interval
+        self.max_loaded = max(1, max_loaded)
+        self.name = name
+
+        self._loaded: Dict[str, LoadedModel] = {}
+        self._current: Optional[LoadedModel] = None
+        self._lock = threading.Lock()          # Guards _loaded, _current and reference counts
+        self._load_lock = threading.Lock()     # One version is loaded at a time
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def current_version(self) -> Optional[str]:
+        current = self._current
+        return current.version if current is not None else None
+
+    def loaded_versions(self) -> List[str]:
+        with self._lock:
+            return sorted(self._loaded, key=version_sort_key)
+
+    def _load_version(self, version: str, location: str) -> LoadedModel:
+        logger.info(f"Loading {self.name} version {version} from {location}")
+        return LoadedModel(version, location, self._load(version, location))
+
+    def refresh(self) -> bool:
+        """
+        Load the newest available version if it is not the one being served, then swap it in.
+
+        Returns:
+            bool: Whether a new version was swapped in
+        """
+        with self._load_lock:
+            versions = self._find_versions()
+            if not versions:
+                return False
+            latest = max(versions, key=version_sort_key)
+            if self.current_version == latest:
+                return False
+
+            with self._lock:
+                loaded = self._loaded.get(latest)
+            if loaded is None:
+                loaded = self._load_version(latest, versions[latest])
+
+            with self._lock:
+                self._loaded[latest] = loaded
+                self._current = loaded
+                self._evict()
+        logger.info(f"Serving {self.name} version {latest}")
+        return True
+
+    def _retire(self, loaded: LoadedModel) -> None:
+        # Called with _lock held
+        if self._loaded.get(loaded.version) is loaded:
+            del self._loaded[loaded.version]
+        loaded._retired = True
+        if loaded._users == 0:
+            loaded.close()
+
+    def _evict(self, keep: Optional[LoadedModel] = None) -> None:
+        # Called with _lock held: drop the oldest versions beyond max_loaded, never the current one or `keep`
+        extra = [
+            version for version in sorted(self._loaded, key=version_sort_key)
+            if self._loaded[version] not in (self._current, keep)
+        ]
+        while len(self._loaded) > self.max_loaded and extra:
+            self._retire(self._loaded[extra.pop(0)])
+
+    def acquire(self, version: Optional[str] = None) -> LoadedModel:
+        """
+        Take a reference on a version (the current one by default), loading it first if needed.
+
+        Every acquire must be matched by a release; `use` does both.
+
+        Raises:
+            ModelNotFoundError: If `version` does not exist
+            RuntimeError: If no version is given and none is available
+        """
+        with self._lock:
+            loaded = self._current if version is None else self._loaded.get(version)
+            if loaded is not None:
+                loaded._users += 1
+                return loaded
+        if version is None:
+            # Nothing was available at startup (or the load failed); look again
+            self.refresh()
+            with self._lock:
+                if self._current is None:
+                    raise RuntimeError(f"No {self.name} version is available")
+                self._current._users += 1
+                return self._current
+
+        with self._load_lock:
+            with self._lock:
+                loaded = self._loaded.get(version)
+            if loaded is None:
+                location = self._find_versions().get(version)
+                if location is None:
+                    raise ModelNotFoundError(version)
+                loaded = self._load_version(version, location)
+            with self._lock:
+                self._loaded[version] = loaded
+                loaded._users += 1
+                self._evict(keep=loaded)
+            return loaded
+
+    def release(self, loaded: LoadedModel) -> None:
+        with self._lock:
+            loaded._users -= 1
+            close = loaded._retired and loaded._users == 0
+        if close:
+            loaded.close()
+
+    @contextmanager
+    def use(self, version: Optional[str] = None) -> Iterator[LoadedModel]:
+        """Hold a version of the model (the current one by default) for the duration of the block."""
+        loaded = self.acquire(version)
+        try:
+            yield loaded
+        finally:
+            self.release(loaded)
+
+    def is_loaded(self, version: Optional[str]) -> bool:
+        return (self._current is not None) if version is None else version in self._loaded
+
+    def start_watching(self) -> None:
+        """Poll for new versions every `poll_interval` seconds in a daemon thread (no-op if the interval is 0)."""
+        if self.poll_interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name=f"{self.name}-registry", daemon=True)
+        self._watcher.start()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current version; a broken upload is retried on the next poll
+                logger.error(f"Error loading a new {self.name} version: {str(e)}")
+
+    def close(self) -> None:
+        """Stop watching and close every loaded version once its in-flight predictions are done."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        with self._lock:
+            for loaded in list(self._loaded.values()):
+                self._retire(loaded)
+            self._current = None
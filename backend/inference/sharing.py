@@ -0,0 +1,76 @@
+
+import logging
+import mmap
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SharedOnnxModel:
+    """
+    The weights of an ONNX model held in shared memory, for pre-fork servers.
+
+    Loaded in the server's master process with the `onnx` package only, which
+    starts no threads, so forking afterwards is safe (ONNX Runtime itself must
+    not be imported before the fork). Every initializer is copied into one
+    anonymous MAP_SHARED mapping and stripped from the graph. Forked workers
+    create their own ONNX Runtime session from the small graph and hand it the
+    weights as user-provided initializers, which ONNX Runtime uses in place, so
+    N workers keep a single copy of the weights instead of N.
+    """
+
+    def __init__(self, model_path: str, model_bytes: bytes, buffer: mmap.mmap, layout: Dict[str, Tuple[int, Tuple[int, ...], str]]):
+        self.model_path = model_path
+        self.model_bytes = model_bytes
+        self._buffer = buffer
+        self._layout = layout
+
+    @classmethod
+    def load(cls, model_path: str) -> "SharedOnnxModel":
+        import onnx
+        from onnx import TensorProto, numpy_helper
+
+        model = onnx.load(model_path)
+        tensors = [(initializer, numpy_helper.to_array(initializer)) for initializer in model.graph.initializer]
+
+        # 64-byte aligned slots, as ONNX Runtime's CPU kernels expect
+        offsets = []
+        size = 0
+        for _, array in tensors:
+            offsets.append(size)
+            size += (array.nbytes + 63) // 64 * 64
+        buffer = mmap.mmap(-1, max(size, 1))
+
+        layout = {}
+        for (initializer, array), offset in zip(tensors, offsets):
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=buffer, offset=offset)
+            view[...] = array
+            layout[initializer.name] = (offset, array.shape, array.dtype.str)
+
+            # Keep the declaration, drop the data: ONNX Runtime gets it from the shared buffer.
+            # It only checks that the external file exists, so point at the model file itself.
+            initializer.ClearField("raw_data")
+            for field in ("float_data", "int32_data", "int64_data", "double_data", "uint64_data", "string_data"):
+                initializer.ClearField(field)
+            del initializer.external_data[:]
+            initializer.data_location = TensorProto.EXTERNAL
+            location = initializer.external_data.add()
+            location.key = "location"
+            location.value = os.path.basename(model_path)
+
+        logger.info(f"Loaded {len(layout)} initializers ({size / 1e6:.1f} MB) of {model_path} into shared memory")
+        return cls(model_path, model.SerializeToString(), buffer, layout)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Numpy views of the weights, backed by the shared buffer (nothing is copied)."""
+        arrays = {}
+        for name, (offset, shape, dtype) in self._layout.items():
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._buffer, offset=offset)
+            arrays[name] = view
+        return arrays
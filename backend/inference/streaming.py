@@ -0,0 +1,31 @@
+
+import json
+from typing import Any, Dict, Optional
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Headers that stop proxies (e.g. nginx) from buffering the stream until it ends
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def wants_event_stream(accept: Optional[str]) -> bool:
+    """Whether the client asked for server-sent events rather than newline-delimited JSON."""
+    return SSE_MEDIA_TYPE in (accept or "")
+
+def stream_media_type(sse: bool) -> str:
+    return SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE
+
+def encode_stream_event(data: Dict[str, Any], sse: bool, event: str = "prediction") -> str:
+    """
+    Encode one streamed item.
+
+    NDJSON streams carry one JSON object per line. SSE streams name each event
+    (prediction, error, done) so EventSource clients can listen for them separately.
+    """
+    payload = json.dumps(data, separators=(",", ":"))
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
@@ -0,0 +1,320 @@
+
+import asyncio
+import base64
+import io
+import json
+import logging
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .client import InferenceClient
+from .metrics import STAGE_SERIALIZE, stage
+
+if TYPE_CHECKING:
+    from .backends import InferenceBackend
+    from .circuit import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Kinds of instance a transport expects from the preprocessing step
+INPUT_FLOAT = "float"    # float array in [0, 1], shape (224, 224, 3)
+INPUT_UINT8 = "uint8"    # uint8 array in [0, 255], shape (224, 224, 3)
+INPUT_PNG = "png"        # PNG-encoded bytes of the resized (224, 224) RGB image
+
+class TFServingError(Exception):
+    """Raised when TensorFlow Serving answers a predict request with an error status."""
+
+    def __init__(self, status_code: Any, text: str = ""):
+        super().__init__(f"TensorFlow Serving returned status code {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """PNG-encode a uint8 RGB array, the instance the b64 transport sends."""
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def instances_from_batch(batch: np.ndarray, input_kind: str) -> List[Any]:
+    """Turn a float32 batch scaled to [0, 1] into the instances a transport of `input_kind` sends."""
+    if input_kind == INPUT_FLOAT:
+        return list(batch)
+    # The float pixels were uint8 / 255, so rounding gets the original values back
+    pixels = np.rint(np.asarray(batch) * 255.0).astype(np.uint8)
+    if input_kind == INPUT_PNG:
+        return [encode_png(image) for image in pixels]
+    return list(pixels)
+
+class Transport:
+    """Base class for the ways a batch of images can be sent to TensorFlow Serving."""
+
+    name = ""
+    input_kind = INPUT_FLOAT
+
+    def __init__(self, breaker: Optional["CircuitBreaker"] = None):
+        self.breaker = breaker
+
+    def _guard(self):
+        # Fails fast while the breaker is open, and records the call's duration and outcome in it
+        return self.breaker.call() if self.breaker is not None else nullcontext()
+
+    def serialize(self, instances: List[Any]) -> bytes:
+        """Encode a batch of instances into the request body sent over the wire."""
+        raise NotImplementedError
+
+    def predict(self, instances: List[Any]) -> List[List[float]]:
+        """Send a batch of instances and return one prediction row per instance."""
+        raise NotImplementedError
+
+    async def apredict(self, instances: List[Any]) -> List[List[float]]:
+        """Async variant of predict; runs the blocking call in a worker thread unless overridden."""
+        return await asyncio.to_thread(self.predict, instances)
+
+    def close(self) -> None:
+        """Release anything the transport holds beyond the shared HTTP clients."""
+
+class RestTransport(Transport):
+    """
+    Base class for transports using the TensorFlow Serving REST predict API.
+
+    Requests go through `client`, normally the process-wide InferenceClient with
+    its connection pool, timeouts and retries; a private one is made without it.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: Optional[InferenceClient] = None,
+        signature_name: str = "serving_default",
+        breaker: Optional["CircuitBreaker"] = None,
+    ):
+        super().__init__(breaker)
+        self.url = url
+        self.client = client if client is not None else InferenceClient()
+        self.signature_name = signature_name
+
+    def encode_instance(self, instance: Any) -> Any:
+        raise NotImplementedError
+
+    def serialize(self, instances: List[Any]) -> bytes:
+        payload = {
+            "signature_name": self.signature_name,
+            "instances": [self.encode_instance(instance) for instance in instances]
+        }
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+    def predict(self, instances: List[Any]) -> List[List[float]]:
+        with stage(STAGE_SERIALIZE):
+            data = self.serialize(instances)
+        with self._guard():
+            response = self.client.post(
+                self.url,
+                data=data,
+                headers={"Content-Type": "application/json"}
+            )
+            return self._parse_response(response.status_code, response.text, response.json)
+
+    async def apredict(self, instances: List[Any]) -> List[List[float]]:
+        with stage(STAGE_SERIALIZE):
+            data = self.serialize(instances)
+        with self._guard():
+            response = await self.client.apost(
+                self.url,
+                data=data,
+                headers={"Content-Type": "application/json"}
+            )
+            return self._parse_response(response.status_code, response.text, response.json)
+
+    def _parse_response(self, status_code, text, json_body) -> List[List[float]]:
+        if status_code != 200:
+            logger.error(f"Error from TensorFlow Serving: {text}")
+            raise TFServingError(status_code, text)
+
+        return json_body()["predictions"]
+
+class JsonTransport(RestTransport):
+    """Normalized float pixels as nested JSON lists; works with any float signature."""
+
+    name = "json"
+    input_kind = INPUT_FLOAT
+
+    def encode_instance(self, instance: np.ndarray) -> Any:
+        return instance.tolist()
+
+class Uint8Transport(RestTransport):
+    """Raw 0-255 pixels as JSON ints, about a fifth of the JSON size; scaling happens in the signature."""
+
+    name = "uint8"
+    input_kind = INPUT_UINT8
+
+    def encode_instance(self, instance: np.ndarray) -> Any:
+        return instance.astype(np.uint8, copy=False).tolist()
+
+class Base64Transport(RestTransport):
+    """The resized image as a PNG {"b64": ...} string; decoding and scaling happen in the signature."""
+
+    name = "b64"
+    input_kind = INPUT_PNG
+
+    def encode_instance(self, instance: bytes) -> Any:
+        return {"b64": base64.b64encode(instance).decode("ascii")}
+
+class GrpcTransport(Transport):
+    """Float32 TensorProto with raw tensor_content over the gRPC PredictionService."""
+
+    name = "grpc"
+    input_kind = INPUT_FLOAT
+
+    def __init__(
+        self,
+        target: str,
+        model_name: str,
+        signature_name: str = "serving_default",
+        input_name: str = "inputs",
+        model_version: Optional[str] = None,
+        timeout: float = 30.0,
+        breaker: Optional["CircuitBreaker"] = None,
+    ):
+        super().__init__(breaker)
+        # Imported lazily so the REST transports don't require grpc/tensorflow-serving-api
+        from tensorflow.core.framework import tensor_pb2, tensor_shape_pb2, types_pb2
+        from tensorflow_serving.apis import predict_pb2
+
+        self._tensor_pb2 = tensor_pb2
+        self._tensor_shape_pb2 = tensor_shape_pb2
+        self._types_pb2 = types_pb2
+        self._predict_pb2 = predict_pb2
+
+        self.target = target
+        self.model_name = model_name
+        self.signature_name = signature_name
+        self.input_name = input_name
+        self.model_version = model_version
+        self.timeout = timeout
+
+        self._stub = None
+        self._stub_lock = threading.Lock()
+
+    def _get_stub(self):
+        # One channel per transport; gRPC multiplexes concurrent calls over it
+        if self._stub is None:
+            with self._stub_lock:
+                if self._stub is None:
+                    import grpc
+                    from tensorflow_serving.apis import prediction_service_pb2_grpc
+
+                    channel = grpc.insecure_channel(self.target)
+                    self._stub = prediction_service_pb2_grpc.PredictionServiceStub(channel)
+        return self._stub
+
+    def build_request(self, instances: List[np.ndarray]):
+        batch = np.stack(instances).astype(np.float32, copy=False)
+
+        tensor = self._tensor_pb2.TensorProto(
+            dtype=self._types_pb2.DT_FLOAT,
+            tensor_shape=self._tensor_shape_pb2.TensorShapeProto(
+                dim=[self._tensor_shape_pb2.TensorShapeProto.Dim(size=size) for size in batch.shape]
+            ),
+            tensor_content=batch.tobytes()
+        )
+
+        request = self._predict_pb2.PredictRequest()
+        request.model_spec.name = self.model_name
+        request.model_spec.signature_name = self.signature_name
+        if self.model_version is not None:
+            request.model_spec.version.value = int(self.model_version)
+        request.inputs[self.input_name].CopyFrom(tensor)
+        return request
+
+    def serialize(self, instances: List[np.ndarray]) -> bytes:
+        return self.build_request(instances).SerializeToString()
+
+    def predict(self, instances: List[np.ndarray]) -> List[List[float]]:
+        import grpc
+
+        with stage(STAGE_SERIALIZE):
+            request = self.build_request(instances)
+        with self._guard():
+            try:
+                response = self._get_stub().Predict(request, timeout=self.timeout)
+            except grpc.RpcError as e:
+                logger.error(f"Error from TensorFlow Serving: {e.details()}")
+                raise TFServingError(e.code().name, e.details() or "")
+
+        # Single-output classifiers; take the first (only) output tensor
+        output = next(iter(response.outputs.values()))
+        if output.tensor_content:
+            values = np.frombuffer(output.tensor_content, dtype=np.float32)
+        else:
+            values = np.asarray(output.float_val, dtype=np.float32)
+        return values.reshape(len(instances), -1).tolist()
+
+class InProcessTransport(Transport):
+    """Runs the model in this process through an in-process inference backend instead of TensorFlow Serving."""
+
+    name = "in_process"
+    input_kind = INPUT_FLOAT
+
+    def __init__(self, backend: "InferenceBackend"):
+        super().__init__()
+        self.backend = backend
+
+    def serialize(self, instances: List[np.ndarray]) -> bytes:
+        # Nothing goes over the wire; the stacked batch is what the model sees
+        return np.stack(instances).astype(np.float32, copy=False).tobytes()
+
+    def predict(self, instances: List[np.ndarray]) -> List[List[float]]:
+        return self.backend.predict(np.stack(instances)).tolist()
+
+    def close(self) -> None:
+        self.backend.close()
+
+TRANSPORTS: Dict[str, type] = {
+    JsonTransport.name: JsonTransport,
+    Uint8Transport.name: Uint8Transport,
+    Base64Transport.name: Base64Transport,
+    GrpcTransport.name: GrpcTransport,
+}
+
+def transport_class(name: str) -> type:
+    """The TensorFlow Serving transport class registered under `name`."""
+    try:
+        return TRANSPORTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown TF Serving transport '{name}'. Choose one of: {', '.join(TRANSPORTS)}")
+
+def create_tf_serving_transport(
+    name: str,
+    url: str,
+    client: Optional[InferenceClient] = None,
+    grpc_target: str = "localhost:8500",
+    model_name: str = "leaf_disease_model",
+    signature_name: str = "serving_default",
+    input_name: str = "inputs",
+    version: Optional[str] = None,
+    timeout: float = 30.0,
+    breaker: Optional["CircuitBreaker"] = None,
+) -> Transport:
+    """
+    Create the TensorFlow Serving transport `name`.
+
+    REST transports post to `url`, which should already be pinned to `version`
+    if there is one; the gRPC transport calls `grpc_target` and pins the version
+    in each request.
+    """
+    cls = transport_class(name)
+    if cls is GrpcTransport:
+        return GrpcTransport(
+            grpc_target,
+            model_name,
+            signature_name=signature_name,
+            input_name=input_name,
+            model_version=version,
+            timeout=timeout,
+            breaker=breaker
+        )
+    return cls(url, client=client, signature_name=signature_name, breaker=breaker)
@@ -0,0 +1,220 @@
+
+import contextvars
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .metrics import observe_stages
+from .preprocessing import ImagePreprocessor
+
+# Output kinds a pool can produce
+OUTPUT_FLOAT = "float"  # float32 in [0, 1]
+OUTPUT_UINT8 = "uint8"  # uint8 in [0, 255]
+
+POOL_MODES = ("inline", "thread", "process")
+
+class PoolSaturatedError(Exception):
+    """Raised when the preprocessing pool already has its maximum number of images queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Image preprocessing is saturated, please retry later")
+        self.retry_after = retry_after
+
+# State of a process-pool worker, set up once by _init_process_worker
+_worker_preprocessor: Optional[ImagePreprocessor] = None
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_slots: Optional[np.ndarray] = None
+
+def _init_process_worker(shm_name: str, num_slots: int, size, resample: str, jpeg_draft: bool):
+    global _worker_preprocessor, _worker_shm, _worker_slots
+    _worker_preprocessor = ImagePreprocessor(size=size, resample=resample, jpeg_draft=jpeg_draft)
+    # Spawned workers share the parent's resource tracker, which unlinks the segment only when the parent does
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_slots = np.ndarray((num_slots,) + _worker_preprocessor.shape, dtype=np.float32, buffer=_worker_shm.buf)
+
+def _uint8_view(slot: np.ndarray) -> np.ndarray:
+    """View the start of a float32 slot as a uint8 array of the same shape."""
+    return slot.view(np.uint8).reshape(-1)[:slot.size].reshape(slot.shape)
+
+def _preprocess_into_slot(slot: int, image: bytes, kind: str) -> Dict[str, float]:
+    """Run in a worker process: preprocess `image` straight into its shared memory slot and return the stage timings."""
+    timings: Dict[str, float] = {}
+    if kind == OUTPUT_UINT8:
+        np.copyto(_uint8_view(_worker_slots[slot]), _worker_preprocessor.to_uint8(image, timings))
+    else:
+        _worker_preprocessor.preprocess(image, out=_worker_slots[slot], timings=timings)
+    # Metrics live in the parent process; hand the timings back with the result
+    return timings
+
+class PreprocessPool:
+    """
+    Bounded worker pool for CPU-bound image decoding and resizing.
+
+    Modes:
+        inline  - run in the calling thread (no pool)
+        thread  - thread pool; Pillow releases the GIL while decoding and resizing
+        process - process pool; results come back through a shared memory slab
+                  with one slot per queued image, so only the encoded input bytes
+                  are pickled and the decoded array is never copied through a pipe
+
+    At most `max_pending` images are queued or running at once. Beyond that,
+    submit raises PoolSaturatedError immediately so callers can shed load (e.g.
+    answer 503 with Retry-After) instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        retry_after: int = 1,
+        preprocessor: Optional[ImagePreprocessor] = None,
+    ):
+        if mode not in POOL_MODES:
+            raise ValueError(f"Unknown preprocessing pool mode '{mode}'. Choose one of: {', '.join(POOL_MODES)}")
+
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max(1, max_pending)
+        self.retry_after = retry_after
+        self.preprocessor = preprocessor or ImagePreprocessor()
+
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.max_pending):
+            self._free_slots.put(slot)
+
+        self._executor = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._slots: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of images currently queued or being processed."""
+        return self.max_pending - self._free_slots.qsize()
+
+    def _ensure_started(self) -> None:
+        if self._executor is not None or self.mode == "inline":
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            if self.mode == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="preprocess")
+                return
+
+            # One float32 slot per pending image; uint8 outputs use the start of their slot
+            slot_bytes = int(np.prod(self.preprocessor.shape)) * np.dtype(np.float32).itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=slot_bytes * self.max_pending)
+            self._slots = np.ndarray(
+                (self.max_pending,) + self.preprocessor.shape, dtype=np.float32, buffer=self._shm.buf
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # Forking a threaded server process is unsafe; start clean interpreters instead
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(
+                    self._shm.name,
+                    self.max_pending,
+                    self.preprocessor.size,
+                    self.preprocessor.resample_name,
+                    self.preprocessor.jpeg_draft,
+                ),
+            )
+
+    def _acquire_slot(self, timeout: Optional[float]) -> int:
+        try:
+            if timeout is None:
+                return self._free_slots.get_nowait()
+            return self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolSaturatedError(self.retry_after)
+
+    def _run_local(self, image: Any, kind: str) -> np.ndarray:
+        timings: Dict[str, float] = {}
+        if kind == OUTPUT_UINT8:
+            pixels = self.preprocessor.to_uint8(image, timings)
+        else:
+            pixels = self.preprocessor.preprocess(image, timings=timings)
+        observe_stages(timings)
+        return pixels
+
+    def submit(self, image: Any, kind: str = OUTPUT_FLOAT, timeout: Optional[float] = None) -> Future:
+        """
+        Queue one image (raw bytes; paths and file-likes are also accepted by the inline and thread modes).
+
+        Args:
+            image: The image to preprocess
+            kind: OUTPUT_FLOAT or OUTPUT_UINT8
+            timeout: Seconds to wait for room in the queue; None fails immediately when it is full
+
+        Returns:
+            Future: Resolves to a (224, 224, 3) array of the requested kind
+
+        Raises:
+            PoolSaturatedError: If `max_pending` images are still queued after `timeout`
+        """
+        slot = self._acquire_slot(timeout)
+        try:
+            self._ensure_started()
+
+            if self.mode == "inline":
+                future: Future = Future()
+                try:
+                    future.set_result(self._run_local(image, kind))
+                except Exception as e:
+                    future.set_exception(e)
+                self._free_slots.put(slot)
+                return future
+
+            if self.mode == "thread":
+                # In the caller's context, so the stage timings reach the profile of its request
+                future = self._executor.submit(contextvars.copy_context().run, self._run_local, image, kind)
+                future.add_done_callback(lambda _: self._free_slots.put(slot))
+                return future
+
+            worker_future = self._executor.submit(_preprocess_into_slot, slot, bytes(image), kind)
+        except BaseException:
+            self._free_slots.put(slot)
+            raise
+
+        # Copy the result out of shared memory and hand the slot back
+        result: Future = Future()
+        context = contextvars.copy_context()
+
+        def _collect(done: Future) -> None:
+            try:
+                context.run(observe_stages, done.result())
+                view = self._slots[slot]
+                if kind == OUTPUT_UINT8:
+                    view = _uint8_view(view)
+                result.set_result(view.copy())
+            except Exception as e:
+                result.set_exception(e)
+            finally:
+                self._free_slots.put(slot)
+
+        worker_future.add_done_callback(_collect)
+        return result
+
+    def run(self, image: Any, kind: str = OUTPUT_FLOAT) -> np.ndarray:
+        """Preprocess one image in the pool and wait for the result."""
+        return self.submit(image, kind).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._shm is not None:
+                self._slots = None
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
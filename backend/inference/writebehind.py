@@ -0,0 +1,166 @@
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """
+    Acknowledges writes immediately and persists them from a background thread in batches.
+
+    `write` is called with up to `max_batch` items at a time: as soon as that many
+    are queued, or `flush_interval` seconds after the first item of a batch was
+    queued, whichever comes first. A failed batch is retried `max_retries` times
+    with a growing delay, then dropped and logged. When more than `max_pending`
+    items are waiting, or after close(), offer() refuses new items and submit()
+    writes them on the caller's thread instead, so a slow database slows
+    requests down rather than growing memory or losing rows.
+
+    Items queued when the process dies without close() are lost; call close() on
+    graceful shutdown to flush them.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Any]], None],
+        max_batch: int = 500,
+        flush_interval: float = 0.2,
+        max_pending: int = 10000,
+        max_retries: int = 3,
+        name: str = "write-behind",
+    ):
+        self._write = write
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.name = name
+
+        self._pending = deque()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+        # "written" counts background writes only
+        self._stats = {"written": 0, "batches": 0, "inline_writes": 0, "failed_batches": 0, "dropped": 0}
+
+    @property
+    def depth(self) -> int:
+        """Items accepted but not yet persisted, including the batch being written."""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def offer(self, items: Sequence[Any]) -> bool:
+        """
+        Queue items to be written in the background if there is room.
+
+        Returns False, queuing nothing, when the queue is full or closed; the
+        caller then writes the items itself (counted as inline writes).
+        """
+        items = list(items)
+        if not items:
+            return True
+
+        with self._cond:
+            if self._closed or len(self._pending) + self._in_flight + len(items) > self.max_pending:
+                self._stats["inline_writes"] += len(items)
+                return False
+            self._pending.extend(items)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return True
+
+    def submit(self, items: Sequence[Any]) -> None:
+        """Queue items to be written in the background, or write them on the caller's thread when the queue is full or closed."""
+        items = list(items)
+        if self.offer(items):
+            return
+        self._write(items)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                # Give the batch until flush_interval after its first item to fill up
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.max_batch and not (self._closed or self._flush_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._pending:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                self._in_flight = len(batch)
+
+            written = self._write_batch(batch)
+
+            with self._cond:
+                self._in_flight = 0
+                self._stats["batches"] += 1
+                if written:
+                    self._stats["written"] += len(batch)
+                else:
+                    self._stats["dropped"] += len(batch)
+                if not self._pending:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+    def _write_batch(self, batch: List[Any]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+                return True
+            except Exception as e:
+                with self._cond:
+                    self._stats["failed_batches"] += 1
+                if attempt == self.max_retries:
+                    logger.error(f"{self.name}: dropping {len(batch)} items after {attempt + 1} failed writes: {str(e)}")
+                    return False
+                logger.warning(f"{self.name}: write of {len(batch)} items failed, retrying: {str(e)}")
+                time.sleep(self.flush_interval * 2 ** attempt)
+        return False
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Write everything queued so far now; returns False if it did not finish within `timeout` seconds."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = end - time.monotonic()
+                if remaining <= 0 or self._thread is None:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush the queue and stop the background thread; later submits are written inline."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        remaining = self.depth
+        if remaining:
+            logger.error(f"{self.name}: {remaining} items were not written before shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["depth"] = len(self._pending) + self._in_flight
+        stats["max_pending"] = self.max_pending
+        return stats
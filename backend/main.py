@@ -1,4 +1,5 @@
 
+import asyncio
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,11 +14,21 @@ from app.config import (
     CORS_ALLOW_CREDENTIALS,
     CORS_ALLOW_METHODS,
     CORS_ALLOW_HEADERS,
-    MEDIA_DIR
+    CORS_EXPOSE_HEADERS,
+    MEDIA_DIR,
+    ADMISSION_ENABLED,
+    METRICS_ENABLED,
+    PROFILING_ENABLED,
+    PROFILING_SECRET
 )
-from ml_model import load_model_into_memory
+from ml_model import load_model_into_memory, shutdown_batcher, shutdown_preprocess_pool, close_model_registry
 from app.routes import router
-from app.database import initialize_database
+from app.database import init_db_pool, close_db_pool, close_scan_writer, initialize_database
+from app.inference_client import close_inference_client
+from app.cache import close_prediction_cache
+from app.circuit import close_circuit_breaker
+from app.profiling import close_profiler
+from inference.metrics import mark_process_dead
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -26,6 +37,11 @@ app = FastAPI(
     version=PROJECT_VERSION
 )
 
+# Bound the predictions running at once; added before CORS so that it runs inside it and browsers can read the 429/503s
+if ADMISSION_ENABLED:
+    from app.admission import AdmissionMiddleware
+    app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -33,13 +49,42 @@ app.add_middleware(
     allow_credentials=CORS_ALLOW_CREDENTIALS,
     allow_methods=CORS_ALLOW_METHODS,
     allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=CORS_EXPOSE_HEADERS,
 )
 
 # Check TensorFlow Serving status and initialize database when application starts
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     load_model_into_memory()
-    initialize_database()
+    await init_db_pool()
+    await initialize_database()
+
+# Flush any queued predictions and scans and close pooled connections before the worker exits
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_batcher()
+    shutdown_preprocess_pool()
+    close_model_registry()
+    close_circuit_breaker()
+    await close_inference_client()
+    await close_prediction_cache()
+    # Write the queued scans while the pool is still open; the writer runs them on this loop, so wait off it
+    await asyncio.to_thread(close_scan_writer)
+    await close_db_pool()
+    close_profiler()
+    # Live gauges of this worker no longer count towards the other workers' scrapes
+    mark_process_dead()
+
+# Per-stage latency histograms and counters on /metrics, added last so that it wraps the other middleware
+if METRICS_ENABLED:
+    from app.metrics import MetricsMiddleware, router as metrics_router
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+# Sampling profiler of selected requests, outside the metrics middleware so the response stage is in its breakdown
+if PROFILING_ENABLED or PROFILING_SECRET:
+    from app.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
 
 # Mount static files directory for serving media
 app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
@@ -1,30 +1,55 @@
 
 import os
 import numpy as np
-import time
-import json
-import requests
-from PIL import Image
+import asyncio
+import itertools
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 
 from app.config import (
-    TF_SERVING_URL, 
     TF_SERVING_HOST, 
     TF_SERVING_PORT, 
     TF_SERVING_MODEL_NAME,
-    DISEASE_CLASSES,
+    TF_SERVING_MODEL_VERSION,
+    TF_SERVING_URL,
+    PREPROCESS_RESAMPLE,
+    PREPROCESS_JPEG_DRAFT,
+    PREPROCESS_POOL_MODE,
+    PREPROCESS_POOL_WORKERS,
+    PREPROCESS_POOL_MAX_PENDING,
+    PREPROCESS_RETRY_AFTER,
+    BATCHING_ENABLED,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCH_NUM_WORKERS,
+    BATCH_PREDICT_CHUNK_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_MODEL_DIR,
+    INFERENCE_MODEL_PATH,
+    INFERENCE_PRECISION,
+    MODEL_RELOAD_INTERVAL,
+    MODEL_MAX_LOADED_VERSIONS,
 )
+from app.batching import PredictionBatcher
+from app.circuit import check_tf_serving, get_circuit_breaker
+from app.inference_client import get_inference_client
+from app.transport import create_transport, transport_input_kind
+from inference.backends import default_model_path
+from inference.circuit import CircuitOpenError
+from inference.metadata import class_info
+from inference.metrics import STAGE_INFERENCE, record_error, record_prediction, stage
+from inference.preprocessing import ImagePreprocessor
+from inference.registry import LoadedModel, ModelNotFoundError, ModelRegistry, find_model_versions, find_tf_serving_versions
+from inference.transport import INPUT_FLOAT, INPUT_PNG, TFServingError, encode_png
+from inference.workers import OUTPUT_FLOAT, OUTPUT_UINT8, PoolSaturatedError, PreprocessPool
 
 logger = logging.getLogger(__name__)
 
-# Disease descriptions moved to config.py
-from app.data.descriptions import DISEASE_DESCRIPTIONS, DISEASE_TREATMENTS
-
 def check_tf_serving_status() -> bool:
     """Check if TensorFlow Serving is available."""
     try:
-        response = requests.get(f"http://{TF_SERVING_HOST}:{TF_SERVING_PORT}/v1/models/{TF_SERVING_MODEL_NAME}")
+        response = get_inference_client().get(f"http://{TF_SERVING_HOST}:{TF_SERVING_PORT}/v1/models/{TF_SERVING_MODEL_NAME}")
         if response.status_code == 200:
             logger.info("TensorFlow Serving is available")
             return True
@@ -36,88 +61,444 @@ def check_tf_serving_status() -> bool:
         return False
 
 def load_model_into_memory():
-    """Check if TensorFlow Serving is available."""
+    """Load the newest in-process model version, or check if TensorFlow Serving is available."""
+    if INFERENCE_BACKEND != "tf_serving":
+        registry = get_model_registry()
+        if registry.current_version is not None:
+            logger.info(f"{INFERENCE_BACKEND} model version {registry.current_version} loaded, predictions run in process")
+        return
+    
+    # Start probing TensorFlow Serving in the background, so the breaker knows its health before the first prediction
+    get_circuit_breaker()
     if check_tf_serving_status():
-        logger.info("TensorFlow Serving is ready to handle predictions")
+        logger.info(f"TensorFlow Serving is ready to handle predictions with model version {get_model_registry().current_version}")
     else:
         logger.warning("TensorFlow Serving is not available. Please start TensorFlow Serving with the appropriate model.")
         logger.warning("Example command: tensorflow_model_server --rest_api_port=8501 --model_name=leaf_disease_model --model_base_path=/path/to/models/leaf_disease_model")
 
-def preprocess_image(image_path):
-    """Loads and preprocesses an image for model prediction."""
+# Shared decode/resize/normalize engine
+_preprocessor = ImagePreprocessor(resample=PREPROCESS_RESAMPLE, jpeg_draft=PREPROCESS_JPEG_DRAFT)
+
+def load_image(image):
+    """Loads an image as a uint8 RGB array at the model's input size, without normalization."""
+    try:
+        return _preprocessor.to_uint8(image)
+    except Exception as e:
+        logger.error(f"Error loading image: {str(e)}")
+        raise
+
+def preprocess_image(image):
+    """Loads and preprocesses an image (path, bytes or file-like) into a float32 array for model prediction."""
     try:
-        img = Image.open(image_path).convert('RGB')  # Ensure 3-channel RGB
-        img = img.resize((224, 224))  # Resize to model's input size
-        img_array = np.array(img) / 255.0  # Normalize pixel values (0-1)
-        return img_array
+        return _preprocessor.preprocess(image)
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise
 
-def predict_leaf_disease(image_path):
-    """Runs inference using TensorFlow Serving and returns the predicted class and metadata."""
+def _find_model_versions() -> Dict[str, str]:
+    """Available model versions: version name -> model file (in process) or version name (TF Serving)."""
+    if INFERENCE_BACKEND != "tf_serving":
+        if INFERENCE_MODEL_PATH:
+            return {"0": INFERENCE_MODEL_PATH}
+        filename = os.path.basename(default_model_path(INFERENCE_BACKEND, INFERENCE_MODEL_DIR, INFERENCE_PRECISION))
+        return find_model_versions(INFERENCE_MODEL_DIR, filename)
+    
+    if TF_SERVING_MODEL_VERSION != "latest":
+        return {TF_SERVING_MODEL_VERSION: TF_SERVING_MODEL_VERSION}
     try:
-        # Preprocess the image
-        img_array = preprocess_image(image_path)
-        
-        # Create the request payload
-        payload = {
-            "signature_name": "serving_default",
-            "instances": [img_array.tolist()]
-        }
-        
-        # Measure inference time
-        start_time = time.time()
-        
-        # Make request to TensorFlow Serving
-        response = requests.post(TF_SERVING_URL, json=payload)
-        
-        if response.status_code != 200:
-            logger.error(f"Error from TensorFlow Serving: {response.text}")
-            return {
-                "error": f"TensorFlow Serving returned status code {response.status_code}",
-                "disease": "Error",
-                "confidence": 0.0,
-                "description": "An error occurred during prediction",
-                "treatment": ""
-            }
-        
-        end_time = time.time()
-        
-        # Parse the response
-        predictions = response.json()["predictions"][0]
-        
-        # Get the predicted class
-        predicted_class_index = np.argmax(predictions)
-        confidence_score = float(np.max(predictions))  # Convert to Python float for JSON serialization
-        
-        # Get class name, description, and treatment
-        if predicted_class_index < len(DISEASE_CLASSES):
-            disease_name = DISEASE_CLASSES[predicted_class_index]
-            description = DISEASE_DESCRIPTIONS.get(disease_name, "No description available")
-            treatment = DISEASE_TREATMENTS.get(disease_name, "No treatment information available")
-        else:
-            disease_name = f"Unknown (Class {predicted_class_index})"
-            description = "No description available for this class"
-            treatment = "No treatment information available"
-        
-        logger.info(f"Prediction: {disease_name}, Confidence: {confidence_score:.4f}")
-        logger.info(f"Inference Time: {end_time - start_time:.6f} seconds")
+        return {version: version for version in find_tf_serving_versions(TF_SERVING_URL, get_inference_client().get)}
+    except Exception as e:
+        logger.error(f"Could not list the model versions of TensorFlow Serving: {str(e)}")
+        return {}
+
+def _load_model_version(version: str, location: str):
+    """Create the transport for one model version; in-process models are loaded and warmed up here."""
+    if INFERENCE_BACKEND != "tf_serving":
+        transport = create_transport(model_path=location)
+        # One dummy prediction allocates buffers before the version is swapped in
+        transport.predict([np.zeros(_preprocessor.shape, dtype=np.float32)])
+        return transport
+    return create_transport(version=version)
+
+# Loaded model versions, each with the transport that sends tensors to TensorFlow Serving
+# (see TF_SERVING_TRANSPORT) or runs the model in process (see INFERENCE_BACKEND)
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Return the model registry, loading the newest model version and starting to watch for new ones on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry(
+                    _find_model_versions,
+                    _load_model_version,
+                    poll_interval=MODEL_RELOAD_INTERVAL,
+                    max_loaded=MODEL_MAX_LOADED_VERSIONS,
+                    name=TF_SERVING_MODEL_NAME
+                )
+                try:
+                    registry.refresh()
+                except Exception as e:
+                    logger.error(f"Error loading {INFERENCE_BACKEND} model: {str(e)}")
+                registry.start_watching()
+                _registry = registry
+    return _registry
+
+def close_model_registry():
+    """Stop watching for new model versions and release their transports, unloading in-process models."""
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.close()
+            _registry = None
+
+def current_model_version(model_version: Optional[str] = None) -> Optional[str]:
+    """The version a prediction would use: `model_version` if given, else the one being served (None if there is none yet)."""
+    return model_version or get_model_registry().current_version
+
+async def _acquire_model_async(model_version: Optional[str]) -> LoadedModel:
+    registry = get_model_registry()
+    if registry.is_loaded(model_version):
+        return registry.acquire(model_version)
+    # Loading a version from disk (or asking TF Serving for its versions) blocks; keep it off the event loop
+    return await asyncio.to_thread(registry.acquire, model_version)
+
+async def check_model_version_async(model_version: Optional[str]) -> None:
+    """
+    Make sure a requested model version exists (loading it if needed) before a response starts streaming.
+    
+    Raises:
+        ModelNotFoundError: If `model_version` does not exist
+    """
+    if model_version is not None:
+        get_model_registry().release(await _acquire_model_async(model_version))
+
+# Bounded pool that runs decoding/resizing off the request thread (see PREPROCESS_POOL_MODE)
+_preprocess_pool: Optional[PreprocessPool] = None
+_preprocess_pool_lock = threading.Lock()
+
+def get_preprocess_pool() -> PreprocessPool:
+    """Return the process-wide preprocessing pool, creating it on first use."""
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        with _preprocess_pool_lock:
+            if _preprocess_pool is None:
+                _preprocess_pool = PreprocessPool(
+                    mode=PREPROCESS_POOL_MODE,
+                    max_workers=PREPROCESS_POOL_WORKERS,
+                    max_pending=PREPROCESS_POOL_MAX_PENDING,
+                    retry_after=PREPROCESS_RETRY_AFTER,
+                    preprocessor=_preprocessor
+                )
+    return _preprocess_pool
+
+def shutdown_preprocess_pool():
+    """Stop the preprocessing workers and release their shared memory."""
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is not None:
+            _preprocess_pool.shutdown()
+            _preprocess_pool = None
+
+# What the configured transport expects, the same for every model version
+_input_kind = transport_input_kind()
+
+def _pool_output_kind() -> str:
+    # The PNG transport encodes the resized uint8 pixels
+    return OUTPUT_FLOAT if _input_kind == INPUT_FLOAT else OUTPUT_UINT8
+
+def prepare_instance(image):
+    """
+    Turn an image (path, bytes or file-like) into the kind of instance the configured transport sends.
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool has no room for another image
+    """
+    pixels = get_preprocess_pool().run(image, _pool_output_kind())
+    if _input_kind == INPUT_PNG:
+        return encode_png(pixels)
+    return pixels
+
+async def prepare_instance_async(image):
+    """Async variant of prepare_instance; awaits the preprocessing pool without blocking the event loop."""
+    pixels = await asyncio.wrap_future(get_preprocess_pool().submit(image, _pool_output_kind()))
+    if _input_kind == INPUT_PNG:
+        return await asyncio.to_thread(encode_png, pixels)
+    return pixels
+
+def request_predictions(items: List[Tuple[LoadedModel, Any]]) -> List[List[float]]:
+    """
+    Predict a batch of (model version, prepared instance) pairs and return one prediction row per instance.
+    
+    The batcher may mix requests for different versions (e.g. across a reload);
+    each run of consecutive instances for the same version is sent in one call.
+    """
+    rows = []
+    for model, group in itertools.groupby(items, key=lambda item: item[0]):
+        rows.extend(model.model.predict([instance for _, instance in group]))
+    return rows
+
+# Shared dispatcher that merges concurrent predict calls into batched TF Serving requests
+_batcher: Optional[PredictionBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> PredictionBatcher:
+    """Return the process-wide prediction batcher, creating it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = PredictionBatcher(
+                    request_predictions,
+                    max_batch_size=BATCH_MAX_SIZE,
+                    max_wait_ms=BATCH_MAX_WAIT_MS,
+                    num_workers=BATCH_NUM_WORKERS
+                )
+    return _batcher
+
+def shutdown_batcher():
+    """Flush pending predictions and stop the batcher's worker threads."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is not None:
+            _batcher.shutdown()
+            _batcher = None
+
+def build_prediction_result(predictions, inference_time: float, model_version: Optional[str] = None) -> dict:
+    """Map a row of class probabilities to the predicted class and its metadata."""
+    # Get the predicted class
+    predicted_class_index = np.argmax(predictions)
+    confidence_score = float(np.max(predictions))  # Convert to Python float for JSON serialization
+    
+    # Get class name, description, and treatment
+    disease_name, description, treatment = class_info(int(predicted_class_index))
+    
+    logger.info(f"Prediction: {disease_name}, Confidence: {confidence_score:.4f}")
+    logger.info(f"Inference Time: {inference_time:.6f} seconds")
+    record_prediction(disease_name)
+    
+    # Return a dictionary with the prediction results
+    return {
+        "disease": disease_name,
+        "confidence": confidence_score,
+        "description": description,
+        "treatment": treatment,
+        "inference_time": inference_time,
+        "model_version": model_version
+    }
+
+def prediction_error(message: str, error: Optional[Exception] = None) -> dict:
+    """Return the result dictionary used to report a failed prediction, counted by the type of `error`."""
+    record_error(error if error is not None else "PredictionError")
+    return {
+        "error": message,
+        "disease": "Error",
+        "confidence": 0.0,
+        "description": "An error occurred during prediction",
+        "treatment": ""
+    }
+
+def predict_leaf_disease(image, model_version: Optional[str] = None):
+    """
+    Runs inference using TensorFlow Serving and returns the predicted class and metadata.
+    
+    Args:
+        image: Image file path, raw image bytes or a binary file-like object
+        model_version: Version of the model to use; the newest loaded version by default
+    
+    Raises:
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable
+    """
+    try:
+        check_tf_serving()
+        # The version is held until the prediction is done, so a reload cannot close it meanwhile
+        with get_model_registry().use(model_version) as model:
+            # Preprocess the image into what the configured transport sends
+            instance = prepare_instance(image)
+            
+            # Measure inference time
+            with stage(STAGE_INFERENCE) as timer:
+                # Make request to TensorFlow Serving, batched together with concurrent requests if enabled
+                if BATCHING_ENABLED:
+                    predictions = get_batcher().predict((model, instance))
+                else:
+                    predictions = model.model.predict([instance])[0]
+            
+            return build_prediction_result(predictions, timer.seconds, model.version)
+    except (PoolSaturatedError, CircuitOpenError, ModelNotFoundError) as e:
+        # Let the caller answer 503 or 404 instead of reporting a failed prediction
+        record_error(e)
+        raise
+    except TFServingError as e:
+        return prediction_error(str(e), e)
+    except Exception as e:
+        logger.error(f"Error making prediction: {str(e)}")
+        return prediction_error(str(e), e)
+
+async def predict_leaf_disease_async(image, model_version: Optional[str] = None):
+    """Async variant of predict_leaf_disease that never blocks the event loop."""
+    try:
+        check_tf_serving()
+        model = await _acquire_model_async(model_version)
+        try:
+            # Decoding and resizing are CPU-bound, they run in the preprocessing pool
+            instance = await prepare_instance_async(image)
+            
+            with stage(STAGE_INFERENCE) as timer:
+                if BATCHING_ENABLED:
+                    # The batcher's worker threads send the request; just await the result
+                    predictions = await asyncio.wrap_future(get_batcher().submit((model, instance)))
+                else:
+                    predictions = (await model.model.apredict([instance]))[0]
+        finally:
+            get_model_registry().release(model)
         
-        # Return a dictionary with the prediction results
-        return {
-            "disease": disease_name,
-            "confidence": confidence_score,
-            "description": description,
-            "treatment": treatment,
-            "inference_time": end_time - start_time
-        }
+        return build_prediction_result(predictions, timer.seconds, model.version)
+    except (PoolSaturatedError, CircuitOpenError, ModelNotFoundError) as e:
+        # Let the caller answer 503 or 404 instead of reporting a failed prediction
+        record_error(e)
+        raise
+    except TFServingError as e:
+        return prediction_error(str(e), e)
     except Exception as e:
         logger.error(f"Error making prediction: {str(e)}")
-        return {
-            "error": str(e),
-            "disease": "Error",
-            "confidence": 0.0,
-            "description": "An error occurred during prediction",
-            "treatment": ""
-        }
+        return prediction_error(str(e), e)
+
+async def _predict_prepared_chunk(tasks: List["asyncio.Future"], model: LoadedModel) -> List[dict]:
+    """Wait for a chunk of preprocessing tasks and run the model once on the images that decoded."""
+    prepared = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    results: List[Optional[dict]] = []
+    instances = []
+    for item in prepared:
+        if isinstance(item, PoolSaturatedError):
+            record_error(item)
+            raise item
+        if isinstance(item, Exception):
+            logger.error(f"Error preprocessing image: {str(item)}")
+            results.append(prediction_error(str(item), item))
+        else:
+            results.append(None)
+            instances.append(item)
+    
+    if instances:
+        try:
+            with stage(STAGE_INFERENCE) as timer:
+                rows = await model.model.apredict(instances)
+            predictions = iter(rows)
+            results = [
+                result if result is not None else build_prediction_result(next(predictions), timer.seconds, model.version)
+                for result in results
+            ]
+        except CircuitOpenError as e:
+            # TensorFlow Serving went down mid-way; stop instead of failing every remaining image
+            record_error(e)
+            raise
+        except Exception as e:
+            logger.error(f"Error making batch prediction: {str(e)}")
+            results = [result if result is not None else prediction_error(str(e), e) for result in results]
+    
+    return results
+
+async def _aiter_images(images: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if isinstance(images, AsyncIterable):
+        async for image in images:
+            yield image
+    else:
+        for image in images:
+            yield image
+
+async def iter_leaf_disease_predictions_async(
+    images: Union[Iterable[Any], AsyncIterable[Any]],
+    chunk_size: int = BATCH_PREDICT_CHUNK_SIZE,
+    model_version: Optional[str] = None,
+) -> AsyncIterator[dict]:
+    """
+    Predict many images, yielding one result dictionary per image in input order as soon as its chunk is done.
+    
+    `images` is consumed lazily, and may be an async iterable so that reading the
+    uploads stays off the event loop: only the chunk being predicted and the next one,
+    which is decoded in the preprocessing pool meanwhile, are held in memory, so
+    memory stays flat however many images there are. At most half of the pool's
+    queue is taken so single predictions keep flowing. An image that cannot be
+    decoded, or a chunk TensorFlow Serving fails on, yields a prediction_error
+    entry instead of ending the iteration. Every image is predicted by the same
+    model version (`model_version`, or the one served when the iteration starts).
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool stays full for longer than its retry interval
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable, before or during the iteration
+    """
+    pool = get_preprocess_pool()
+    kind = _pool_output_kind()
+    png = _input_kind == INPUT_PNG
+    semaphore = asyncio.Semaphore(max(1, pool.max_pending // 2))
+    chunk_size = max(1, chunk_size)
+    images = _aiter_images(images)
+    
+    async def prepare(image):
+        async with semaphore:
+            try:
+                future = pool.submit(image, kind)
+            except PoolSaturatedError:
+                # Other requests hold the queue; wait for a slot in a thread rather than on the event loop
+                future = await asyncio.to_thread(pool.submit, image, kind, pool.retry_after)
+            pixels = await asyncio.wrap_future(future)
+            if png:
+                return await asyncio.to_thread(encode_png, pixels)
+            return pixels
+    
+    async def schedule_chunk() -> List["asyncio.Future"]:
+        tasks = []
+        while len(tasks) < chunk_size:
+            try:
+                image = await anext(images)
+            except StopAsyncIteration:
+                break
+            tasks.append(asyncio.ensure_future(prepare(image)))
+        return tasks
+    
+    try:
+        check_tf_serving()
+        model = await _acquire_model_async(model_version)
+    except (CircuitOpenError, ModelNotFoundError) as e:
+        record_error(e)
+        raise
+    except Exception as e:
+        logger.error(f"Error making batch prediction: {str(e)}")
+        async for _ in images:
+            yield prediction_error(str(e), e)
+        return
+    
+    current = await schedule_chunk()
+    upcoming: List["asyncio.Future"] = []
+    try:
+        while current:
+            # Decode the next chunk while this one is being predicted
+            upcoming = await schedule_chunk()
+            for result in await _predict_prepared_chunk(current, model):
+                yield result
+            current, upcoming = upcoming, []
+    finally:
+        for task in current + upcoming:
+            task.cancel()
+        get_model_registry().release(model)
+
+async def predict_leaf_disease_many_async(
+    images: List[Any],
+    chunk_size: int = BATCH_PREDICT_CHUNK_SIZE,
+    model_version: Optional[str] = None,
+) -> List[dict]:
+    """
+    Predict many images at once, returning one result dictionary per image in input order.
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool stays full for longer than its retry interval
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable
+    """
+    return [result async for result in iter_leaf_disease_predictions_async(images, chunk_size, model_version)]
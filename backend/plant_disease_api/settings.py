@@ -44,6 +44,7 @@ MIDDLEWARE = [
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'Link']  # Pagination headers readable by the frontend
 
 ROOT_URLCONF = 'plant_disease_api.urls'
 
@@ -68,6 +69,8 @@ WSGI_APPLICATION = 'plant_disease_api.wsgi.application'
 
 # Database
 # Get database connection details from environment variables
+# DB_ENGINE=django.db.backends.sqlite3 runs on a local SQLite file named by DB_NAME (benchmarks, local runs)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql')
 DB_NAME = os.environ.get('DB_NAME', 'plant_disease_db')
 DB_USER = os.environ.get('DB_USER', 'postgres')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'postgres')
@@ -76,7 +79,7 @@ DB_PORT = os.environ.get('DB_PORT', '5432')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': DB_ENGINE,
         'NAME': DB_NAME,
         'USER': DB_USER,
         'PASSWORD': DB_PASSWORD,
@@ -115,9 +118,145 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Keep uploads up to this size in memory so predictions never go through a temporary file
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(20 * 1024 * 1024)))
+DATA_UPLOAD_MAX_MEMORY_SIZE = FILE_UPLOAD_MAX_MEMORY_SIZE
+
+# Keep a copy of each uploaded image for the scan history. Written in the background after the scan is saved.
+PERSIST_UPLOADS = os.environ.get('PERSIST_UPLOADS', 'true').lower() == 'true'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Inference backend:
+#   'keras'      - the Keras model in process, called directly instead of model.predict() (default)
+#   'onnx'       - an exported ONNX model in process with ONNX Runtime (needs onnxruntime)
+#   'tflite'     - an exported TensorFlow Lite model in process (tflite-runtime or tensorflow)
+#   'tf_serving' - send images to TensorFlow Serving at TF_SERVING_URL, with the transport below
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras').lower()
+INFERENCE_MODEL_DIR = os.environ.get('INFERENCE_MODEL_DIR', os.path.join(BASE_DIR, 'prediction', 'ml_models'))
+INFERENCE_MODEL_PATH = os.environ.get('INFERENCE_MODEL_PATH', '')  # Defaults to leaf_disease_model.<ext> in INFERENCE_MODEL_DIR
+# 'float32', or a quantized variant made by `manage.py quantize_model`: 'float16' or 'int8' (onnx and tflite only)
+INFERENCE_PRECISION = os.environ.get('INFERENCE_PRECISION', 'float32').lower()
+INFERENCE_NUM_THREADS = int(os.environ.get('INFERENCE_NUM_THREADS', str(os.cpu_count() or 1)))  # Threads inside each operator
+INFERENCE_INTER_OP_THREADS = int(os.environ.get('INFERENCE_INTER_OP_THREADS', '1'))  # Operators run at the same time
+TF_SERVING_URL = os.environ.get('TF_SERVING_URL', 'http://localhost:8501/v1/models/leaf_disease_model:predict')
+# 'latest' follows the newest version TensorFlow Serving has available; a number pins every request to that version
+TF_SERVING_MODEL_VERSION = os.environ.get('TF_SERVING_MODEL_VERSION', 'latest')
+# Tensor transport shared with the FastAPI app (see inference/transport.py): 'json' (default), 'uint8' or 'b64'
+# over the REST API (the serving signature must scale, or decode and scale), or 'grpc' to TF_SERVING_GRPC_TARGET
+TF_SERVING_TRANSPORT = os.environ.get('TF_SERVING_TRANSPORT', 'json').lower()
+TF_SERVING_GRPC_TARGET = os.environ.get('TF_SERVING_GRPC_TARGET', 'localhost:8500')
+TF_SERVING_MODEL_NAME = os.environ.get('TF_SERVING_MODEL_NAME', 'leaf_disease_model')
+TF_SERVING_SIGNATURE_NAME = os.environ.get('TF_SERVING_SIGNATURE_NAME', 'serving_default')
+TF_SERVING_INPUT_NAME = os.environ.get('TF_SERVING_INPUT_NAME', 'inputs')
+# Pooled keep-alive connections, (connect, read) timeouts and retries of 502/503/504 with exponential backoff
+TF_SERVING_POOL_SIZE = int(os.environ.get('TF_SERVING_POOL_SIZE', '32'))
+TF_SERVING_CONNECT_TIMEOUT = float(os.environ.get('TF_SERVING_CONNECT_TIMEOUT', '2.0'))  # Seconds
+TF_SERVING_READ_TIMEOUT = float(os.environ.get('TF_SERVING_READ_TIMEOUT', '30.0'))  # Seconds
+TF_SERVING_MAX_RETRIES = int(os.environ.get('TF_SERVING_MAX_RETRIES', '2'))
+TF_SERVING_RETRY_BACKOFF = float(os.environ.get('TF_SERVING_RETRY_BACKOFF', '0.2'))  # Seconds, doubled on each retry
+
+# Circuit breaker in front of TensorFlow Serving (see inference/circuit.py): opens when CIRCUIT_BREAKER_FAILURE_RATE
+# of the calls in the last CIRCUIT_BREAKER_WINDOW seconds failed, or CIRCUIT_BREAKER_SLOW_CALL_RATE took longer than
+# CIRCUIT_BREAKER_SLOW_CALL_SECONDS; predictions then get 503 at once for CIRCUIT_BREAKER_OPEN_SECONDS.
+# Each worker process has its own breaker. Only used with the tf_serving backend.
+CIRCUIT_BREAKER_ENABLED = os.environ.get('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+CIRCUIT_BREAKER_WINDOW = float(os.environ.get('CIRCUIT_BREAKER_WINDOW', '30'))  # Seconds
+CIRCUIT_BREAKER_MIN_CALLS = int(os.environ.get('CIRCUIT_BREAKER_MIN_CALLS', '10'))  # Calls in the window before it can open
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.environ.get('CIRCUIT_BREAKER_FAILURE_RATE', '0.5'))
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_SECONDS', '5'))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_BREAKER_SLOW_CALL_RATE', '0.8'))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.environ.get('CIRCUIT_BREAKER_OPEN_SECONDS', '15'))
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.environ.get('CIRCUIT_BREAKER_HALF_OPEN_CALLS', '3'))  # Trial calls that must succeed to close it
+# Background probe of the model status endpoint; a healthy answer ends the open period early, failing ones open it
+TF_SERVING_HEALTH_INTERVAL = float(os.environ.get('TF_SERVING_HEALTH_INTERVAL', '5'))  # Seconds, 0 disables the probe
+TF_SERVING_HEALTH_TIMEOUT = float(os.environ.get('TF_SERVING_HEALTH_TIMEOUT', '2'))  # Seconds
+
+# Model versions: in-process models live in INFERENCE_MODEL_DIR/<version>/, the highest version is served
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '10'))  # Seconds between checks for a new version; 0 disables
+MODEL_MAX_LOADED_VERSIONS = int(os.environ.get('MODEL_MAX_LOADED_VERSIONS', '2'))  # Versions kept in memory, the served one included
+
+# When the model is loaded (management commands other than runserver never load it):
+#   'background' - in a warm-up thread started at boot; requests are served meanwhile and /api/ready reports progress (default)
+#   'lazy'       - on the first prediction or /api/ready call
+#   'eager'      - during startup, before the first request is accepted
+#   'preload'    - weights once in a pre-fork server's master, then each worker warms up after the fork (set by gunicorn.conf.py)
+MODEL_LOADING = os.environ.get('MODEL_LOADING', 'background').lower()
+
+# Image preprocessing
+PREPROCESS_RESAMPLE = os.environ.get('PREPROCESS_RESAMPLE', 'bicubic').lower()  # Pillow filter for the final resize
+PREPROCESS_JPEG_DRAFT = os.environ.get('PREPROCESS_JPEG_DRAFT', 'true').lower() == 'true'  # Reduced-size JPEG decoding
+# Where decoding/resizing runs: 'inline', 'thread' (Pillow releases the GIL) or 'process' (results via shared memory)
+PREPROCESS_POOL_MODE = os.environ.get('PREPROCESS_POOL_MODE', 'thread').lower()
+PREPROCESS_POOL_WORKERS = int(os.environ.get('PREPROCESS_POOL_WORKERS', str(os.cpu_count() or 1)))
+PREPROCESS_POOL_MAX_PENDING = int(os.environ.get('PREPROCESS_POOL_MAX_PENDING', '64'))  # Beyond this, answer 503
+PREPROCESS_RETRY_AFTER = int(os.environ.get('PREPROCESS_RETRY_AFTER', '1'))  # Seconds, sent in Retry-After
+
+# Admission control in front of the prediction endpoints (see inference/admission.py): at most
+# ADMISSION_MAX_IN_FLIGHT predictions run at once in each worker process and ADMISSION_MAX_QUEUE wait for a
+# slot; others get 429, and those that cannot start within ADMISSION_QUEUE_TIMEOUT get 503, both with
+# Retry-After. Waiting requests hold a server thread, so keep the two together below GUNICORN_THREADS
+# (4 by default) to leave a thread for the cheap endpoints.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', '2'))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', '1'))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '5'))  # Seconds
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', '1'))  # Seconds, sent in Retry-After
+# Cheap reads (treatment, plant info, history) skip admission; false puts every API request through it
+ADMISSION_PRIORITY = os.environ.get('ADMISSION_PRIORITY', 'true').lower() == 'true'
+if ADMISSION_ENABLED:
+    # Inside the CORS middleware, so browsers can read the 429/503 answers
+    MIDDLEWARE.insert(MIDDLEWARE.index('corsheaders.middleware.CorsMiddleware') + 1, 'prediction.admission.AdmissionMiddleware')
+
+# Batch prediction (/api/predict/batch)
+BATCH_PREDICT_MAX_IMAGES = int(os.environ.get('BATCH_PREDICT_MAX_IMAGES', '500'))
+BATCH_PREDICT_CHUNK_SIZE = int(os.environ.get('BATCH_PREDICT_CHUNK_SIZE', '16'))  # Images per model call
+BATCH_PREDICT_MAX_IMAGE_BYTES = int(os.environ.get('BATCH_PREDICT_MAX_IMAGE_BYTES', str(20 * 1024 * 1024)))
+STREAM_PREDICT_MAX_IMAGES = int(os.environ.get('STREAM_PREDICT_MAX_IMAGES', '10000'))  # For /api/predict/stream
+
+# Write-behind scan persistence: predictions are answered before their scan row is saved, and rows are
+# inserted in batches from a background thread. Scans queued when the process is killed are lost.
+SCAN_WRITE_BEHIND = os.environ.get('SCAN_WRITE_BEHIND', 'false').lower() == 'true'
+SCAN_WRITE_BATCH_SIZE = int(os.environ.get('SCAN_WRITE_BATCH_SIZE', '500'))  # Rows per INSERT
+SCAN_WRITE_FLUSH_INTERVAL = float(os.environ.get('SCAN_WRITE_FLUSH_INTERVAL', '0.2'))  # Seconds a row may wait for its batch
+SCAN_WRITE_MAX_PENDING = int(os.environ.get('SCAN_WRITE_MAX_PENDING', '10000'))  # Beyond this, rows are inserted inline
+
+# Response cache for /history/{id}: serialized bodies with strong ETags, answered with 304 on If-None-Match
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '4096'))
+# Cache-Control sent by each read route (treatment and plant info bodies are prebuilt). Scans never change after they are saved, so their detail is immutable.
+RESPONSE_CACHE_CONTROL = {
+    'treatment': os.environ.get('TREATMENT_CACHE_CONTROL', 'public, max-age=3600'),
+    'plant-info': os.environ.get('PLANT_INFO_CACHE_CONTROL', 'public, max-age=3600'),
+    'history-detail': os.environ.get('HISTORY_DETAIL_CACHE_CONTROL', 'private, max-age=31536000, immutable'),
+}
+
+# Prometheus metrics on /metrics: per-stage latency histograms, prediction and error counters, in-flight gauges.
+# Each worker process keeps its own metrics.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+if METRICS_ENABLED:
+    # Outermost, so the request duration covers every other middleware
+    MIDDLEWARE.insert(0, 'prediction.metrics.MetricsMiddleware')
+
+# Sampling profiler (see inference/profiling.py): folded stacks and a stage breakdown of selected requests,
+# written to PROFILING_DIR. Requests are picked at PROFILING_SAMPLE_RATE when enabled, and always when
+# they carry an X-Profile-Token signed with PROFILING_SECRET. With neither set, no middleware is installed.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))  # Share of requests profiled
+PROFILING_SLOW_THRESHOLD_MS = float(os.environ.get('PROFILING_SLOW_THRESHOLD_MS', '0'))  # Keep only slower sampled requests
+PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', '5'))  # Between two stack samples
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '100'))  # Older profiles are deleted
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET', '')
+if PROFILING_ENABLED or PROFILING_SECRET:
+    # Outside the metrics middleware, so the response stage is part of the breakdown
+    MIDDLEWARE.insert(0, 'prediction.profiling.ProfilingMiddleware')
+
+# History pagination
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', '50'))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', '200'))
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -9,6 +9,10 @@ urlpatterns = [
     path('api/', include('prediction.urls')),
 ]
 
+if settings.METRICS_ENABLED:
+    from prediction.metrics import metrics_view
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
+
 # Add media URL patterns for development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from inference.admission import AdmissionController, AdmissionRejectedError
+from inference.metrics import QUEUE_DEPTH, record_error, set_gauge_function
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    settings.ADMISSION_MAX_IN_FLIGHT,
+                    max_queue=settings.ADMISSION_MAX_QUEUE,
+                    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+                    retry_after=settings.ADMISSION_RETRY_AFTER
+                )
+    return _controller
+
+set_gauge_function(QUEUE_DEPTH, lambda: get_admission_controller().waiting, 'admission')
+
+class _ReleasingContent:
+    """Streamed predictions run while the body is sent, after the view has returned: hold the slot until the response is closed."""
+    
+    def __init__(self, content, release):
+        self.content = iter(content)
+        self.close = release
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return next(self.content)
+
+class AdmissionMiddleware:
+    """Admits prediction requests (every API request without ADMISSION_PRIORITY) through the admission controller."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/api/predict' if settings.ADMISSION_PRIORITY else '/api/'
+        # Probes must answer even when the queue is full
+        self.exempt = ('/api/ready', '/api/health')
+    
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix) or request.path in self.exempt:
+            return self.get_response(request)
+        
+        controller = get_admission_controller()
+        try:
+            controller.acquire()
+        except AdmissionRejectedError as e:
+            record_error(e)
+            return JsonResponse(
+                {'error': str(e)},
+                status=e.status_code,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+        
+        start = time.perf_counter()
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                controller.release(time.perf_counter() - start)
+        
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = _ReleasingContent(response.streaming_content, release)
+        else:
+            release()
+        return response
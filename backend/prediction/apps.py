@@ -1,5 +1,26 @@
+import os
+import sys
 
 from django.apps import AppConfig
+from django.conf import settings
+
+# Management commands that serve requests and so need the model
+SERVER_COMMANDS = {'runserver'}
+
+def _is_management_command():
+    """Whether this process runs a management command (migrate, shell, ...) rather than serving requests."""
+    program = sys.argv[0] if sys.argv else ''
+    is_manage = (
+        os.path.basename(program) in ('manage.py', 'django-admin')
+        or program.endswith(os.path.join('django', '__main__.py'))
+    )
+    if not is_manage:
+        return False
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in SERVER_COMMANDS:
+        return True
+    # runserver's autoreloader parent only watches files; the child it spawns serves
+    return '--noreload' not in sys.argv and os.environ.get('RUN_MAIN') != 'true'
 
 
 class PredictionConfig(AppConfig):
@@ -7,5 +28,15 @@ class PredictionConfig(AppConfig):
     name = 'prediction'
     
     def ready(self):
+        # The model is loaded by the first prediction at the latest; see MODEL_LOADING
+        if settings.MODEL_LOADING == 'lazy' or _is_management_command():
+            return
+        
         from . import ml_model
-        ml_model.load_model_into_memory()
+        if settings.MODEL_LOADING == 'preload':
+            # Pre-fork server master (see gunicorn.conf.py): no threads here, workers warm up after the fork
+            ml_model.preload_model_weights()
+        elif settings.MODEL_LOADING == 'eager':
+            ml_model.load_model_into_memory()
+        else:
+            ml_model.start_warmup()
@@ -0,0 +1,57 @@
+import threading
+
+from django.conf import settings
+
+from inference.backends import TFServingRestBackend
+from inference.circuit import STATE_VALUES, CircuitBreaker, HealthProbe, tf_serving_probe
+from inference.metrics import CIRCUIT_STATE, set_gauge_function
+from inference.registry import tf_serving_status_url
+
+from .inference_client import get_inference_client
+
+_breaker = None
+_probe = None
+_breaker_lock = threading.Lock()
+
+def _probe_get(url):
+    # Over the pooled session used for predictions, with the probe's own timeout
+    return get_inference_client().session.get(url, timeout=settings.TF_SERVING_HEALTH_TIMEOUT)
+
+def get_circuit_breaker():
+    """The breaker in front of TensorFlow Serving, with its health probe started; None when disabled or serving in process."""
+    global _breaker, _probe
+    if not settings.CIRCUIT_BREAKER_ENABLED or settings.INFERENCE_BACKEND != TFServingRestBackend.name:
+        return None
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                breaker = CircuitBreaker(
+                    'TensorFlow Serving',
+                    window=settings.CIRCUIT_BREAKER_WINDOW,
+                    min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+                    failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+                    slow_call_seconds=settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                    slow_call_rate_threshold=settings.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                    open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+                    half_open_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS
+                )
+                set_gauge_function(CIRCUIT_STATE, lambda: STATE_VALUES[breaker.state], 'tf_serving')
+                # Started in the process that serves requests: threads do not survive a pre-fork server's fork
+                _probe = HealthProbe(
+                    breaker,
+                    tf_serving_probe(tf_serving_status_url(settings.TF_SERVING_URL), _probe_get),
+                    interval=settings.TF_SERVING_HEALTH_INTERVAL
+                )
+                _probe.start()
+                _breaker = breaker
+    return _breaker
+
+def check_tf_serving():
+    """Raise CircuitOpenError while the breaker is open, before any work is spent on a request."""
+    breaker = get_circuit_breaker()
+    if breaker is not None:
+        breaker.check()
+
+def circuit_status():
+    breaker = get_circuit_breaker()
+    return breaker.snapshot() if breaker is not None else None
@@ -0,0 +1,24 @@
+import threading
+
+from django.conf import settings
+
+from inference.client import InferenceClient
+
+# Process-wide client shared by the tf_serving backend, the version lookups and the health probe
+_client = None
+_client_lock = threading.Lock()
+
+def get_inference_client():
+    """Return the shared TensorFlow Serving client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    pool_size=settings.TF_SERVING_POOL_SIZE,
+                    connect_timeout=settings.TF_SERVING_CONNECT_TIMEOUT,
+                    read_timeout=settings.TF_SERVING_READ_TIMEOUT,
+                    max_retries=settings.TF_SERVING_MAX_RETRIES,
+                    retry_backoff=settings.TF_SERVING_RETRY_BACKOFF
+                )
+    return _client
@@ -0,0 +1,45 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.backends import default_model_path
+
+FORMATS = ('onnx', 'tflite')
+
+class Command(BaseCommand):
+    help = 'Export the Keras leaf disease model to ONNX and/or TensorFlow Lite for the in-process inference backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS + ('all',), default='all')
+        parser.add_argument('--model', help='Keras model to export (default: leaf_disease_model.keras in INFERENCE_MODEL_DIR)')
+        parser.add_argument('--output-dir', help='Where to write the exported models (default: INFERENCE_MODEL_DIR)')
+        parser.add_argument('--opset', type=int, default=13, help='ONNX opset version')
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        model_path = options['model'] or default_model_path('keras', settings.INFERENCE_MODEL_DIR)
+        output_dir = options['output_dir'] or settings.INFERENCE_MODEL_DIR
+        if not os.path.exists(model_path):
+            raise CommandError(f"Model file not found at {model_path}")
+        os.makedirs(output_dir, exist_ok=True)
+
+        model = tf.keras.models.load_model(model_path, compile=False)
+        # Leave the batch dimension open so the backends can run any batch size
+        input_signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input')]
+
+        formats = FORMATS if options['format'] == 'all' else (options['format'],)
+        for export_format in formats:
+            output_path = default_model_path(export_format, output_dir)
+            if export_format == 'onnx':
+                import tf2onnx
+
+                tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=options['opset'], output_path=output_path)
+            else:
+                concrete_function = tf.function(lambda x: model(x, training=False)).get_concrete_function(*input_signature)
+                converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_function], model)
+                with open(output_path, 'wb') as f:
+                    f.write(converter.convert())
+
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)"))
@@ -0,0 +1,106 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.backends import create_backend, default_model_path
+from inference.metadata import DISEASE_CLASSES
+from inference.preprocessing import ImagePreprocessor
+from inference.quantization import export_onnx, export_tflite, find_samples, measure_drift
+
+class Command(BaseCommand):
+    help = (
+        'Export post-training quantized (int8 and/or float16) variants of the leaf disease model, '
+        'calibrated on a folder of images, and report the accuracy drift per disease class against the float model.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calibration-dir', required=True,
+                            help='Images used to calibrate int8 ranges; sub-folders named after a disease class label their images')
+        parser.add_argument('--eval-dir', help='Images for the drift report (default: the calibration images)')
+        parser.add_argument('--format', choices=('tflite', 'onnx'), default='tflite')
+        parser.add_argument('--precision', choices=('int8', 'float16', 'all'), default='int8')
+        parser.add_argument('--calibration-samples', type=int, default=200, help='Maximum images used for calibration')
+        parser.add_argument('--eval-samples', type=int, default=1000, help='Maximum images used for the drift report')
+        parser.add_argument('--model-dir', help='Directory with the float models, also where the variants are written (default: INFERENCE_MODEL_DIR)')
+        parser.add_argument('--report', help='Also write the drift report to this JSON file')
+
+    def handle(self, *args, **options):
+        model_dir = options['model_dir'] or settings.INFERENCE_MODEL_DIR
+        export_format = options['format']
+        keras_path = default_model_path('keras', model_dir)
+        float_path = default_model_path(export_format, model_dir)
+
+        if export_format == 'tflite' and not os.path.exists(keras_path):
+            raise CommandError(f"Keras model not found at {keras_path}")
+        if export_format == 'onnx' and not os.path.exists(float_path):
+            raise CommandError(f"Float ONNX model not found at {float_path}; run `manage.py export_model --format onnx` first")
+
+        preprocessor = ImagePreprocessor(resample=settings.PREPROCESS_RESAMPLE, jpeg_draft=settings.PREPROCESS_JPEG_DRAFT)
+        calibration = find_samples(options['calibration_dir'], DISEASE_CLASSES, options['calibration_samples'])
+        if not calibration:
+            raise CommandError(f"No images found in {options['calibration_dir']}")
+        evaluation = (
+            find_samples(options['eval_dir'], DISEASE_CLASSES, options['eval_samples'])
+            if options['eval_dir'] else calibration[:options['eval_samples']]
+        )
+        self.stdout.write(f"Calibrating on {len(calibration)} images, evaluating on {len(evaluation)}")
+
+        # The drift is measured against the model the quantized one replaces
+        reference_name, reference_path = ('keras', keras_path) if os.path.exists(keras_path) else (export_format, float_path)
+        reference = create_backend(
+            reference_name, model_path=reference_path,
+            num_threads=settings.INFERENCE_NUM_THREADS, inter_op_threads=settings.INFERENCE_INTER_OP_THREADS
+        )
+
+        keras_model = None
+        reports = {}
+        precisions = ('int8', 'float16') if options['precision'] == 'all' else (options['precision'],)
+        for precision in precisions:
+            output_path = default_model_path(export_format, model_dir, precision)
+            if export_format == 'tflite':
+                if keras_model is None:
+                    import tensorflow as tf
+
+                    keras_model = tf.keras.models.load_model(keras_path, compile=False)
+                export_tflite(keras_model, output_path, precision, calibration, preprocessor)
+            else:
+                export_onnx(float_path, output_path, precision, calibration, preprocessor)
+
+            float_size = os.path.getsize(reference_path)
+            size = os.path.getsize(output_path)
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {output_path} ({size / 1e6:.1f} MB, {size / float_size:.0%} of the float model)"
+            ))
+
+            candidate = create_backend(
+                export_format, model_path=output_path,
+                num_threads=settings.INFERENCE_NUM_THREADS, inter_op_threads=settings.INFERENCE_INTER_OP_THREADS
+            )
+            report = measure_drift(reference, candidate, evaluation, DISEASE_CLASSES, preprocessor)
+            report.update({'model_path': output_path, 'size_bytes': size, 'float_size_bytes': float_size})
+            reports[precision] = report
+            self.print_report(precision, report)
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(reports, f, indent=2)
+            self.stdout.write(f"Report written to {options['report']}")
+
+    def print_report(self, precision, report):
+        def percent(value):
+            return f"{value:.1%}" if value is not None else '-'
+
+        def delta(value):
+            return f"{value * 100:+.1f} pt" if value is not None else '-'
+
+        self.stdout.write(f"\n{precision} vs float ({report['float_ms_per_image']:.2f} -> {report['quantized_ms_per_image']:.2f} ms/image)")
+        self.stdout.write(f"{'class':<45} {'images':>6} {'agree':>7} {'float acc':>9} {'quant acc':>9} {'delta':>9}")
+        for row in report['per_class'] + [dict(report['overall'], **{'class': 'overall'})]:
+            if not row['images']:
+                continue
+            self.stdout.write(
+                f"{row['class']:<45} {row['images']:>6} {percent(row['agreement']):>7} "
+                f"{percent(row['float_accuracy']):>9} {percent(row['quantized_accuracy']):>9} {delta(row['accuracy_delta']):>9}"
+            )
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.http import HttpResponse
+
+from inference.metrics import CONTENT_TYPE, QUEUE_DEPTH, record_error, render, set_gauge_function, track_request
+
+from .ml_model import get_preprocess_pool
+from .scans import get_scan_writer
+
+# Queue depths are read when /metrics is scraped (and every second in each worker in multiprocess mode)
+set_gauge_function(QUEUE_DEPTH, lambda: get_preprocess_pool().pending, 'preprocess')
+set_gauge_function(QUEUE_DEPTH, lambda: get_scan_writer().depth if settings.SCAN_WRITE_BEHIND else 0, 'scan_writer')
+
+class MetricsMiddleware:
+    """Records the duration, status and in-flight count of every request."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with track_request(request.method) as result:
+            response = self.get_response(request)
+            result['status'] = str(response.status_code)
+            # URL pattern of the view (e.g. /api/history/<str:scan_id>), which keeps the label bounded
+            if request.resolver_match is not None:
+                result['endpoint'] = '/' + request.resolver_match.route
+        return response
+    
+    def process_exception(self, request, exception):
+        # Unhandled view errors; Django turns them into a 500 response afterwards
+        record_error(exception)
+
+def metrics_view(request):
+    """Prometheus text exposition format of this process's metrics, or of every worker's with PROMETHEUS_MULTIPROC_DIR."""
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:49
+
+import prediction.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlantScan',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('image', models.ImageField(upload_to=prediction.models.get_image_path)),
+                ('disease', models.CharField(max_length=255)),
+                ('confidence', models.FloatField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
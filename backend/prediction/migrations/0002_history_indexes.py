@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='plantscan',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='plantscan',
+            index=models.Index(fields=['-timestamp', '-id'], name='plantscan_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantscan',
+            index=models.Index(fields=['disease', '-timestamp', '-id'], name='plantscan_disease_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0003_plantscan_model_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='plantscan',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,155 +1,432 @@
 
+import itertools
 import os
 import numpy as np
+import threading
 import time
-from tensorflow import keras
-from PIL import Image
 import logging
+from django.conf import settings
+
+from inference.backends import OnnxBackend, TFLiteBackend, TFServingRestBackend, create_backend, default_model_path
+from inference.circuit import CircuitOpenError
+from inference.metadata import class_info
+from inference.metrics import STAGE_INFERENCE, record_error, record_prediction, stage
+from inference.preprocessing import ImagePreprocessor
+from inference.registry import (
+    ModelNotFoundError,
+    ModelRegistry,
+    find_model_versions,
+    find_tf_serving_versions,
+    tf_serving_version_url,
+    version_sort_key,
+)
+from inference.workers import PoolSaturatedError, PreprocessPool
+
+from .circuit import check_tf_serving, get_circuit_breaker
+from .inference_client import get_inference_client
 
 logger = logging.getLogger(__name__)
 
 # Global variables
-MODEL = None
-DISEASE_CLASSES = [
-    "Apple___Apple_scab",
-    "Apple___Black_rot",
-    "Apple___Cedar_apple_rust",
-    "Apple___healthy",
-    "Tomato___Early_blight",
-    "Tomato___Late_blight",
-    "Tomato___Leaf_Mold",
-    "Tomato___Septoria_leaf_spot",
-    "Tomato___Spider_mites",
-    "Tomato___Target_Spot",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus",
-    "Tomato___Tomato_mosaic_virus",
-    "Tomato___healthy"
-    # Add more disease classes as per your model
-]
-
-DISEASE_DESCRIPTIONS = {
-    "Apple___Apple_scab": "Apple scab is a fungal disease caused by Venturia inaequalis that affects apple trees.",
-    "Apple___Black_rot": "Black rot is a fungal disease caused by Botryosphaeria obtusa affecting apples.",
-    "Apple___Cedar_apple_rust": "Cedar apple rust is a fungal disease caused by Gymnosporangium juniperi-virginianae.",
-    "Apple___healthy": "This is a healthy apple leaf with no signs of disease.",
-    "Tomato___Early_blight": "Early blight is a fungal disease caused by Alternaria solani affecting tomatoes.",
-    "Tomato___Late_blight": "Late blight is a devastating disease caused by Phytophthora infestans.",
-    "Tomato___Leaf_Mold": "Leaf mold is caused by the fungus Passalora fulva, prevalent in humid conditions.",
-    "Tomato___Septoria_leaf_spot": "Septoria leaf spot is a fungal disease that causes small, circular spots.",
-    "Tomato___Spider_mites": "Spider mites are tiny pests that cause stippling and yellowing of tomato leaves.",
-    "Tomato___Target_Spot": "Target spot is caused by the fungus Corynespora cassiicola.",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "TYLCV is a viral disease transmitted by whiteflies.",
-    "Tomato___Tomato_mosaic_virus": "ToMV is a viral disease causing mottled leaves and stunted growth.",
-    "Tomato___healthy": "This is a healthy tomato leaf with no signs of disease."
-    # Add more descriptions as needed
-}
-
-DISEASE_TREATMENTS = {
-    "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible. Improve air circulation by proper pruning.",
-    "Apple___Black_rot": "Remove and destroy infected plant parts. Apply fungicides during the growing season. Prune to improve air circulation. Control insects that create wounds for infection.",
-    "Apple___Cedar_apple_rust": "Remove nearby cedar or juniper trees if possible. Apply fungicides in spring. Use resistant apple varieties. Keep the orchard clean of debris.",
-    "Apple___healthy": "Continue good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues.",
-    "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops. Use resistant varieties if available.",
-    "Tomato___Late_blight": "Apply fungicides preventatively. Remove infected plants immediately. Avoid overhead irrigation. Ensure good air circulation. Plant resistant varieties.",
-    "Tomato___Leaf_Mold": "Improve air circulation. Reduce humidity. Apply fungicides. Remove infected leaves. Avoid overhead watering. Use resistant varieties.",
-    "Tomato___Septoria_leaf_spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Use mulch to prevent soil splash. Rotate crops. Clean up debris in fall.",
-    "Tomato___Spider_mites": "Spray plants with water to dislodge mites. Apply insecticidal soap or neem oil. Introduce predatory mites. Maintain proper humidity levels.",
-    "Tomato___Target_Spot": "Remove infected leaves. Apply fungicides. Avoid overhead watering. Ensure proper plant spacing for air circulation. Rotate crops.",
-    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Control whitefly populations. Remove and destroy infected plants. Use reflective mulches. Plant resistant varieties. Use physical barriers like row covers.",
-    "Tomato___Tomato_mosaic_virus": "Remove and destroy infected plants. Control aphids. Wash hands and tools after handling infected plants. Plant resistant varieties. Avoid working in wet gardens.",
-    "Tomato___healthy": "Maintain good cultural practices: proper watering, fertilization, and regular monitoring for early detection of issues."
-    # Add more treatments as needed
-}
+REGISTRY = None  # ModelRegistry of the loaded model versions, each an InferenceBackend (see INFERENCE_BACKEND)
+
+def _model_path():
+    """The model file when there is a single, unversioned one."""
+    return settings.INFERENCE_MODEL_PATH or default_model_path(
+        settings.INFERENCE_BACKEND, settings.INFERENCE_MODEL_DIR, settings.INFERENCE_PRECISION
+    )
+
+def _find_model_versions():
+    """
+    Available model versions: version name -> model file, or pinned predict URL for TensorFlow Serving.
+    
+    In-process models are versioned by sub-directory of INFERENCE_MODEL_DIR
+    (ml_models/<version>/leaf_disease_model.<ext>); a model file directly in
+    INFERENCE_MODEL_DIR, or INFERENCE_MODEL_PATH, is version "0".
+    """
+    if settings.INFERENCE_BACKEND == TFServingRestBackend.name:
+        if settings.TF_SERVING_MODEL_VERSION != 'latest':
+            return {settings.TF_SERVING_MODEL_VERSION: tf_serving_version_url(settings.TF_SERVING_URL, settings.TF_SERVING_MODEL_VERSION)}
+        try:
+            return find_tf_serving_versions(settings.TF_SERVING_URL, get_inference_client().get)
+        except Exception as e:
+            logger.error(f"Could not list the model versions of TensorFlow Serving: {str(e)}")
+            return {}
+    
+    if settings.INFERENCE_MODEL_PATH:
+        return {'0': settings.INFERENCE_MODEL_PATH} if os.path.exists(settings.INFERENCE_MODEL_PATH) else {}
+    return find_model_versions(settings.INFERENCE_MODEL_DIR, os.path.basename(_model_path()))
+
+# ONNX weights loaded into shared memory by preload_model_weights() before a pre-fork server forks
+_shared_weights = None
+
+def preload_model_weights():
+    """
+    Load the model weights once in a pre-fork server's master process (MODEL_LOADING='preload').
+    
+    Must not start threads or import TensorFlow/ONNX Runtime, since the process is
+    about to fork. For the onnx backend the weights of the newest version go into
+    shared memory and every worker's session uses them in place. TFLite
+    interpreters memory-map the model file, so workers already share it through
+    the page cache. Keras weights live in TensorFlow variables that cannot be
+    shared, so each worker loads its own copy. The sessions themselves are created
+    in each worker after the fork; versions loaded later are not shared.
+    """
+    global _shared_weights
+    if settings.INFERENCE_BACKEND == OnnxBackend.name:
+        versions = _find_model_versions()
+        if not versions:
+            logger.warning(f"Model file not found at {_model_path()}, nothing to preload")
+            return
+        from inference.sharing import SharedOnnxModel
+        _shared_weights = SharedOnnxModel.load(versions[max(versions, key=version_sort_key)])
+    elif settings.INFERENCE_BACKEND == TFLiteBackend.name:
+        logger.info("TFLite models are memory-mapped, workers share the model file through the page cache")
+    elif settings.INFERENCE_BACKEND != TFServingRestBackend.name:
+        logger.warning(f"The {settings.INFERENCE_BACKEND} backend cannot share weights between workers; each worker loads its own copy")
+
+def _load_model_version(version, location):
+    """Create the inference backend for one model version and warm it up."""
+    if settings.INFERENCE_BACKEND == TFServingRestBackend.name:
+        logger.info(f"Predictions will be sent to TensorFlow Serving at {location}")
+        return create_backend(
+            settings.INFERENCE_BACKEND,
+            url=location,
+            transport=settings.TF_SERVING_TRANSPORT,
+            client=get_inference_client(),
+            grpc_target=settings.TF_SERVING_GRPC_TARGET,
+            model_name=settings.TF_SERVING_MODEL_NAME,
+            signature_name=settings.TF_SERVING_SIGNATURE_NAME,
+            input_name=settings.TF_SERVING_INPUT_NAME,
+            version=version,
+            timeout=settings.TF_SERVING_READ_TIMEOUT,
+            breaker=get_circuit_breaker()
+        )
+    
+    logger.info(f"Loading {settings.INFERENCE_PRECISION} {settings.INFERENCE_BACKEND} model version {version} from {location}")
+    kwargs = {}
+    if _shared_weights is not None and _shared_weights.model_path == location:
+        kwargs['shared'] = _shared_weights
+    backend = create_backend(
+        settings.INFERENCE_BACKEND,
+        model_path=location,
+        num_threads=settings.INFERENCE_NUM_THREADS,
+        inter_op_threads=settings.INFERENCE_INTER_OP_THREADS,
+        **kwargs
+    )
+    # One dummy prediction traces graphs and allocates buffers before the version gets real traffic
+    backend.predict(np.zeros((1,) + _preprocessor.shape, dtype=np.float32))
+    return backend
+
+def _write_placeholder():
+    model_path = _model_path()
+    
+    # Create directory if it doesn't exist
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    
+    logger.warning(f"Model file not found at {model_path}!")
+    logger.warning("You will need to place your trained model at this location, or in a version directory next to it")
+    # Create a placeholder directory to indicate where the model should go
+    with open(model_path + ".placeholder", "w") as f:
+        f.write(f"Place your {os.path.basename(model_path)} file here")
+
+# Loading state. The model (and TensorFlow/ONNX Runtime) is only imported by
+# load_model_into_memory: on the first prediction, from the warm-up thread, or
+# at startup when MODEL_LOADING is 'eager'. With 'preload' the master only
+# calls preload_model_weights() and each worker warms up after the fork.
+_load_lock = threading.Lock()
+_load_attempted = False
+_load_error = None
+_warmup_thread = None
 
 def load_model_into_memory():
-    """Load the CNN model into memory when the Django app starts."""
-    global MODEL
-    try:
-        # Update this path to where your model file is located
-        model_path = os.path.join(os.path.dirname(__file__), 'ml_models', 'leaf_disease_model.keras')
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
-        
-        # Check if model exists, if not create a placeholder message
-        if not os.path.exists(model_path):
-            logger.warning(f"Model file not found at {model_path}!")
-            logger.warning("You will need to place your trained model at this location")
-            # Create a placeholder directory to indicate where the model should go
-            with open(model_path + ".placeholder", "w") as f:
-                f.write("Place your leaf_disease_model.keras file here")
+    """
+    Load the newest model version into the configured inference backend and warm it up, once per process.
+    
+    Afterwards a watcher thread loads newer versions in the background and swaps
+    them in (see MODEL_RELOAD_INTERVAL). Safe to call from several threads; later
+    callers wait for the first load to finish. Returns the model registry, or
+    None while no model version is loaded.
+    """
+    global REGISTRY, _load_attempted, _load_error
+    if _load_attempted:
+        return REGISTRY if REGISTRY is not None and REGISTRY.current_version is not None else None
+    
+    with _load_lock:
+        if not _load_attempted:
+            start_time = time.time()
+            registry = ModelRegistry(
+                _find_model_versions,
+                _load_model_version,
+                poll_interval=settings.MODEL_RELOAD_INTERVAL,
+                max_loaded=settings.MODEL_MAX_LOADED_VERSIONS,
+                name='leaf_disease_model'
+            )
+            try:
+                registry.refresh()
+                if registry.current_version is not None:
+                    logger.info(f"Model version {registry.current_version} loaded and warmed up in {time.time() - start_time:.2f} seconds")
+                elif settings.INFERENCE_BACKEND == TFServingRestBackend.name:
+                    _load_error = "TensorFlow Serving has no model version available"
+                else:
+                    _load_error = "Model file not found"
+                    _write_placeholder()
+            except Exception as e:
+                logger.error(f"Error loading model: {str(e)}")
+                _load_error = str(e)
+            # A version that shows up later is still picked up
+            registry.start_watching()
+            REGISTRY = registry
+            _load_attempted = True
+    return REGISTRY if REGISTRY.current_version is not None else None
+
+def start_warmup():
+    """Load the model in a background thread so the server can start accepting requests right away."""
+    global _warmup_thread
+    with _load_lock:
+        if _warmup_thread is not None or _load_attempted:
             return
-        
-        logger.info(f"Loading model from {model_path}")
-        MODEL = keras.models.load_model(model_path, compile=False)
-        logger.info("Model loaded successfully")
-    except Exception as e:
-        logger.error(f"Error loading model: {str(e)}")
-        MODEL = None
+        _warmup_thread = threading.Thread(target=load_model_into_memory, name='model-warmup', daemon=True)
+        _warmup_thread.start()
 
-def preprocess_image(image_path):
-    """Loads and preprocesses an image for model prediction."""
+def model_status():
+    """Readiness of the model: whether it is loaded, still loading, or failed to load, and which version is served."""
+    version = REGISTRY.current_version if REGISTRY is not None else None
+    return {
+        'ready': version is not None,
+        'loading': not _load_attempted and (_warmup_thread is not None or _load_lock.locked()),
+        'backend': settings.INFERENCE_BACKEND,
+        'precision': settings.INFERENCE_PRECISION,
+        'version': version,
+        'loaded_versions': REGISTRY.loaded_versions() if REGISTRY is not None else [],
+        'error': _load_error if _load_attempted and version is None else None,
+    }
+
+def check_model_version(model_version):
+    """
+    Make sure a requested model version exists (loading it if needed) before a response starts streaming.
+    
+    Raises:
+        ModelNotFoundError: If `model_version` does not exist
+    """
+    registry = load_model_into_memory()
+    if model_version is not None and registry is not None:
+        registry.release(registry.acquire(model_version))
+
+# Shared decode/resize/normalize engine
+_preprocessor = ImagePreprocessor(resample=settings.PREPROCESS_RESAMPLE, jpeg_draft=settings.PREPROCESS_JPEG_DRAFT)
+
+# Bounded pool that runs decoding/resizing off the request thread (see PREPROCESS_POOL_MODE)
+_preprocess_pool = None
+_preprocess_pool_lock = threading.Lock()
+
+def get_preprocess_pool():
+    """Return the process-wide preprocessing pool, creating it on first use."""
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        with _preprocess_pool_lock:
+            if _preprocess_pool is None:
+                _preprocess_pool = PreprocessPool(
+                    mode=settings.PREPROCESS_POOL_MODE,
+                    max_workers=settings.PREPROCESS_POOL_WORKERS,
+                    max_pending=settings.PREPROCESS_POOL_MAX_PENDING,
+                    retry_after=settings.PREPROCESS_RETRY_AFTER,
+                    preprocessor=_preprocessor
+                )
+    return _preprocess_pool
+
+def preprocess_image(image):
+    """
+    Loads and preprocesses an image (path, bytes or file-like) into a float32 batch of one for model prediction.
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool has no room for another image
+    """
     try:
-        img = Image.open(image_path).convert('RGB')  # Ensure 3-channel RGB
-        img = img.resize((224, 224))  # Resize to model's input size
-        img_array = np.array(img) / 255.0  # Normalize pixel values (0-1)
-        img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-        return img_array
+        return get_preprocess_pool().run(image)[np.newaxis]  # Add batch dimension
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise
 
-def predict_leaf_disease(image_path):
-    """Runs inference on an image and returns the predicted class and metadata."""
-    if MODEL is None:
-        logger.error("Model not loaded. Cannot make predictions.")
-        return {
-            "error": "Model not loaded. Ensure the model file is in the correct location.",
-            "disease": "Unknown",
-            "confidence": 0.0,
-            "description": "",
-            "treatment": ""
-        }
+def _acquire_model(registry, model_version):
+    try:
+        return registry.acquire(model_version)
+    except ModelNotFoundError as e:
+        record_error(e)
+        raise
+
+def _check_tf_serving():
+    try:
+        check_tf_serving()
+    except CircuitOpenError as e:
+        record_error(e)
+        raise
+
+def _model_not_loaded():
+    logger.error("Model not loaded. Cannot make predictions.")
+    record_error("ModelNotLoaded")
+    return {
+        "error": "Model not loaded. Ensure the model file is in the correct location.",
+        "disease": "Unknown",
+        "confidence": 0.0,
+        "description": "",
+        "treatment": ""
+    }
+
+def _prediction_error(message, error=None):
+    record_error(error if error is not None else "PredictionError")
+    return {
+        "error": message,
+        "disease": "Error",
+        "confidence": 0.0,
+        "description": "An error occurred during prediction",
+        "treatment": ""
+    }
+
+def _build_result(predictions, inference_time, model_version):
+    # Get the predicted class
+    predicted_class_index = np.argmax(predictions)
+    confidence_score = float(np.max(predictions))  # Convert to Python float for JSON serialization
+    
+    # Get class name, description, and treatment
+    disease_name, description, treatment = class_info(int(predicted_class_index))
+    
+    logger.info(f"Prediction: {disease_name}, Confidence: {confidence_score:.4f}")
+    logger.info(f"Inference Time: {inference_time:.6f} seconds")
+    record_prediction(disease_name)
+    
+    # Return a dictionary with the prediction results
+    return {
+        "disease": disease_name,
+        "confidence": confidence_score,
+        "description": description,
+        "treatment": treatment,
+        "inference_time": inference_time,
+        "model_version": model_version
+    }
+
+def predict_leaf_disease(image, model_version=None):
+    """
+    Runs inference on an image (path, bytes or file-like) and returns the predicted class and metadata.
+    
+    Uses `model_version` of the model if given, otherwise the current version.
     
+    Raises:
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable
+    """
+    registry = load_model_into_memory()
+    if registry is None:
+        return _model_not_loaded()
+    
+    _check_tf_serving()
+    model = _acquire_model(registry, model_version)
     try:
-        img_array = preprocess_image(image_path)
+        img_array = preprocess_image(image)
         
         # Measure inference time
-        start_time = time.time()
-        predictions = MODEL.predict(img_array)
-        end_time = time.time()
-        
-        # Get the predicted class
-        predicted_class_index = np.argmax(predictions[0])
-        confidence_score = float(np.max(predictions[0]))  # Convert to Python float for JSON serialization
+        with stage(STAGE_INFERENCE) as timer:
+            predictions = model.model.predict(img_array)
         
-        # Get class name, description, and treatment
-        if predicted_class_index < len(DISEASE_CLASSES):
-            disease_name = DISEASE_CLASSES[predicted_class_index]
-            description = DISEASE_DESCRIPTIONS.get(disease_name, "No description available")
-            treatment = DISEASE_TREATMENTS.get(disease_name, "No treatment information available")
-        else:
-            disease_name = f"Unknown (Class {predicted_class_index})"
-            description = "No description available for this class"
-            treatment = "No treatment information available"
-        
-        logger.info(f"Prediction: {disease_name}, Confidence: {confidence_score:.4f}")
-        logger.info(f"Inference Time: {end_time - start_time:.6f} seconds")
-        
-        # Return a dictionary with the prediction results
-        return {
-            "disease": disease_name,
-            "confidence": confidence_score,
-            "description": description,
-            "treatment": treatment,
-            "inference_time": end_time - start_time
-        }
+        return _build_result(predictions[0], timer.seconds, model.version)
+    except (PoolSaturatedError, CircuitOpenError) as e:
+        # Let the view shed load with a 503 instead of reporting a failed prediction
+        record_error(e)
+        raise
     except Exception as e:
         logger.error(f"Error making prediction: {str(e)}")
-        return {
-            "error": str(e),
-            "disease": "Error",
-            "confidence": 0.0,
-            "description": "An error occurred during prediction",
-            "treatment": ""
-        }
+        return _prediction_error(str(e), e)
+    finally:
+        registry.release(model)
+
+def _predict_submitted_chunk(model, futures, batch):
+    """Collect a chunk of preprocessing futures into `batch` and run the model once on the images that decoded."""
+    results = []
+    rows = 0
+    for future in futures:
+        try:
+            batch[rows] = future.result()
+            results.append(None)
+            rows += 1
+        except PoolSaturatedError as e:
+            record_error(e)
+            raise
+        except Exception as e:
+            logger.error(f"Error preprocessing image: {str(e)}")
+            results.append(_prediction_error(str(e), e))
+    
+    if rows:
+        try:
+            with stage(STAGE_INFERENCE) as timer:
+                predictions = model.model.predict(batch[:rows])
+            predictions = iter(predictions)
+            results = [
+                result if result is not None else _build_result(next(predictions), timer.seconds, model.version)
+                for result in results
+            ]
+        except CircuitOpenError as e:
+            # TensorFlow Serving went down mid-way; stop instead of failing every remaining image
+            record_error(e)
+            raise
+        except Exception as e:
+            logger.error(f"Error making batch prediction: {str(e)}")
+            results = [result if result is not None else _prediction_error(str(e), e) for result in results]
+    
+    return results
+
+def iter_leaf_disease_predictions(images, chunk_size=None, model_version=None):
+    """
+    Runs inference on many images, yielding one result dictionary per image in input order as soon as its chunk is done.
+    
+    `images` is consumed lazily: only the chunk being predicted and the next one,
+    which is decoded in the preprocessing pool meanwhile, are held in memory. The
+    decoded images are written into a preallocated batch buffer and the model is
+    called once per `chunk_size` images. An image that cannot be decoded gets an
+    error entry instead of ending the iteration. Every image goes through the same
+    model version, `model_version` or the current one, even if a newer version is
+    swapped in meanwhile.
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool stays full for longer than its retry interval
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable, before or during the iteration
+    """
+    registry = load_model_into_memory()
+    if registry is None:
+        for _ in images:
+            yield _model_not_loaded()
+        return
+    
+    chunk_size = max(1, chunk_size or settings.BATCH_PREDICT_CHUNK_SIZE)
+    pool = get_preprocess_pool()
+    batch = _preprocessor.allocate_batch(chunk_size)
+    images = iter(images)
+    
+    def submit_chunk():
+        # Wait up to the retry interval for queue room so a large batch does not 503 on its own backlog
+        return [pool.submit(image, timeout=pool.retry_after) for image in itertools.islice(images, chunk_size)]
+    
+    _check_tf_serving()
+    model = _acquire_model(registry, model_version)
+    try:
+        current = submit_chunk()
+        while current:
+            # Decode the next chunk while this one is being predicted
+            upcoming = submit_chunk()
+            yield from _predict_submitted_chunk(model, current, batch)
+            current = upcoming
+    finally:
+        registry.release(model)
+
+def predict_leaf_disease_many(images, chunk_size=None, model_version=None):
+    """
+    Runs inference on many images, returning one result dictionary per image in input order.
+    
+    Raises:
+        PoolSaturatedError: If the preprocessing pool stays full for longer than its retry interval
+        ModelNotFoundError: If `model_version` does not exist
+        CircuitOpenError: If TensorFlow Serving is considered unavailable
+    """
+    return list(iter_leaf_disease_predictions(images, chunk_size, model_version))
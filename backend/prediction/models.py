@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 import uuid
 import os
 
@@ -15,10 +16,18 @@ class PlantScan(models.Model):
     image = models.ImageField(upload_to=get_image_path)
     disease = models.CharField(max_length=255)
     confidence = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Version of the model that produced the result; empty for scans saved before versions were recorded
+    model_version = models.CharField(max_length=64, blank=True, default='')
+    # Set when the scan is created rather than when it is inserted, which may be later with SCAN_WRITE_BEHIND
+    timestamp = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         return f"{self.disease} - {self.confidence:.2f} - {self.timestamp}"
     
     class Meta:
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            # Keyset pagination of the history, optionally filtered by disease
+            models.Index(fields=['-timestamp', '-id'], name='plantscan_timestamp_id_idx'),
+            models.Index(fields=['disease', '-timestamp', '-id'], name='plantscan_disease_ts_id_idx'),
+        ]
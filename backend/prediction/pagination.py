@@ -0,0 +1,77 @@
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+def encode_cursor(timestamp, scan_id):
+    """Encode a (timestamp, id) pagination key as an opaque URL-safe cursor."""
+    raw = json.dumps([timestamp.isoformat(), str(scan_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising a 400 error if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, scan_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError(timestamp)
+        return parsed, scan_id
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on (timestamp, id), newest first.
+
+    Unlike offset pagination the cost of a page does not grow with its depth: each
+    page is an index range scan starting right after the last row of the previous
+    one. The body stays a plain list; the cursor for the next page is returned in
+    the X-Next-Cursor and Link headers.
+    """
+
+    page_size = getattr(settings, "HISTORY_PAGE_SIZE", 50)
+    max_page_size = getattr(settings, "HISTORY_MAX_PAGE_SIZE", 200)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer"})
+        if limit < 1 or limit > self.max_page_size:
+            raise ValidationError({"limit": f"Must be between 1 and {self.max_page_size}"})
+        return limit
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            timestamp, scan_id = decode_cursor(cursor)
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=scan_id))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset.order_by("-timestamp", "-id")[:limit + 1])
+
+        self.next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            self.next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+        return rows
+
+    def get_paginated_response(self, data):
+        response = Response(data)
+        if self.next_cursor is not None:
+            query = self.request.query_params.copy()
+            query["cursor"] = self.next_cursor
+            next_url = self.request.build_absolute_uri(f"{self.request.path}?{query.urlencode()}")
+            response["X-Next-Cursor"] = self.next_cursor
+            response["Link"] = f'<{next_url}>; rel="next"'
+        return response
@@ -0,0 +1,47 @@
+import threading
+
+from django.conf import settings
+
+from inference.metrics import collect_stages
+from inference.profiling import PROFILE_HEADER, RequestProfiler
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = RequestProfiler(
+                    str(settings.PROFILING_DIR),
+                    sample_rate=settings.PROFILING_SAMPLE_RATE if settings.PROFILING_ENABLED else 0.0,
+                    slow_threshold_ms=settings.PROFILING_SLOW_THRESHOLD_MS,
+                    interval_ms=settings.PROFILING_INTERVAL_MS,
+                    max_profiles=settings.PROFILING_MAX_PROFILES,
+                    secret=settings.PROFILING_SECRET,
+                )
+    return _profiler
+
+class ProfilingMiddleware:
+    """Samples the stacks of selected requests and writes their profiles after the response."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profiler = get_profiler()
+    
+    def __call__(self, request):
+        session = self.profiler.start(request.headers.get(PROFILE_HEADER), threading.get_ident())
+        if session is None:
+            return self.get_response(request)
+        
+        info = {'method': request.method, 'path': request.path, 'endpoint': None, 'status': 500}
+        with collect_stages() as stages:
+            try:
+                response = self.get_response(request)
+                info['status'] = response.status_code
+            finally:
+                if request.resolver_match is not None:
+                    info['endpoint'] = '/' + request.resolver_match.route
+                self.profiler.finish(session, stages, info)
+        return response
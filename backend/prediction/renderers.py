@@ -0,0 +1,22 @@
+
+from rest_framework.renderers import BaseRenderer
+
+from inference.streaming import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, encode_stream_event
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients ask for newline-delimited JSON; non-streamed responses (errors) become a single line."""
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return encode_stream_event(data, sse=False) if data is not None else ''
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for server-sent events; non-streamed responses (errors) become a single error event."""
+    media_type = SSE_MEDIA_TYPE
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return encode_stream_event(data, sse=True, event='error') if data is not None else ''
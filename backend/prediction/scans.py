@@ -0,0 +1,59 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from inference.metrics import STAGE_DB_WRITE, stage
+from inference.writebehind import WriteBehindQueue
+
+from .models import PlantScan
+
+logger = logging.getLogger(__name__)
+
+def _insert_scans(scans):
+    # Runs on the writer thread, which has its own database connection: drop it
+    # when stale or broken instead of failing every later batch
+    close_old_connections()
+    try:
+        PlantScan.objects.bulk_create(scans)
+    finally:
+        close_old_connections()
+
+# Background writer used when SCAN_WRITE_BEHIND is on
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_scan_writer():
+    """Return the write-behind queue of scans, creating it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindQueue(
+                    _insert_scans,
+                    max_batch=settings.SCAN_WRITE_BATCH_SIZE,
+                    flush_interval=settings.SCAN_WRITE_FLUSH_INTERVAL,
+                    max_pending=settings.SCAN_WRITE_MAX_PENDING,
+                    name='scan-writer'
+                )
+                # Graceful exits (Gunicorn worker shutdown, runserver) write what is still queued
+                atexit.register(close_scan_writer)
+    return _writer
+
+def close_scan_writer():
+    """Write every queued scan and stop the background writer."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+def save_scans(scans):
+    """Persist unsaved PlantScan instances, queued for a batched background INSERT with SCAN_WRITE_BEHIND or right away otherwise."""
+    with stage(STAGE_DB_WRITE):
+        if settings.SCAN_WRITE_BEHIND:
+            get_scan_writer().submit(scans)
+        else:
+            PlantScan.objects.bulk_create(scans)
@@ -5,10 +5,11 @@ from .models import PlantScan
 class PlantScanSerializer(serializers.ModelSerializer):
     """Serializer for the PlantScan model."""
     imageUrl = serializers.SerializerMethodField()
+    modelVersion = serializers.CharField(source='model_version')
     
     class Meta:
         model = PlantScan
-        fields = ['id', 'disease', 'confidence', 'timestamp', 'imageUrl']
+        fields = ['id', 'disease', 'confidence', 'timestamp', 'imageUrl', 'modelVersion']
     
     def get_imageUrl(self, obj):
         request = self.context.get('request')
@@ -27,6 +28,7 @@ class PredictionResponseSerializer(serializers.Serializer):
     description = serializers.CharField()
     treatment = serializers.CharField()
     sources = serializers.ListField(child=serializers.DictField(), required=False)
+    modelVersion = serializers.CharField(required=False)
 
 class TreatmentRequestSerializer(serializers.Serializer):
     """Serializer for treatment requests."""
@@ -0,0 +1,23 @@
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Small pool that writes uploaded images to storage off the request path
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+def _save(name, contents):
+    try:
+        saved_name = default_storage.save(name, ContentFile(contents))
+        if saved_name != name:
+            logger.warning(f"Uploaded image stored as {saved_name} instead of {name}")
+    except Exception as e:
+        logger.error(f"Error saving uploaded image {name}: {str(e)}")
+
+def persist_upload_async(name, contents):
+    """Write an uploaded image to default storage in the background."""
+    return _executor.submit(_save, name, contents)
@@ -2,16 +2,26 @@
 from django.urls import path
 from .views import (
     PredictAPIView, 
+    PredictBatchAPIView,
+    PredictStreamAPIView,
     TreatmentAPIView, 
     PlantInfoAPIView,
     HistoryAPIView,
-    HistoryDetailAPIView
+    HistoryDetailAPIView,
+    ReadyAPIView,
+    HealthAPIView,
+    ScanWriterStatsAPIView
 )
 
 urlpatterns = [
     path('predict', PredictAPIView.as_view(), name='predict'),
+    path('predict/batch', PredictBatchAPIView.as_view(), name='predict-batch'),
+    path('predict/stream', PredictStreamAPIView.as_view(), name='predict-stream'),
     path('treatment/<str:disease>', TreatmentAPIView.as_view(), name='treatment'),
     path('plant-info/<str:plant_name>', PlantInfoAPIView.as_view(), name='plant-info'),
     path('history', HistoryAPIView.as_view(), name='history'),
     path('history/<str:scan_id>', HistoryDetailAPIView.as_view(), name='history-detail'),
+    path('ready', ReadyAPIView.as_view(), name='ready'),
+    path('health', HealthAPIView.as_view(), name='health'),
+    path('scan-writer/stats', ScanWriterStatsAPIView.as_view(), name='scan-writer-stats'),
 ]
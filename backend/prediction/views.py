@@ -1,13 +1,26 @@
 
-import os
 import json
+from collections import deque
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 
-from .models import PlantScan
+from inference.archives import extract_images_from_zip, iter_images_from_zip
+from inference.circuit import OPEN, CircuitOpenError
+from inference.http_cache import ResponseCache, etag_matches, fragment_from_body
+from inference.metadata import DEMO_SOURCES, plant_info_response, treatment_response
+from inference.metrics import STAGE_UPLOAD_READ, stage
+from inference.registry import ModelNotFoundError
+from inference.streaming import STREAM_HEADERS, encode_stream_event, stream_media_type, wants_event_stream
+from inference.workers import PoolSaturatedError
+
+from .circuit import check_tf_serving, circuit_status
+from .models import PlantScan, get_image_path
 from .serializers import (
     PlantScanSerializer, 
     PredictionRequestSerializer, 
@@ -15,7 +28,18 @@ from .serializers import (
     TreatmentRequestSerializer,
     PlantInfoRequestSerializer
 )
-from .ml_model import predict_leaf_disease
+from .ml_model import (
+    check_model_version,
+    predict_leaf_disease,
+    predict_leaf_disease_many,
+    iter_leaf_disease_predictions,
+    model_status,
+    start_warmup,
+)
+from .pagination import KeysetPagination
+from .renderers import EventStreamRenderer, NDJSONRenderer
+from .scans import get_scan_writer, save_scans
+from .uploads import persist_upload_async
 
 class PredictAPIView(APIView):
     """API view for plant disease prediction."""
@@ -27,41 +51,30 @@ class PredictAPIView(APIView):
         if serializer.is_valid():
             image_file = serializer.validated_data['image']
             
-            # Save the uploaded image temporarily
-            temp_path = os.path.join(settings.MEDIA_ROOT, 'temp_uploads', image_file.name)
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            
-            with open(temp_path, 'wb+') as destination:
-                for chunk in image_file.chunks():
-                    destination.write(chunk)
-            
             try:
-                # Make prediction
-                prediction_result = predict_leaf_disease(temp_path)
+                # Decode straight from the in-memory upload; nothing is written to disk on the latency path
+                with stage(STAGE_UPLOAD_READ):
+                    contents = image_file.read()
+                prediction_result = predict_leaf_disease(contents, request.query_params.get('version'))
                 
                 # Check if there was an error
                 if 'error' in prediction_result:
                     return Response({'error': prediction_result['error']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
-                # Save scan to database
+                # Save scan to database. The image itself is written to storage in the background.
                 plant_scan = PlantScan(
-                    image=image_file,
                     disease=prediction_result['disease'],
-                    confidence=prediction_result['confidence']
+                    confidence=prediction_result['confidence'],
+                    model_version=prediction_result['model_version']
                 )
-                plant_scan.save()
+                if settings.PERSIST_UPLOADS:
+                    plant_scan.image = get_image_path(plant_scan, image_file.name)
+                save_scans([plant_scan])
+                if settings.PERSIST_UPLOADS:
+                    persist_upload_async(plant_scan.image.name, contents)
                 
                 # Add sources (demo data)
-                sources = [
-                    {
-                        "title": "Plant Village Database",
-                        "url": "https://plantvillage.psu.edu/"
-                    },
-                    {
-                        "title": "Agricultural Extension Service",
-                        "url": "https://extension.org/"
-                    }
-                ]
+                sources = DEMO_SOURCES
                 
                 # Prepare response data
                 response_data = {
@@ -69,123 +82,356 @@ class PredictAPIView(APIView):
                     "confidence": prediction_result['confidence'],
                     "description": prediction_result['description'],
                     "treatment": prediction_result['treatment'],
-                    "sources": sources
+                    "sources": sources,
+                    "modelVersion": prediction_result['model_version']
                 }
                 
-                # Clean up temporary file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                
                 return Response(response_data, status=status.HTTP_200_OK)
                 
+            except ModelNotFoundError as e:
+                return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+            except (PoolSaturatedError, CircuitOpenError) as e:
+                # Too many images already waiting to be decoded, or TensorFlow Serving is down; ask the client to back off
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': str(e.retry_after)}
+                )
             except Exception as e:
-                # Clean up temporary file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
                 return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class PredictBatchAPIView(APIView):
+    """API view for predicting many images in one request, sent as repeated `images` parts or one zip `archive`."""
+    parser_classes = (MultiPartParser, FormParser)
+    
+    def post(self, request, *args, **kwargs):
+        max_images = settings.BATCH_PREDICT_MAX_IMAGES
+        max_image_bytes = settings.BATCH_PREDICT_MAX_IMAGE_BYTES
+        
+        uploads = []
+        for image_file in request.FILES.getlist('images'):
+            if not (image_file.content_type or '').startswith('image/'):
+                return Response({'error': f"{image_file.name} is not an image"}, status=status.HTTP_400_BAD_REQUEST)
+            if image_file.size > max_image_bytes:
+                return Response({'error': f"{image_file.name} is larger than {max_image_bytes} bytes"}, status=status.HTTP_400_BAD_REQUEST)
+            with stage(STAGE_UPLOAD_READ):
+                contents = image_file.read()
+            uploads.append((image_file.name, contents))
+        
+        archive = request.FILES.get('archive')
+        if archive is not None:
+            try:
+                uploads.extend(extract_images_from_zip(
+                    archive,
+                    max_images=max(0, max_images - len(uploads)),
+                    max_image_bytes=max_image_bytes
+                ))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not uploads:
+            return Response({'error': 'No images uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(uploads) > max_images:
+            return Response(
+                {'error': f"At most {max_images} images can be predicted per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            prediction_results = predict_leaf_disease_many(
+                [contents for _, contents in uploads],
+                model_version=request.query_params.get('version')
+            )
+            
+            scans = []
+            results = []
+            for (filename, contents), prediction_result in zip(uploads, prediction_results):
+                if 'error' in prediction_result:
+                    results.append({'filename': filename, 'error': prediction_result['error']})
+                    continue
+                
+                plant_scan = PlantScan(
+                    disease=prediction_result['disease'],
+                    confidence=prediction_result['confidence'],
+                    model_version=prediction_result['model_version']
+                )
+                if settings.PERSIST_UPLOADS:
+                    plant_scan.image = get_image_path(plant_scan, filename)
+                scans.append((plant_scan, contents))
+                
+                results.append({
+                    'filename': filename,
+                    'result': {
+                        "disease": prediction_result['disease'],
+                        "confidence": prediction_result['confidence'],
+                        "description": prediction_result['description'],
+                        "treatment": prediction_result['treatment'],
+                        "sources": DEMO_SOURCES,
+                        "modelVersion": prediction_result['model_version']
+                    }
+                })
+            
+            # One INSERT for the whole batch; the images are written to storage in the background
+            save_scans([plant_scan for plant_scan, _ in scans])
+            if settings.PERSIST_UPLOADS:
+                for plant_scan, contents in scans:
+                    persist_upload_async(plant_scan.image.name, contents)
+            
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        
+        except ModelNotFoundError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except (PoolSaturatedError, CircuitOpenError) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class PredictStreamAPIView(APIView):
+    """
+    API view that predicts many images and streams each result as soon as it is known.
+    
+    Takes the same uploads as PredictBatchAPIView. Results are newline-delimited
+    JSON, or server-sent events when the client sends `Accept: text/event-stream`.
+    Uploads are read lazily and scans are saved one chunk at a time, so memory
+    stays flat however many images are sent.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    renderer_classes = (JSONRenderer, NDJSONRenderer, EventStreamRenderer)
+    
+    def post(self, request, *args, **kwargs):
+        max_images = settings.STREAM_PREDICT_MAX_IMAGES
+        max_image_bytes = settings.BATCH_PREDICT_MAX_IMAGE_BYTES
+        
+        image_files = request.FILES.getlist('images')
+        for image_file in image_files:
+            if not (image_file.content_type or '').startswith('image/'):
+                return Response({'error': f"{image_file.name} is not an image"}, status=status.HTTP_400_BAD_REQUEST)
+            if image_file.size > max_image_bytes:
+                return Response({'error': f"{image_file.name} is larger than {max_image_bytes} bytes"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(image_files) > max_images:
+            return Response(
+                {'error': f"At most {max_images} images can be predicted per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        archive_images = iter(())
+        archive = request.FILES.get('archive')
+        if archive is not None:
+            try:
+                archive_images = iter_images_from_zip(
+                    archive,
+                    max_images=max(0, max_images - len(image_files)),
+                    max_image_bytes=max_image_bytes
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elif not image_files:
+            return Response({'error': 'No images uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Unknown versions get a 404 before the streaming response commits to a 200
+        model_version = request.query_params.get('version')
+        try:
+            check_tf_serving()
+            check_model_version(model_version)
+        except ModelNotFoundError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except CircuitOpenError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+        
+        def uploads():
+            # Read each upload only when the model is about to need it
+            for image_file in image_files:
+                with stage(STAGE_UPLOAD_READ):
+                    contents = image_file.read()
+                yield image_file.name, contents
+            yield from archive_images
+        
+        sse = wants_event_stream(request.META.get('HTTP_ACCEPT'))
+        response = StreamingHttpResponse(self.stream(uploads(), sse, model_version), content_type=stream_media_type(sse))
+        for header, value in STREAM_HEADERS.items():
+            response[header] = value
+        return response
+    
+    def stream(self, uploads, sse, model_version=None):
+        pending = deque()  # (filename, contents) of the images sent to the model, in order
+        scans = []
+        count = 0
+        
+        def images():
+            for filename, contents in uploads:
+                pending.append((filename, contents))
+                yield contents
+        
+        def save(scans):
+            save_scans([plant_scan for plant_scan, _ in scans])
+            if settings.PERSIST_UPLOADS:
+                for plant_scan, contents in scans:
+                    persist_upload_async(plant_scan.image.name, contents)
+        
+        try:
+            for index, prediction_result in enumerate(iter_leaf_disease_predictions(images(), model_version=model_version)):
+                filename, contents = pending.popleft()
+                count += 1
+                
+                if 'error' in prediction_result:
+                    yield encode_stream_event({'index': index, 'filename': filename, 'error': prediction_result['error']}, sse)
+                    continue
+                
+                plant_scan = PlantScan(
+                    disease=prediction_result['disease'],
+                    confidence=prediction_result['confidence'],
+                    model_version=prediction_result['model_version']
+                )
+                if settings.PERSIST_UPLOADS:
+                    plant_scan.image = get_image_path(plant_scan, filename)
+                scans.append((plant_scan, contents))
+                
+                yield encode_stream_event({
+                    'index': index,
+                    'filename': filename,
+                    'result': {
+                        "disease": prediction_result['disease'],
+                        "confidence": prediction_result['confidence'],
+                        "description": prediction_result['description'],
+                        "treatment": prediction_result['treatment'],
+                        "sources": DEMO_SOURCES,
+                        "modelVersion": prediction_result['model_version']
+                    }
+                }, sse)
+                
+                if len(scans) >= settings.BATCH_PREDICT_CHUNK_SIZE:
+                    save(scans)
+                    scans = []
+            
+            if sse:
+                yield encode_stream_event({'count': count}, sse, event='done')
+        
+        except (PoolSaturatedError, CircuitOpenError) as e:
+            # The status line is already sent; tell the client in-band when to retry the rest
+            yield encode_stream_event({'error': str(e), 'retry_after': e.retry_after, 'completed': count}, sse, event='error')
+        
+        except Exception as e:
+            yield encode_stream_event({'error': str(e), 'completed': count}, sse, event='error')
+        
+        finally:
+            if scans:
+                save(scans)
+
+# Serialized responses of the read endpoints (see RESPONSE_CACHE_*)
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES,
+    settings.RESPONSE_CACHE_CONTROL,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
+
+def cached_response(request, route, fragment):
+    """Serve a cached response body with its ETag and the route's Cache-Control, or 304 when the client already has it."""
+    if etag_matches(request.headers.get('If-None-Match'), fragment.etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(fragment.body, content_type='application/json')
+    for header, value in response_cache.headers(route, fragment).items():
+        response[header] = value
+    return response
+
 class TreatmentAPIView(APIView):
     """API view for retrieving treatment for a specific disease."""
     
     def get(self, request, disease, *args, **kwargs):
-        # Demo treatment data
-        treatments = {
-            "Apple___Apple_scab": "Apply fungicides early in the growing season. Remove and destroy infected leaves. Use resistant varieties if possible.",
-            "Tomato___Early_blight": "Remove infected leaves. Apply fungicides. Mulch around plants. Avoid overhead watering. Rotate crops."
-        }
-        
-        treatment = treatments.get(disease, "No specific treatment found for this disease.")
-        
-        return Response({
-            "disease": disease,
-            "treatment": treatment,
-            "steps": [
-                "Remove all infected leaves and dispose of them properly.",
-                "Apply appropriate fungicide according to label instructions.",
-                "Improve air circulation around plants.",
-                "Water at the base of plants to avoid wetting foliage.",
-                "Rotate crops in future growing seasons."
-            ]
-        }, status=status.HTTP_200_OK)
+        # Demo treatment data, prebuilt with its ETag for the known diseases
+        fragment = treatment_response(disease)
+        return cached_response(request, 'treatment', fragment)
 
 class PlantInfoAPIView(APIView):
     """API view for retrieving plant information."""
     
     def get(self, request, plant_name, *args, **kwargs):
-        # Demo plant info data
-        plants_info = {
-            "tomato": {
-                "name": "Tomato",
-                "scientificName": "Solanum lycopersicum",
-                "care": {
-                    "water": "Regular watering, 1-2 inches per week",
-                    "sunlight": "Full sun, 6-8 hours daily",
-                    "temperature": "65-85°F (18-29°C)",
-                    "airflow": "Good ventilation to prevent fungal diseases"
-                },
-                "preventionTips": [
-                    "Rotate crops every 3-4 years",
-                    "Use disease-resistant varieties",
-                    "Provide proper spacing for air circulation",
-                    "Water at the base to keep foliage dry",
-                    "Remove and destroy diseased plant material"
-                ]
-            },
-            "apple": {
-                "name": "Apple",
-                "scientificName": "Malus domestica",
-                "care": {
-                    "water": "1 inch of water per week during growing season",
-                    "sunlight": "Full sun, 6-8 hours daily",
-                    "temperature": "60-80°F (15-27°C)",
-                    "airflow": "Proper pruning for good air circulation"
-                },
-                "preventionTips": [
-                    "Proper pruning to improve air circulation",
-                    "Clean up fallen leaves and fruit",
-                    "Apply dormant sprays before bud break",
-                    "Use disease-resistant varieties",
-                    "Manage insect pests promptly"
-                ]
-            }
-        }
-        
-        plant_info = plants_info.get(plant_name.lower(), {
-            "name": plant_name.capitalize(),
-            "scientificName": "Not available",
-            "care": {
-                "water": "General care information not available",
-                "sunlight": "General care information not available",
-                "temperature": "General care information not available"
-            },
-            "preventionTips": [
-                "Use disease-resistant varieties",
-                "Practice crop rotation",
-                "Maintain good air circulation",
-                "Water properly, avoiding wet foliage",
-                "Monitor regularly for early detection of issues"
-            ]
-        })
-        
-        return Response(plant_info, status=status.HTTP_200_OK)
+        # Demo plant info data, prebuilt with its ETag for the known plants
+        fragment = plant_info_response(plant_name)
+        return cached_response(request, 'plant-info', fragment)
 
 class HistoryAPIView(APIView):
     """API view for retrieving scan history."""
     
+    pagination_class = KeysetPagination
+    
     def get(self, request, *args, **kwargs):
         scans = PlantScan.objects.all()
-        serializer = PlantScanSerializer(scans, many=True, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        
+        # Optional filters, each served by the (disease, timestamp, id) / (timestamp, id) indexes
+        disease = request.query_params.get('disease')
+        if disease:
+            scans = scans.filter(disease=disease)
+        
+        for param, lookup in (('since', 'timestamp__gte'), ('until', 'timestamp__lt')):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    return Response({param: "Invalid datetime"}, status=status.HTTP_400_BAD_REQUEST)
+                scans = scans.filter(**{lookup: parsed})
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(scans, request, view=self)
+        serializer = PlantScanSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serializer.data)
 
 class HistoryDetailAPIView(APIView):
     """API view for retrieving a specific scan."""
     
     def get(self, request, scan_id, *args, **kwargs):
-        try:
-            scan = PlantScan.objects.get(id=scan_id)
+        def build():
+            try:
+                scan = PlantScan.objects.get(id=scan_id)
+            except PlantScan.DoesNotExist:
+                return None
             serializer = PlantScanSerializer(scan, context={"request": request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except PlantScan.DoesNotExist:
+            return fragment_from_body(JSONRenderer().render(serializer.data))
+        
+        # Scans never change once saved, so a scan is looked up and serialized once and then served
+        # from the cache. The image URL is absolute, hence the scheme and host in the key.
+        fragment = response_cache.get_or_build('history-detail', (scan_id, request.build_absolute_uri('/')), build)
+        if fragment is None:
             return Response({"error": "Scan not found"}, status=status.HTTP_404_NOT_FOUND)
+        return cached_response(request, 'history-detail', fragment)
+
+class ReadyAPIView(APIView):
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 until then."""
+    
+    def get(self, request, *args, **kwargs):
+        # With lazy loading the first probe starts the warm-up instead of the first prediction
+        start_warmup()
+        
+        model = model_status()
+        if model['ready']:
+            return Response(model, status=status.HTTP_200_OK)
+        return Response(model, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+
+class HealthAPIView(APIView):
+    """Liveness plus the TensorFlow Serving circuit breaker; "degraded" while it is open and predictions fail fast."""
+    
+    def get(self, request, *args, **kwargs):
+        circuit = circuit_status()
+        return Response({
+            'status': 'degraded' if circuit is not None and circuit['state'] == OPEN else 'ok',
+            'backend': settings.INFERENCE_BACKEND,
+            'circuit': circuit
+        }, status=status.HTTP_200_OK)
+
+class ScanWriterStatsAPIView(APIView):
+    """Queue depth and counters of the write-behind scan writer (SCAN_WRITE_BEHIND)."""
+    
+    def get(self, request, *args, **kwargs):
+        if not settings.SCAN_WRITE_BEHIND:
+            return Response({'enabled': False}, status=status.HTTP_200_OK)
+        return Response({'enabled': True, **get_scan_writer().stats()}, status=status.HTTP_200_OK)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from inference.admission import AdmissionController, AdmissionRejectedError, _Waiter
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def test_admits_up_to_max_in_flight_then_rejects_when_queue_full():
+    controller = AdmissionController(2, max_queue=0)
+    controller.acquire()
+    controller.acquire()
+    assert controller.in_flight == 2
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire()
+    assert error.value.status_code == 429
+    controller.release()
+    controller.acquire()
+    assert controller.stats()["rejected_queue_full"] == 1
+
+def test_queue_timeout_answers_503_and_leaves_the_queue():
+    controller = AdmissionController(1, max_queue=1, queue_timeout=0.05, retry_after=3)
+    controller.acquire()
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire()
+    assert (error.value.status_code, error.value.retry_after) == (503, 3)
+    assert controller.waiting == 0
+    assert controller.in_flight == 1
+
+def test_predicted_deadline_miss_is_rejected_at_once():
+    controller = AdmissionController(1, max_queue=10, queue_timeout=1.0)
+    controller.acquire()
+    controller.release(held=5.0)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire()
+    assert error.value.status_code == 503
+    assert time.monotonic() - start < 0.5
+    assert controller.stats()["rejected_deadline"] == 1
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    controller = AdmissionController(1, max_queue=2, queue_timeout=2.0)
+    controller.acquire()
+    order = []
+
+    def wait(name):
+        controller.acquire()
+        order.append(name)
+
+    first = threading.Thread(target=wait, args=("first",))
+    first.start()
+    wait_until(lambda: controller.waiting == 1)
+    second = threading.Thread(target=wait, args=("second",))
+    second.start()
+    wait_until(lambda: controller.waiting == 2)
+
+    controller.release()
+    first.join(2)
+    assert order == ["first"]
+    # The slot was handed over, not freed
+    assert controller.in_flight == 1
+    controller.release()
+    second.join(2)
+    assert order == ["first", "second"]
+    controller.release()
+    assert controller.in_flight == 0
+
+def test_waiter_granted_as_it_times_out_keeps_the_slot():
+    controller = AdmissionController(1, max_queue=1)
+    controller.acquire()
+    waiter = _Waiter()
+    assert not controller._admit_or_enqueue(waiter)
+    controller.release()
+    # The timeout fired after the grant: the waiter cannot give up and holds the slot
+    assert not controller._give_up(waiter)
+    assert controller.in_flight == 1
+    assert controller.waiting == 0
+
+def test_cancelled_waiter_does_not_leak_a_granted_slot():
+    controller = AdmissionController(1, max_queue=1, queue_timeout=2.0)
+
+    async def request():
+        async with controller.admit_async():
+            pass
+
+    async def scenario():
+        await controller.acquire_async()
+        task = asyncio.ensure_future(request())
+        await asyncio.sleep(0)
+        assert controller.waiting == 1
+        # Granted, then cancelled before the waiter gets to run: either the waiter hands the slot
+        # back while cancelling, or the grant wins and the request runs and releases it
+        controller.release()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert controller.in_flight == 0
+    assert controller.waiting == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController(1, max_queue=1, queue_timeout=2.0)
+
+    async def scenario():
+        await controller.acquire_async()
+        task = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert controller.waiting == 0
+    assert controller.in_flight == 1
+
+def test_admit_releases_on_error():
+    controller = AdmissionController(1)
+    with pytest.raises(ValueError):
+        with controller.admit():
+            raise ValueError()
+    assert controller.in_flight == 0
+    assert controller.stats()["hold_time_ms"] is not None
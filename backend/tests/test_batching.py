@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from app.batching import PredictionBatcher
+
+def test_predicts_each_instance():
+    batcher = PredictionBatcher(lambda instances: [instance * 2 for instance in instances], max_wait_ms=1)
+    try:
+        assert [batcher.predict(i, timeout=2) for i in range(3)] == [0, 2, 4]
+    finally:
+        batcher.shutdown()
+
+def test_shutdown_before_first_submit_starts_no_workers():
+    batcher = PredictionBatcher(lambda instances: instances)
+    batcher.shutdown()
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
+    assert batcher._workers == []
+
+def test_submit_racing_shutdown_is_served_or_refused():
+    batcher = PredictionBatcher(lambda instances: instances, max_wait_ms=1, num_workers=2)
+    futures = []
+    start = threading.Barrier(5)
+
+    def submit():
+        start.wait()
+        for i in range(200):
+            try:
+                futures.append(batcher.submit(i))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    batcher.shutdown()
+    for thread in threads:
+        thread.join()
+    # Every accepted instance was queued ahead of the stop sentinels, so none is left waiting
+    for future in futures:
+        future.result(timeout=2)
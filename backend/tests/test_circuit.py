@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from inference.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, HealthProbe, is_backend_failure
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+def open_breaker(**kwargs):
+    breaker = CircuitBreaker("test", min_calls=2, failure_rate_threshold=0.5, **kwargs)
+    breaker.record(0.0, RuntimeError())
+    breaker.record(0.0, RuntimeError())
+    assert breaker.state == OPEN
+    return breaker
+
+def test_stays_closed_below_min_calls():
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate_threshold=0.5)
+    for _ in range(3):
+        breaker.record(0.0, RuntimeError())
+    assert breaker.state == CLOSED
+    breaker.record(0.0)
+    assert breaker.state == OPEN
+
+def test_open_breaker_fails_fast_with_retry_after():
+    breaker = open_breaker(open_seconds=30)
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert 1 <= error.value.retry_after <= 30
+    with pytest.raises(CircuitOpenError):
+        with breaker.call():
+            pytest.fail("an open breaker must not run the call")
+
+def test_opens_on_slow_calls():
+    breaker = CircuitBreaker("test", min_calls=2, slow_call_seconds=0.1, slow_call_rate_threshold=1.0)
+    breaker.record(0.2)
+    assert breaker.state == CLOSED
+    breaker.record(0.2)
+    assert breaker.state == OPEN
+
+def test_client_errors_do_not_count():
+    breaker = CircuitBreaker("test", min_calls=2, failure_rate_threshold=0.5)
+    for _ in range(5):
+        breaker.record(0.0, StatusError(400))
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["failures"] == 0
+
+def test_is_backend_failure():
+    assert is_backend_failure(RuntimeError("connection refused"))
+    assert is_backend_failure(StatusError(503))
+    assert not is_backend_failure(StatusError(404))
+    assert is_backend_failure(StatusError("UNAVAILABLE"))
+    assert not is_backend_failure(StatusError("INVALID_ARGUMENT"))
+
+def test_old_calls_leave_the_window():
+    breaker = CircuitBreaker("test", window=1, min_calls=2, failure_rate_threshold=0.5)
+    breaker.record(0.0, RuntimeError())
+    time.sleep(1.1)
+    breaker.record(0.0, RuntimeError())
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 1
+
+def test_half_open_limits_trials_and_closes_after_them():
+    breaker = open_breaker(open_seconds=0.05, half_open_calls=2)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(0.0)
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.0)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 0
+
+def test_failed_trial_opens_again():
+    breaker = open_breaker(open_seconds=0.05, half_open_calls=2)
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        with breaker.call():
+            raise RuntimeError("still down")
+    assert breaker.state == OPEN
+
+def test_cancelled_trial_gives_its_slot_back():
+    breaker = open_breaker(open_seconds=0.05, half_open_calls=1)
+    time.sleep(0.06)
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.call():
+            raise asyncio.CancelledError()
+    assert breaker.state == HALF_OPEN
+    # The trial slot is free again and the cancellation was not counted as a failure
+    with breaker.call():
+        pass
+    assert breaker.state == CLOSED
+
+def test_probe_opens_and_recovers():
+    breaker = CircuitBreaker("test", open_seconds=30, probe_failures_to_open=2)
+    breaker.record_probe(False, "down")
+    assert breaker.state == CLOSED
+    breaker.record_probe(False, "down")
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["reason"] == "health probe failed: down"
+    breaker.record_probe(True)
+    assert breaker.state == HALF_OPEN
+    breaker.record_probe(False, "down again")
+    assert breaker.state == OPEN
+
+def test_healthy_probe_resets_the_failure_count():
+    breaker = CircuitBreaker("test", probe_failures_to_open=2)
+    breaker.record_probe(False, "blip")
+    breaker.record_probe(True)
+    breaker.record_probe(False, "blip")
+    assert breaker.state == CLOSED
+
+def test_health_probe_thread():
+    breaker = CircuitBreaker("test", probe_failures_to_open=1)
+    probe = HealthProbe(breaker, lambda: (False, "down"), interval=0.01)
+    probe.start()
+    try:
+        deadline = time.monotonic() + 2
+        while breaker.state != OPEN and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        probe.stop()
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["last_probe"]["healthy"] is False
@@ -0,0 +1,58 @@
+import asyncio
+import base64
+import datetime
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from app import database
+from app.routes import router
+
+class _RecordingPool:
+    def __init__(self):
+        self.params = None
+
+    async def fetch(self, query, *params, timeout=None):
+        self.params = params
+        return []
+
+def _get_history(monkeypatch, query):
+    pool = _RecordingPool()
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(database, "_get_pool", get_pool)
+    app = FastAPI()
+    app.include_router(router)
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/history", params=query)
+
+    return asyncio.run(request()), pool.params
+
+def _local(value):
+    return value.astimezone().replace(tzinfo=None)
+
+def test_since_and_until_with_z_and_offset(monkeypatch):
+    response, params = _get_history(monkeypatch, {"since": "2024-01-01T00:00:00Z", "until": "2024-01-02T00:00:00+02:00"})
+    assert response.status_code == 200
+    since = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    until = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert params[:2] == (_local(since), _local(until))
+    assert all(value.tzinfo is None for value in params[:2])
+
+def test_naive_since_is_bound_unchanged(monkeypatch):
+    response, params = _get_history(monkeypatch, {"since": "2024-01-01T12:30:00"})
+    assert response.status_code == 200
+    assert params[0] == datetime.datetime(2024, 1, 1, 12, 30)
+
+def test_cursor_with_offset(monkeypatch):
+    raw = json.dumps(["2024-01-01T00:00:00+05:30", "scan-id"]).encode()
+    cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    response, params = _get_history(monkeypatch, {"cursor": cursor})
+    assert response.status_code == 200
+    offset = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+    assert params[:2] == (_local(datetime.datetime(2024, 1, 1, tzinfo=offset)), "scan-id")
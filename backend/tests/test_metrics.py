@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+from inference import metrics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One worker process: a prediction, a request in flight that never ends, and a queue depth
+WORKER = """
+from inference import metrics
+metrics.record_prediction("Tomato___healthy")
+metrics.REQUESTS_IN_FLIGHT.inc()
+metrics.set_gauge_function(metrics.QUEUE_DEPTH, lambda: 2, "preprocess")
+metrics.refresh_gauges()
+"""
+
+def run_python(code, multiproc_dir):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout
+
+def test_callback_gauges_are_read_when_rendered():
+    depth = [4]
+    metrics.set_gauge_function(metrics.QUEUE_DEPTH, lambda: depth[0], "test")
+    assert 'plantopia_queue_depth{queue="test"} 4.0' in metrics.render()
+    depth[0] = 1
+    assert 'plantopia_queue_depth{queue="test"} 1.0' in metrics.render()
+
+def test_multiprocess_scrape_sums_all_workers(tmp_path):
+    for _ in range(2):
+        run_python(WORKER, tmp_path)
+
+    scrape = "from inference import metrics; print(metrics.render())"
+    text = run_python(scrape, tmp_path)
+    assert 'plantopia_predictions_total{disease="Tomato___healthy"} 2.0' in text
+    assert 'plantopia_queue_depth{queue="preprocess"} 4.0' in text
+    assert "plantopia_requests_in_flight 2.0" in text
+
+    # The workers have exited; once marked dead their live gauges no longer count, their counters still do
+    for name in os.listdir(tmp_path):
+        if name.startswith("gauge_live"):
+            pid = int(name.rsplit("_", 1)[1].split(".")[0])
+            run_python(f"from inference import metrics; metrics.mark_process_dead({pid})", tmp_path)
+    text = run_python(scrape, tmp_path)
+    assert 'plantopia_predictions_total{disease="Tomato___healthy"} 2.0' in text
+    assert 'queue="preprocess"' not in text
@@ -0,0 +1,45 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from app.cache import LocalCacheBackend, PredictionCache, RedisCacheBackend
+
+RESULT = {"disease": "Tomato___healthy", "confidence": 0.9}
+
+def test_shared_hits_are_copied_into_the_local_tier():
+    async def run():
+        shared = LocalCacheBackend()
+        await PredictionCache(shared=shared).set("key", RESULT)
+        cache = PredictionCache(shared=shared)
+        assert await cache.get_many(["key", None, "other"]) == [RESULT, None, None]
+        assert await cache.get("key") == RESULT
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["shared_hits"], stats["local_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_unresponsive_redis_is_a_bounded_miss():
+    pytest.importorskip("redis")
+    # Accepts connections but never answers, like a Redis stuck behind a full network buffer
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    port = server.getsockname()[1]
+
+    async def run():
+        cache = PredictionCache(shared=RedisCacheBackend(f"redis://127.0.0.1:{port}/0", timeout=0.05, connect_timeout=0.05))
+        started = time.monotonic()
+        await cache.set("key", RESULT)
+        value = await cache.get("missing")
+        elapsed = time.monotonic() - started
+        await cache.close()
+        return value, elapsed
+
+    try:
+        value, elapsed = asyncio.run(run())
+    finally:
+        server.close()
+    assert value is None
+    assert elapsed < 1.0
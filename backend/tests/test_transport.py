@@ -0,0 +1,71 @@
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from inference.backends import TFServingRestBackend
+from inference.circuit import OPEN, CircuitBreaker
+from inference.transport import INPUT_FLOAT, INPUT_PNG, INPUT_UINT8, TFServingError, instances_from_batch
+
+class Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+class FakeClient:
+    """Stands in for InferenceClient; answers every post with `status_code` and remembers the payloads."""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.payloads = []
+
+    def post(self, url, data, headers=None):
+        payload = json.loads(data)
+        self.payloads.append(payload)
+        if self.status_code != 200:
+            return Response(self.status_code, {"error": "unavailable"})
+        return Response(200, {"predictions": [[0.25, 0.75]] * len(payload["instances"])})
+
+def make_batch(n=2):
+    pixels = np.random.default_rng(0).integers(0, 256, size=(n, 224, 224, 3), dtype=np.uint8)
+    return pixels, pixels.astype(np.float32) / 255.0
+
+def test_instances_from_batch_recovers_the_uint8_pixels():
+    pixels, batch = make_batch()
+    assert np.array_equal(np.stack(instances_from_batch(batch, INPUT_FLOAT)), batch)
+    assert np.array_equal(np.stack(instances_from_batch(batch, INPUT_UINT8)), pixels)
+    decoded = np.asarray(Image.open(io.BytesIO(instances_from_batch(batch, INPUT_PNG)[1])))
+    assert np.array_equal(decoded, pixels[1])
+
+@pytest.mark.parametrize("transport", ["json", "uint8", "b64"])
+def test_backend_sends_the_batch_over_the_shared_transport(transport):
+    pixels, batch = make_batch()
+    client = FakeClient()
+    backend = TFServingRestBackend("http://tf/v1/models/m/versions/3:predict", transport=transport, client=client)
+
+    predictions = backend.predict(batch)
+
+    assert predictions.dtype == np.float32
+    assert predictions.shape == (2, 2)
+    instance = client.payloads[0]["instances"][0]
+    if transport == "uint8":
+        assert np.array_equal(np.asarray(instance, dtype=np.uint8), pixels[0])
+    elif transport == "b64":
+        assert np.array_equal(np.asarray(Image.open(io.BytesIO(base64.b64decode(instance["b64"])))), pixels[0])
+
+def test_backend_error_status_raises_and_opens_the_breaker():
+    breaker = CircuitBreaker("test", min_calls=2, failure_rate_threshold=0.5)
+    backend = TFServingRestBackend("http://tf:predict", client=FakeClient(status_code=503), breaker=breaker)
+    _, batch = make_batch(1)
+
+    for _ in range(2):
+        with pytest.raises(TFServingError) as error:
+            backend.predict(batch)
+        assert error.value.status_code == 503
+    assert breaker.state == OPEN